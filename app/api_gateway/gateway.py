@@ -10,8 +10,17 @@ from uuid import uuid4
 from app.worker.celery_app import celery_app
 from app.worker.db import get_operation, save_operation, log_echo, init_db
 from app.models.operation import Operation
-from app.constants.queues import TASK_PROCESS_OPERATION, OPERATIONS_QUEUE, TASK_PING_WORKER, PING_QUEUE, TASK_LOG_RECORD, LOGS_QUEUE
+from app.constants.queues import (
+    TASK_PROCESS_OPERATION,
+    OPERATIONS_QUEUE,
+    TASK_PING_WORKER,
+    PING_QUEUE,
+    TASK_LOG_RECORD,
+    LOGS_QUEUE,
+    OPERATION_TIMEOUT_SECONDS,
+)
 from app.auth.auth_component import estaAutorizado
+from app.auth.deny_list import DENY_IP, DENY_TOKEN, get_deny_list, token_fingerprint
 
 # Inicializar BD
 init_db()
@@ -59,10 +68,13 @@ class ReserveOperation(Resource):
             save_operation(operation)
             
             # Encolar tarea al worker
+            # El mensaje expira junto con el deadline de la operación: si nadie
+            # lo consumió a tiempo, el worker lo descarta sin ejecutarlo
             celery_app.send_task(
                 TASK_PROCESS_OPERATION,
                 args=(operation_id,),
-                queue=OPERATIONS_QUEUE
+                queue=OPERATIONS_QUEUE,
+                expires=OPERATION_TIMEOUT_SECONDS,
             )
             
             logger.info(f"Operación de reserva encolada: {operation_id}")
@@ -105,10 +117,13 @@ class PayOperation(Resource):
             save_operation(operation)
             
             # Encolar tarea al worker
+            # El mensaje expira junto con el deadline de la operación: si nadie
+            # lo consumió a tiempo, el worker lo descarta sin ejecutarlo
             celery_app.send_task(
                 TASK_PROCESS_OPERATION,
                 args=(operation_id,),
-                queue=OPERATIONS_QUEUE
+                queue=OPERATIONS_QUEUE,
+                expires=OPERATION_TIMEOUT_SECONDS,
             )
             
             logger.info(f"Operación de pago encolada: {operation_id}")
@@ -141,10 +156,13 @@ class SearchOperation(Resource):
             save_operation(operation)
             
             # Encolar tarea al worker
+            # El mensaje expira junto con el deadline de la operación: si nadie
+            # lo consumió a tiempo, el worker lo descarta sin ejecutarlo
             celery_app.send_task(
                 TASK_PROCESS_OPERATION,
                 args=(operation_id,),
-                queue=OPERATIONS_QUEUE
+                queue=OPERATIONS_QUEUE,
+                expires=OPERATION_TIMEOUT_SECONDS,
             )
             
             logger.info(f"Operación de búsqueda encolada: {operation_id}")
@@ -229,6 +247,16 @@ class UpdateRatesOperation(Resource):
                 return {"error": "Campo 'rates' requerido en el body"}, 400
             
             auth_header = request.headers.get('Authorization', '')
+            fingerprint = self._tokenFingerprint(auth_header)
+            
+            # Token o IP bloqueados por el detector de tampering: se rechazan
+            # sin decodificar el JWT ni publicar otro evento de auditoría
+            if self._estaBloqueado(fingerprint):
+                logger.warning(f"Solicitud bloqueada por deny-list para el hotel {hotel_id}")
+                return {
+                    "error": "No autorizado",
+                    "message": "Acceso bloqueado temporalmente por actividad sospechosa"
+                }, 403
             
             auth_result = self._estaAutorizado(auth_header, hotel_id)
 
@@ -244,6 +272,7 @@ class UpdateRatesOperation(Resource):
                     operation_data=None,
                     user_id=auth_result["user_id"],
                     token_hotel_id=auth_result["token_hotel_id"],
+                    token_fingerprint=fingerprint,
                 )
                 
                 logger.warning(f"Intento de acceso no autorizado a tarifas del hotel {hotel_id}")
@@ -309,6 +338,16 @@ class UpdateRatesOperation(Resource):
         token = auth_header[len("Bearer "):]
         return estaAutorizado(token, hotel_id)
 
+    def _tokenFingerprint(self, auth_header: str):
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return None
+        return token_fingerprint(auth_header[len("Bearer "):])
+
+    def _estaBloqueado(self, fingerprint) -> bool:
+        """Consulta en memoria la deny-list (huella del token e IP de origen)"""
+        deny_list = get_deny_list()
+        return deny_list.is_denied(DENY_TOKEN, fingerprint) or deny_list.is_denied(DENY_IP, request.remote_addr)
+
     def _generateLog(
         self,
         action: str,
@@ -319,6 +358,7 @@ class UpdateRatesOperation(Resource):
         operation_data: dict = None,
         user_id: str = None,
         token_hotel_id: str = None,
+        token_fingerprint: str = None,
     ) -> dict:
         """
         Construye un JSON de auditoría y lo publica en LOGS_QUEUE mediante Celery.
@@ -328,7 +368,8 @@ class UpdateRatesOperation(Resource):
 
         El payload incluye todos los campos necesarios para construir:
           - SecurityViolationEvent (event_id, timestamp, user_id, token_hotel_id,
-                                    requested_hotel_id, endpoint, method, ip_address, action)
+                                    requested_hotel_id, endpoint, method, ip_address, action,
+                                    token_fingerprint)
           - AuditLogEntry          (log_id, event_id, status, http_code, message, payload completo)
         """
         event_id = str(uuid4())
@@ -345,6 +386,7 @@ class UpdateRatesOperation(Resource):
             "method": request.method,
             "ip_address": request.remote_addr,
             "action": action,
+            "token_fingerprint": token_fingerprint,  # huella, nunca el JWT
 
             # --- AuditLogEntry ---
             "log_id": event_id,          # id del registro de auditoría
@@ -1,5 +1,6 @@
 """Componente de Auditoría - Encargado de loggear eventos de seguridad y auditoría"""
 
 from app.audit.audit_service import log_record
+from app.audit.security_event_store import SecurityEventStore, get_security_event_store
 
-__all__ = ["log_record"]
+__all__ = ["log_record", "SecurityEventStore", "get_security_event_store"]
@@ -0,0 +1,154 @@
+"""
+Almacén de eventos de seguridad con escritura por lotes.
+
+consume_security_log recibe un mensaje por evento; con un INSERT + commit por
+mensaje, una ráfaga de intentos de tampering queda limitada por los fsync de
+SQLite y la cola security.logs se atrasa. El store acumula los eventos en
+memoria y los escribe con save_security_events (executemany en una sola
+transacción) cuando:
+
+- el buffer llega a SECURITY_EVENT_BATCH_SIZE eventos, o
+- el evento más viejo lleva SECURITY_EVENT_FLUSH_SECONDS esperando (lo
+  revisa cada add() y un hilo de fondo para cuando deja de llegar tráfico).
+
+Los mensajes se confirman al recibirse (acks_late desactivado), así que un
+crash del proceso puede perder como máximo el buffer pendiente.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from celery.signals import worker_process_shutdown
+
+from app.models.security import SecurityEvent
+from app.worker.db import save_security_events
+
+logger = logging.getLogger(__name__)
+
+SECURITY_EVENT_BATCH_SIZE = int(os.getenv("SECURITY_EVENT_BATCH_SIZE", "200"))
+SECURITY_EVENT_FLUSH_SECONDS = float(os.getenv("SECURITY_EVENT_FLUSH_SECONDS", "0.5"))
+# Tope del buffer si la DB no acepta escrituras (se descartan los más viejos)
+SECURITY_EVENT_MAX_BUFFER = 50_000
+
+
+class SecurityEventStore:
+    """Buffer de SecurityEvent que se vuelca a SQLite por tamaño o por antigüedad"""
+
+    def __init__(
+        self,
+        batch_size: int = SECURITY_EVENT_BATCH_SIZE,
+        flush_seconds: float = SECURITY_EVENT_FLUSH_SECONDS,
+        max_buffer: int = SECURITY_EVENT_MAX_BUFFER,
+        writer: Callable[[List[SecurityEvent]], int] = save_security_events,
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.writer = writer
+        self.persisted = 0
+        self.dropped = 0
+        self._buffer: List[SecurityEvent] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        # Serializa los flush: el hilo de fondo y add() no escriben el mismo lote dos veces
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, event: SecurityEvent) -> None:
+        with self._lock:
+            self._buffer.append(event)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = len(self._buffer) >= self.batch_size or self._is_stale()
+        if due:
+            self.flush()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def _is_stale(self) -> bool:
+        return self._oldest is not None and time.monotonic() - self._oldest >= self.flush_seconds
+
+    def flush(self) -> int:
+        """Escribe todo lo pendiente; retorna cuántos eventos nuevos se guardaron"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer, self._oldest = self._buffer, [], None
+            if not batch:
+                return 0
+            try:
+                inserted = self.writer(batch)
+            except Exception as e:
+                self._requeue(batch)
+                logger.error(f"[SECURITY STORE] No se pudo guardar un lote de {len(batch)} eventos: {e}")
+                return 0
+            self.persisted += inserted
+            return inserted
+
+    def _requeue(self, batch: List[SecurityEvent]) -> None:
+        """Devuelve un lote fallido al frente del buffer (se reintenta en el próximo flush)"""
+        with self._lock:
+            self._buffer = batch + self._buffer
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+            self._oldest = time.monotonic()
+
+    def start(self) -> None:
+        """Inicia el hilo que vuelca el buffer aunque no lleguen más eventos"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="security-event-store", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_seconds * 2)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_seconds / 2):
+            with self._lock:
+                due = self._is_stale()
+            if due:
+                self.flush()
+
+
+_store: Optional[SecurityEventStore] = None
+_store_lock = threading.Lock()
+
+
+def get_security_event_store() -> SecurityEventStore:
+    """
+    Store del proceso actual. Se crea en el primer uso (dentro del proceso
+    hijo del worker Celery, no en el padre antes del fork).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SecurityEventStore()
+            _store.start()
+        return _store
+
+
+def flush_security_events() -> None:
+    if _store is not None:
+        _store.flush()
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs):
+    # Los hijos del pool prefork no ejecutan atexit al terminar
+    flush_security_events()
+
+
+atexit.register(flush_security_events)
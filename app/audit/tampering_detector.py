@@ -0,0 +1,218 @@
+"""
+Detector de tampering en tiempo real sobre los eventos de security.logs.
+
+Por cada violación (status FORBIDDEN) se actualizan contadores de ventana
+deslizante por usuario, por IP y por token_hotel_id. Cada contador es un ring
+de buckets fijos (TAMPERING_WINDOW_SECONDS / TAMPERING_BUCKET_SECONDS slots)
+con el número de violaciones y los hoteles pedidos en ese bucket, así que la
+memoria por clave es constante. Las claves viven en un LRU acotado por
+TAMPERING_MAX_KEYS: una IP que deja de atacar termina desalojada.
+
+Se genera una alerta cuando una clave, dentro de la ventana:
+- supera TAMPERING_MAX_VIOLATIONS violaciones (VIOLATION_RATE), o
+- pide TAMPERING_MAX_HOTELS hoteles distintos o más (HOTEL_CYCLING).
+
+react_to_alerts() registra la alerta y alimenta la deny-list que consulta el
+API Gateway (huella del token y, en alertas por IP, la IP).
+
+Los contadores son por proceso consumidor: con varios procesos en el pool
+de Celery cada uno ve una parte del tráfico. La deny-list sí es compartida.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Optional, Set
+
+from app.auth.deny_list import DENY_IP, DENY_TOKEN, get_deny_list
+from app.models.security import SecurityEvent
+
+logger = logging.getLogger(__name__)
+
+TAMPERING_WINDOW_SECONDS = float(os.getenv("TAMPERING_WINDOW_SECONDS", "60"))
+TAMPERING_BUCKET_SECONDS = float(os.getenv("TAMPERING_BUCKET_SECONDS", "5"))
+TAMPERING_MAX_VIOLATIONS = int(os.getenv("TAMPERING_MAX_VIOLATIONS", "20"))
+TAMPERING_MAX_HOTELS = int(os.getenv("TAMPERING_MAX_HOTELS", "3"))
+TAMPERING_MAX_KEYS = int(os.getenv("TAMPERING_MAX_KEYS", "10000"))
+
+# Motivos de alerta
+VIOLATION_RATE = "VIOLATION_RATE"
+HOTEL_CYCLING = "HOTEL_CYCLING"
+
+# Dimensiones observadas: (kind, atributo de SecurityEvent)
+TAMPERING_DIMENSIONS = (
+    ("user", "user_id"),
+    ("ip", "ip_address"),
+    ("token_hotel", "token_hotel_id"),
+)
+
+
+class SlidingWindowCounter:
+    """Ring de buckets con conteo de violaciones y hoteles pedidos por bucket"""
+
+    __slots__ = ("epochs", "counts", "hotels", "alerted_epoch")
+
+    def __init__(self, slots: int):
+        self.epochs = [-1] * slots
+        self.counts = [0] * slots
+        self.hotels: List[Optional[Set[str]]] = [None] * slots
+        self.alerted_epoch: Optional[int] = None
+
+    def add(self, epoch: int, hotel: Optional[str], max_hotels: int) -> None:
+        i = epoch % len(self.epochs)
+        if self.epochs[i] != epoch:
+            self.epochs[i], self.counts[i], self.hotels[i] = epoch, 0, None
+        self.counts[i] += 1
+        if hotel is not None:
+            hotels = self.hotels[i]
+            if hotels is None:
+                hotels = self.hotels[i] = set()
+            # Más allá del umbral no hace falta seguir guardando hoteles
+            if len(hotels) < max_hotels:
+                hotels.add(hotel)
+
+    def _live(self, epoch: int) -> List[int]:
+        oldest = epoch - len(self.epochs)
+        return [i for i, e in enumerate(self.epochs) if oldest < e <= epoch]
+
+    def total(self, epoch: int) -> int:
+        return sum(self.counts[i] for i in self._live(epoch))
+
+    def distinct_hotels(self, epoch: int) -> int:
+        hotels: Set[str] = set()
+        for i in self._live(epoch):
+            if self.hotels[i]:
+                hotels |= self.hotels[i]
+        return len(hotels)
+
+
+@dataclass
+class TamperingAlert:
+    """Umbral cruzado por una clave (usuario, IP o token_hotel_id)"""
+
+    kind: str  # user, ip, token_hotel
+    key: str
+    reason: str  # VIOLATION_RATE, HOTEL_CYCLING
+    violations: int
+    distinct_hotels: int
+    window_seconds: float
+    event_id: str
+    # True si la clave ya había alertado en la ventana actual (no se vuelve a loguear)
+    repeated: bool = False
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class TamperingDetector:
+    """Contadores de ventana deslizante por clave con desalojo LRU"""
+
+    def __init__(
+        self,
+        window_seconds: float = TAMPERING_WINDOW_SECONDS,
+        bucket_seconds: float = TAMPERING_BUCKET_SECONDS,
+        max_violations: int = TAMPERING_MAX_VIOLATIONS,
+        max_hotels: int = TAMPERING_MAX_HOTELS,
+        max_keys: int = TAMPERING_MAX_KEYS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.slots = max(int(round(window_seconds / bucket_seconds)), 1)
+        self.max_violations = max_violations
+        self.max_hotels = max_hotels
+        self.max_keys = max_keys
+        self.clock = clock
+        self.evicted = 0
+        self._counters: "OrderedDict[tuple, SlidingWindowCounter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def _counter(self, kind: str, key: str) -> SlidingWindowCounter:
+        counter = self._counters.get((kind, key))
+        if counter is None:
+            counter = self._counters[(kind, key)] = SlidingWindowCounter(self.slots)
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._counters.move_to_end((kind, key))
+        return counter
+
+    def observe(self, event: SecurityEvent) -> List[TamperingAlert]:
+        """Cuenta una violación; retorna las alertas de las claves que están sobre el umbral"""
+        if not event.is_violation:
+            return []
+        epoch = int(self.clock() // self.bucket_seconds)
+        alerts = []
+        with self._lock:
+            for kind, attribute in TAMPERING_DIMENSIONS:
+                key = getattr(event, attribute)
+                if key is None or key == "":
+                    continue
+                key = str(key)
+                counter = self._counter(kind, key)
+                counter.add(epoch, event.requested_hotel_id, self.max_hotels)
+
+                violations = counter.total(epoch)
+                hotels = counter.distinct_hotels(epoch)
+                if violations > self.max_violations:
+                    reason = VIOLATION_RATE
+                elif hotels >= self.max_hotels:
+                    reason = HOTEL_CYCLING
+                else:
+                    continue
+                # Se loguea una vez por clave y ventana, pero cada evento sobre el
+                # umbral sigue alimentando la deny-list (p.ej. un usuario que rota tokens)
+                repeated = counter.alerted_epoch is not None and epoch - counter.alerted_epoch < self.slots
+                if not repeated:
+                    counter.alerted_epoch = epoch
+                alerts.append(TamperingAlert(
+                    kind=kind,
+                    key=key,
+                    reason=reason,
+                    violations=violations,
+                    distinct_hotels=hotels,
+                    window_seconds=self.window_seconds,
+                    event_id=event.event_id,
+                    repeated=repeated,
+                ))
+        return alerts
+
+
+def react_to_alerts(alerts: List[TamperingAlert], token_fingerprint: Optional[str] = None, deny_list=None) -> None:
+    """Registra las alertas y bloquea el token (y la IP en alertas por IP)"""
+    if not alerts:
+        return
+    deny_list = deny_list or get_deny_list()
+    entries = {(DENY_TOKEN, token_fingerprint)} if token_fingerprint else set()
+    for alert in alerts:
+        if not alert.repeated:
+            logger.warning(
+                f"[TAMPERING ALERT] {alert.reason} {alert.kind}={alert.key} "
+                f"violations={alert.violations} hotels={alert.distinct_hotels} "
+                f"window={alert.window_seconds}s eventId={alert.event_id}"
+            )
+        if alert.kind == "ip":
+            entries.add((DENY_IP, alert.key))
+
+    for kind, value in entries:
+        try:
+            deny_list.add(kind, value)
+        except Exception as e:
+            logger.error(f"[TAMPERING ALERT] No se pudo agregar {kind} a la deny-list: {e}")
+
+
+_detector: Optional[TamperingDetector] = None
+
+
+def get_tampering_detector() -> TamperingDetector:
+    global _detector
+    if _detector is None:
+        _detector = TamperingDetector()
+    return _detector
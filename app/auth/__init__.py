@@ -1,5 +1,6 @@
 """Componente de Autorización - Validación JWT para control de acceso por hotel"""
 
 from app.auth.auth_component import estaAutorizado
+from app.auth.deny_list import get_deny_list, token_fingerprint
 
-__all__ = ["estaAutorizado"]
+__all__ = ["estaAutorizado", "get_deny_list", "token_fingerprint"]
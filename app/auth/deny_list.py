@@ -0,0 +1,156 @@
+"""
+Deny-list de tokens e IPs bloqueados por el detector de tampering.
+
+El detector (monitor, consumidor de security.logs) agrega entradas con TTL y
+el API Gateway las consulta antes de decodificar el JWT y de publicar el
+evento de auditoría: un token ya marcado no vuelve a costar un jwt.decode ni
+un mensaje en la cola.
+
+- InMemoryDenyList: un solo proceso (tests / desarrollo)
+- RedisDenyList: compartida entre contenedores. Un ZSET (miembro
+  "kind:value", score = expiración epoch) y una copia local que se refresca
+  como mucho cada DENY_LIST_REFRESH_SECONDS; is_denied() sólo lee la copia.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+DENY_LIST_BACKEND = os.getenv("DENY_LIST_BACKEND", "redis")  # redis | memory
+DENY_LIST_KEY = "security:deny_list"
+DENY_LIST_TTL_SECONDS = float(os.getenv("DENY_LIST_TTL_SECONDS", "300"))
+DENY_LIST_REFRESH_SECONDS = float(os.getenv("DENY_LIST_REFRESH_SECONDS", "1"))
+# Tras un error de Redis se sigue con la última copia y se reintenta más tarde
+DENY_LIST_RETRY_SECONDS = 5.0
+
+# Tipos de entrada
+DENY_TOKEN = "token"
+DENY_IP = "ip"
+
+
+def token_fingerprint(token: str) -> str:
+    """Huella del JWT (no se guarda ni se publica el token en claro)"""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def _member(kind: str, value: str) -> str:
+    return f"{kind}:{value}"
+
+
+def _entries(snapshot: Dict[str, float], now: float) -> List[dict]:
+    entries = []
+    for member, expires_at in sorted(snapshot.items(), key=lambda item: item[1]):
+        if expires_at > now:
+            kind, _, value = member.partition(":")
+            entries.append({"kind": kind, "value": value, "expires_in_seconds": round(expires_at - now, 1)})
+    return entries
+
+
+class InMemoryDenyList:
+    """Deny-list local al proceso"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._entries: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, value: str, ttl_seconds: float = DENY_LIST_TTL_SECONDS) -> None:
+        expires_at = self.clock() + ttl_seconds
+        with self._lock:
+            member = _member(kind, value)
+            self._entries[member] = max(expires_at, self._entries.get(member, 0.0))
+
+    def is_denied(self, kind: str, value: Optional[str]) -> bool:
+        if value is None:
+            return False
+        expires_at = self._entries.get(_member(kind, value))
+        return expires_at is not None and expires_at > self.clock()
+
+    def entries(self) -> List[dict]:
+        now = self.clock()
+        with self._lock:
+            self._entries = {m: exp for m, exp in self._entries.items() if exp > now}
+            return _entries(self._entries, now)
+
+
+class RedisDenyList:
+    """Deny-list compartida en Redis con copia local para consultas en memoria"""
+
+    def __init__(
+        self,
+        redis_url: str = BROKER_URL,
+        refresh_seconds: float = DENY_LIST_REFRESH_SECONDS,
+        clock: Callable[[], float] = time.time,
+        client=None,
+    ):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self._snapshot: Dict[str, float] = {}
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, value: str, ttl_seconds: float = DENY_LIST_TTL_SECONDS) -> None:
+        member = _member(kind, value)
+        expires_at = self.clock() + ttl_seconds
+        # GT: un bloqueo más corto no acorta uno vigente
+        self.client.zadd(DENY_LIST_KEY, {member: expires_at}, gt=True)
+        with self._lock:
+            self._snapshot[member] = max(expires_at, self._snapshot.get(member, 0.0))
+
+    def is_denied(self, kind: str, value: Optional[str]) -> bool:
+        if value is None:
+            return False
+        now = self.clock()
+        if now >= self._next_refresh:
+            self.refresh(now)
+        expires_at = self._snapshot.get(_member(kind, value))
+        return expires_at is not None and expires_at > now
+
+    def refresh(self, now: Optional[float] = None) -> None:
+        """Recarga la copia local (y purga las entradas vencidas del ZSET)"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            if now < self._next_refresh:
+                return  # otro hilo ya refrescó
+            try:
+                pipe = self.client.pipeline()
+                pipe.zremrangebyscore(DENY_LIST_KEY, "-inf", now)
+                pipe.zrangebyscore(DENY_LIST_KEY, now, "+inf", withscores=True)
+                _, rows = pipe.execute()
+            except Exception as e:
+                logger.debug(f"Could not refresh deny-list: {e}")
+                self._next_refresh = now + DENY_LIST_RETRY_SECONDS
+                return
+            self._snapshot = {
+                (member.decode() if isinstance(member, bytes) else member): score for member, score in rows
+            }
+            self._next_refresh = now + self.refresh_seconds
+
+    def entries(self) -> List[dict]:
+        now = self.clock()
+        self.refresh(now)
+        return _entries(self._snapshot, now)
+
+
+_deny_list = None
+_deny_list_lock = threading.Lock()
+
+
+def get_deny_list():
+    """Deny-list del proceso según DENY_LIST_BACKEND"""
+    global _deny_list
+    with _deny_list_lock:
+        if _deny_list is None:
+            _deny_list = RedisDenyList() if DENY_LIST_BACKEND == "redis" else InMemoryDenyList()
+        return _deny_list
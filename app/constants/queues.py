@@ -21,13 +21,32 @@ TASK_LOG_RECORD = "worker.log_record"
 
 # Timeouts y delays
 PING_TIMEOUT_SECONDS = 5
-ECHO_TIMEOUT_SECONDS = 2
-OPERATION_TIMEOUT_SECONDS = 30
+PING_EXPIRY_SECONDS = 5  # Un ping sin consumir tras un intervalo ya fue reemplazado por el siguiente
+ECHO_TIMEOUT_SECONDS = 2  # RTT ping -> echo por encima del cual el echo se considera demorado
+PING_ECHO_LOST_AFTER_SECONDS = 15  # Un ping sin echo pasado este tiempo se cuenta como perdido
+PING_FLIGHTS_RETENTION_HOURS = 24  # Retención de la tabla ping_flights
+OPERATION_TIMEOUT_SECONDS = 30  # Deadline end-to-end de una operación (desde su creación)
+OPERATION_HARD_LIMIT_GRACE_SECONDS = 5  # Margen entre el soft y el hard time limit del task
 
 # Configuración del Monitor
 MONITOR_PING_INTERVAL_SECONDS = 5  # Intervalo entre pings
+MONITOR_SUSPECT_PING_INTERVAL_SECONDS = 1  # Intervalo mientras un servicio tiene fallas o un incidente activo
 CONSECUTIVE_FAILURES_THRESHOLD = 3  # Fallas consecutivas para crear incidente
 RECOVERY_CHECK_THRESHOLD = 3  # UPs consecutivos para resolver incidente
+HEALTH_STATE_WINDOW_SIZE = 20  # Checks recientes por servicio en el estado en memoria del monitor
+HEALTH_STATE_REFRESH_SECONDS = 2  # Antigüedad máxima del estado leído de la DB en procesos que no reciben checks
+FLAP_WINDOW_SECONDS = 300  # Ventana en la que se cuentan los cambios UP <-> falla de un servicio
+FLAP_THRESHOLD = 4  # Cambios de estado dentro de la ventana a partir de los cuales el servicio está "flapping"
+FLAP_HOLD_DOWN_SECONDS = 120  # Estabilidad (sin cambios) exigida para dejar de considerarlo flapping
+LATENCY_EWMA_ALPHA = 0.1  # Peso de cada check nuevo en la línea base (EWMA) de latencia
+LATENCY_BASELINE_WARMUP = 20  # Checks normales necesarios antes de marcar anomalías
+LATENCY_ANOMALY_SIGMAS = 4.0  # Desvíos sobre la media a partir de los cuales la latencia es anómala
+LATENCY_ANOMALY_MIN_RATIO = 3.0  # Además, al menos N veces la media (evita marcar ruido de pocos ms)
+LATENCY_ANOMALY_MIN_MS = 100.0  # Piso absoluto: por debajo de esto nunca es DEGRADED
+LATENCY_REBASELINE_AFTER = 30  # Anomalías seguidas a partir de las cuales la línea base sigue al nuevo nivel
+LATENCY_REBASELINE_ALPHA = 0.02  # Peso (menor que LATENCY_EWMA_ALPHA) de cada muestra anómala al re-basar
+LATENCY_BASELINE_SEED_CHECKS = 100  # Checks recientes con que se reconstruye la línea base al arrancar
+DEGRADATION_CHECK_THRESHOLD = 3  # Checks DEGRADED consecutivos para crear incidente de degradación
 
 # Servicios a monitorear (nombre: URL interna)
 MONITORED_SERVICES = {
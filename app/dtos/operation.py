@@ -9,7 +9,7 @@ class OperationDTO(BaseModel):
     id: str = Field(..., description="ID único de la operación")
     type: str = Field(..., description="Tipo de operación: pay, reserve, search")
     payload: Dict[str, Any] = Field(default_factory=dict, description="Datos de negocio")
-    status: str = Field(..., description="Estado: PENDING, PROCESSING, PROCESSED, FAILED")
+    status: str = Field(..., description="Estado: PENDING, PROCESSING, PROCESSED, FAILED, TIMED_OUT")
     error: Optional[str] = Field(None, description="Mensaje de error si falló")
     created_at: str = Field(..., description="Timestamp de creación (ISO8601)")
     updated_at: str = Field(..., description="Timestamp de última actualización (ISO8601)")
@@ -1,6 +1,15 @@
 from dataclasses import dataclass, asdict, field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+# Estados de un health check que cuentan como falla
+FAILURE_STATUSES = ("DOWN", "TIMEOUT", "UNHEALTHY")
+# Responde, pero con latencia anómala respecto de su línea base (no es falla)
+DEGRADED_STATUS = "DEGRADED"
+
+# Tipos de incidente
+INCIDENT_OUTAGE = "OUTAGE"  # N fallas consecutivas
+INCIDENT_DEGRADATION = "DEGRADATION"  # N checks DEGRADED consecutivos
 
 
 @dataclass
@@ -79,7 +88,11 @@ class HealthCheck:
 
     def is_failure(self) -> bool:
         """Retorna True si este check representa una falla"""
-        return self.status in ("DOWN", "TIMEOUT", "UNHEALTHY")
+        return self.status in FAILURE_STATUSES
+
+    def is_degraded(self) -> bool:
+        """Retorna True si el servicio respondió pero degradado"""
+        return self.status == DEGRADED_STATUS
 
 
 @dataclass
@@ -96,6 +109,9 @@ class Incident:
     resolution_action: Optional[str]  # auto-recovery, restart, manual
     mttd_seconds: Optional[float]  # Mean Time To Detect (detected_at - started_at)
     mttr_seconds: Optional[float]  # Mean Time To Recover (resolved_at - detected_at)
+    recovery_status: Optional[str] = None  # QUEUED, SUCCEEDED, FAILED, SKIPPED, REJECTED
+    recovery_detail: Optional[str] = None  # Resultado/motivo de la acción de recovery
+    incident_type: str = INCIDENT_OUTAGE  # OUTAGE, DEGRADATION
 
     def to_dict(self):
         """Convierte a diccionario para serialización"""
@@ -115,6 +131,9 @@ class Incident:
             resolution_action=row[7],
             mttd_seconds=row[8],
             mttr_seconds=row[9],
+            recovery_status=row[10] if len(row) > 10 else None,
+            recovery_detail=row[11] if len(row) > 11 else None,
+            incident_type=row[12] if len(row) > 12 and row[12] else INCIDENT_OUTAGE,
         )
 
     @staticmethod
@@ -122,9 +141,10 @@ class Incident:
         service: str,
         first_failure_time: str,
         consecutive_failures: int,
-        severity: str = "CRITICAL"
+        severity: str = "CRITICAL",
+        incident_type: str = INCIDENT_OUTAGE,
     ) -> "Incident":
-        """Crea un nuevo incidente cuando se detectan N fallas consecutivas"""
+        """Crea un nuevo incidente cuando se detectan N fallas (o checks degradados) consecutivos"""
         now = datetime.utcnow().isoformat() + "Z"
         
         # Calcular MTTD
@@ -143,6 +163,7 @@ class Incident:
             resolution_action=None,
             mttd_seconds=mttd,
             mttr_seconds=None,
+            incident_type=incident_type,
         )
 
     def resolve(self, action: str = "auto-recovery") -> None:
@@ -160,5 +181,146 @@ class Incident:
         return self.resolved_at is None
 
 
+@dataclass
+class FlapState:
+    """Estado de flapping de un servicio (tabla service_flaps)"""
+
+    service: str
+    flapping: bool = False
+    transitions: int = 0  # Cambios UP <-> falla dentro de la ventana
+    flapping_since: Optional[str] = None
+    last_transition_at: Optional[str] = None
+    episodes: int = 0  # Veces que el servicio entró en flapping
+    updated_at: Optional[str] = None
+
+    COLUMNS = (
+        "service", "flapping", "transitions", "flapping_since",
+        "last_transition_at", "episodes", "updated_at",
+    )
+
+    def to_dict(self):
+        return {column: getattr(self, column) for column in self.COLUMNS}
+
+    @staticmethod
+    def from_row(row: tuple) -> "FlapState":
+        state = FlapState(*row)
+        state.flapping = bool(state.flapping)
+        return state
+
+    def to_row(self) -> tuple:
+        return tuple(getattr(self, column) for column in self.COLUMNS)
+
+
+def _iso_to_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+@dataclass
+class IncidentAggregate:
+    """
+    Acumuladores de incidentes de un servicio (tabla incident_aggregates).
+    Sólo cuentan las caídas (OUTAGE): una degradación no es downtime.
+
+    Se actualizan en la misma transacción que save_incident/update_incident,
+    así MTTD/MTTR/MTBF se leen en O(1) sin recorrer el historial.
+    """
+
+    service: str
+    total_incidents: int = 0
+    resolved_incidents: int = 0
+    mttd_count: int = 0
+    mttd_sum: float = 0.0
+    mttd_min: Optional[float] = None
+    mttd_max: Optional[float] = None
+    mttr_count: int = 0
+    mttr_sum: float = 0.0
+    mttr_min: Optional[float] = None
+    mttr_max: Optional[float] = None
+    # Tiempo entre el fin de un incidente y el inicio del siguiente
+    mtbf_count: int = 0
+    mtbf_sum: float = 0.0
+    last_resolved_at: Optional[str] = None
+    # Suma de (resolved_at - started_at) de los incidentes resueltos
+    downtime_seconds: float = 0.0
+
+    COLUMNS = (
+        "service", "total_incidents", "resolved_incidents",
+        "mttd_count", "mttd_sum", "mttd_min", "mttd_max",
+        "mttr_count", "mttr_sum", "mttr_min", "mttr_max",
+        "mtbf_count", "mtbf_sum", "last_resolved_at", "downtime_seconds",
+    )
+
+    @staticmethod
+    def from_row(row: tuple) -> "IncidentAggregate":
+        return IncidentAggregate(*row)
+
+    def to_row(self) -> tuple:
+        return tuple(getattr(self, column) for column in self.COLUMNS)
+
+    @property
+    def active_incidents(self) -> int:
+        return self.total_incidents - self.resolved_incidents
+
+    @property
+    def mttd_avg(self) -> Optional[float]:
+        return self.mttd_sum / self.mttd_count if self.mttd_count else None
+
+    @property
+    def mttr_avg(self) -> Optional[float]:
+        return self.mttr_sum / self.mttr_count if self.mttr_count else None
+
+    @property
+    def mtbf_avg(self) -> Optional[float]:
+        return self.mtbf_sum / self.mtbf_count if self.mtbf_count else None
+
+    def record_opened(self, incident: Incident) -> None:
+        """Acumula un incidente nuevo (MTTD)"""
+        self.total_incidents += 1
+        if incident.mttd_seconds is not None:
+            value = incident.mttd_seconds
+            self.mttd_count += 1
+            self.mttd_sum += value
+            self.mttd_min = value if self.mttd_min is None else min(self.mttd_min, value)
+            self.mttd_max = value if self.mttd_max is None else max(self.mttd_max, value)
+
+    def record_resolved(self, incident: Incident) -> None:
+        """Acumula la resolución de un incidente (MTTR, MTBF y downtime)"""
+        self.resolved_incidents += 1
+        if incident.mttr_seconds is not None:
+            value = incident.mttr_seconds
+            self.mttr_count += 1
+            self.mttr_sum += value
+            self.mttr_min = value if self.mttr_min is None else min(self.mttr_min, value)
+            self.mttr_max = value if self.mttr_max is None else max(self.mttr_max, value)
+
+        started = _iso_to_datetime(incident.started_at)
+        resolved = _iso_to_datetime(incident.resolved_at)
+        if self.last_resolved_at:
+            gap = (started - _iso_to_datetime(self.last_resolved_at)).total_seconds()
+            if gap > 0:  # Solo contar diferencias positivas
+                self.mtbf_count += 1
+                self.mtbf_sum += gap
+        self.downtime_seconds += max((resolved - started).total_seconds(), 0.0)
+        if self.last_resolved_at is None or resolved > _iso_to_datetime(self.last_resolved_at):
+            self.last_resolved_at = incident.resolved_at
+
+    @staticmethod
+    def combine(aggregates: List["IncidentAggregate"], service: str = "_global") -> "IncidentAggregate":
+        """Suma los acumuladores de varios servicios (MTBF no se combina: es por servicio)"""
+        total = IncidentAggregate(service=service)
+        for agg in aggregates:
+            total.total_incidents += agg.total_incidents
+            total.resolved_incidents += agg.resolved_incidents
+            total.mttd_count += agg.mttd_count
+            total.mttd_sum += agg.mttd_sum
+            total.mttr_count += agg.mttr_count
+            total.mttr_sum += agg.mttr_sum
+            total.downtime_seconds += agg.downtime_seconds
+            for name, pick in (("mttd_min", min), ("mttd_max", max), ("mttr_min", min), ("mttr_max", max)):
+                values = [v for v in (getattr(total, name), getattr(agg, name)) if v is not None]
+                setattr(total, name, pick(values) if values else None)
+        return total
+
+
 # Alias para compatibilidad con código existente
 PingEchoLog = HealthCheck
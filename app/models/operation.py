@@ -1,6 +1,6 @@
 from typing import Any, Dict, Optional
 from dataclasses import dataclass, asdict
-from datetime import datetime
+from datetime import datetime, timedelta
 
 
 @dataclass
@@ -49,6 +49,15 @@ class Operation:
             updated_at=now,
         )
 
+    def deadline(self, timeout_seconds: float) -> datetime:
+        """Instante (UTC, naive) en que la operación deja de tener sentido para el cliente"""
+        created = datetime.fromisoformat(self.created_at.replace("Z", "+00:00")).replace(tzinfo=None)
+        return created + timedelta(seconds=timeout_seconds)
+
+    def is_expired(self, timeout_seconds: float, now: Optional[datetime] = None) -> bool:
+        """Retorna True si ya pasó el deadline end-to-end de la operación"""
+        return (now or datetime.utcnow()) >= self.deadline(timeout_seconds)
+
     def mark_processing(self) -> "Operation":
         """Marca operación como en procesamiento"""
         return Operation(
@@ -0,0 +1,69 @@
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Estados de un evento de auditoría que cuentan como violación de seguridad
+VIOLATION_STATUSES = ("FORBIDDEN",)
+
+
+@dataclass
+class SecurityEvent:
+    """
+    SecurityViolationEvent + AuditLogEntry publicados por el API Gateway en
+    LOGS_QUEUE, tal como se guardan en la tabla security_events.
+    """
+
+    event_id: str
+    ts: str  # ISO8601 del evento en el gateway
+    user_id: Optional[str]
+    token_hotel_id: Optional[str]
+    requested_hotel_id: Optional[str]
+    endpoint: Optional[str]
+    method: Optional[str]
+    ip_address: Optional[str]
+    action: Optional[str]
+    status: Optional[str]  # AUTHORIZED, FORBIDDEN, ERROR
+    http_code: Optional[int]
+    message: Optional[str]
+    received_at: str  # ISO8601 de cuando lo consumió el monitor
+
+    COLUMNS = (
+        "event_id", "ts", "user_id", "token_hotel_id", "requested_hotel_id",
+        "endpoint", "method", "ip_address", "action", "status", "http_code",
+        "message", "received_at",
+    )
+
+    def to_dict(self):
+        """Convierte a diccionario para serialización"""
+        return asdict(self)
+
+    def to_row(self) -> tuple:
+        return tuple(getattr(self, column) for column in self.COLUMNS)
+
+    @staticmethod
+    def from_row(row: tuple) -> "SecurityEvent":
+        return SecurityEvent(*row)
+
+    @staticmethod
+    def from_payload(payload: Dict[str, Any]) -> "SecurityEvent":
+        """Construye desde los kwargs del mensaje TASK_LOG_RECORD del gateway"""
+        received_at = datetime.utcnow().isoformat() + "Z"
+        return SecurityEvent(
+            event_id=payload.get("event_id") or payload.get("log_id"),
+            ts=payload.get("timestamp") or received_at,
+            user_id=payload.get("user_id"),
+            token_hotel_id=payload.get("token_hotel_id"),
+            requested_hotel_id=payload.get("requested_hotel_id"),
+            endpoint=payload.get("endpoint"),
+            method=payload.get("method"),
+            ip_address=payload.get("ip_address"),
+            action=payload.get("action"),
+            status=payload.get("status"),
+            http_code=payload.get("http_code"),
+            message=payload.get("message"),
+            received_at=received_at,
+        )
+
+    @property
+    def is_violation(self) -> bool:
+        return self.status in VIOLATION_STATUSES
@@ -1,20 +1,41 @@
 """API Flask del Monitor Service - Endpoints para métricas y control"""
 
-from flask import Flask, jsonify, request
-
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+
+from app.models.monitoring import INCIDENT_DEGRADATION, INCIDENT_OUTAGE
 from app.monitor.monitor_service import get_monitor
+from app.auth.deny_list import get_deny_list
 from app.monitor.metrics import (
+    get_ping_rtt_metrics,
     get_service_metrics,
     get_all_services_metrics,
     get_experiment_summary,
 )
 from app.monitor.incident_detector import check_all_services
+from app.monitor.latency_analytics import get_service_latency_report
+from app.worker.task_metrics import get_aggregated_task_metrics
 from app.worker.db import (
-    get_active_incident,
-    get_incidents_by_service,
-    get_all_incidents,
-    get_recent_health_checks,
-    get_all_recent_health_checks,
+    MAX_PAGE_SIZE,
+    SECURITY_REPORT_DIMENSIONS,
+    export_columns,
+    iter_export_batches,
+    get_active_incidents,
+    get_service_incidents,
+    get_incidents_page,
+    get_health_checks_page,
+    get_data_version,
+    get_security_violation_stats,
     init_db,
 )
 from app.constants.queues import MONITORED_SERVICES
@@ -24,6 +45,93 @@ init_db()
 
 app = Flask(__name__)
 
+# Las métricas se recalculan al cambiar la versión de incidentes o el bucket de
+# TTL segundos: los health checks llegan en cada ronda y no invalidan la cache,
+# así que lo derivado de ellos tiene como máximo TTL segundos de atraso
+METRICS_CACHE_TTL_SECONDS = float(os.getenv("METRICS_CACHE_TTL_SECONDS", "10"))
+METRICS_CACHE_MAX_ENTRIES = 128
+
+
+class ResponseCache:
+    """
+    Respuestas JSON cacheadas por endpoint + query string. Una entrada vale
+    mientras su versión (ver _cache_version) no cambie y no supere el TTL.
+    """
+
+    def __init__(self, ttl_seconds: float = METRICS_CACHE_TTL_SECONDS, max_entries: int = METRICS_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, version: tuple):
+        """(body, etag) si hay una entrada vigente para la versión, si no None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, created_at, body, etag = entry
+                if entry_version == version and time.monotonic() - created_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return body, etag
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, version: tuple, body: bytes) -> str:
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+metrics_cache = ResponseCache()
+
+
+def _cache_version() -> tuple:
+    """Versión de incidentes + bucket de tiempo de METRICS_CACHE_TTL_SECONDS (alineado entre procesos)"""
+    ttl = metrics_cache.ttl_seconds
+    bucket = int(time.time() // ttl) if ttl > 0 else time.time()
+    return get_data_version(), bucket
+
+
+def cached_metrics(view):
+    """
+    Sirve la respuesta desde metrics_cache y soporta ETag / If-None-Match
+    (304 si el cliente ya tiene la misma versión). Sólo se cachean los 200.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        # La versión se lee antes de calcular: si hay escrituras en el medio
+        # la entrada queda con la versión vieja y el próximo pedido recalcula
+        version = _cache_version()
+        cached = metrics_cache.get(key, version)
+        if cached is None:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            etag = metrics_cache.put(key, version, body)
+        else:
+            body, etag = cached
+
+        response = Response(body, status=200, mimetype="application/json")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+    return wrapper
+
 
 # ==================== HEALTH & STATUS ====================
 
@@ -35,14 +143,19 @@ def health():
 
 @app.route("/status", methods=["GET"])
 def status():
-    """Estado actual del monitor"""
+    """
+    Estado actual del monitor. Si el loop de pings corre en este proceso
+    (runtime de un solo proceso) responde sólo desde memoria: contadores y
+    estado de salud vivos, sin consultas a SQLite.
+    """
     monitor = get_monitor()
-    return jsonify(monitor.get_status()), 200
+    return jsonify(monitor.get_status(include_rtt_window=not monitor.running)), 200
 
 
 # ==================== METRICS ====================
 
 @app.route("/metrics", methods=["GET"])
+@cached_metrics
 def all_metrics():
     """
     Obtiene métricas de todos los servicios.
@@ -55,7 +168,27 @@ def all_metrics():
     return jsonify(metrics), 200
 
 
+@app.route("/metrics/tasks", methods=["GET"])
+def task_metrics():
+    """Tiempo en cola, tiempo de ejecución y reintentos por task Celery (todos los procesos)"""
+    return jsonify(get_aggregated_task_metrics()), 200
+
+
+@app.route("/metrics/pings", methods=["GET"])
+def ping_rtt_metrics():
+    """
+    Round-trip ping -> echo vía Celery: distribución de RTT, lag en la cola de
+    pings y pings sin echo (backlog del broker / worker saturado).
+    
+    Query params:
+        window_minutes: Ventana de tiempo en minutos (default: 15)
+    """
+    window_minutes = request.args.get("window_minutes", 15, type=float)
+    return jsonify(get_ping_rtt_metrics(window_minutes)), 200
+
+
 @app.route("/metrics/<service>", methods=["GET"])
+@cached_metrics
 def service_metrics(service: str):
     """
     Obtiene métricas de un servicio específico.
@@ -73,7 +206,31 @@ def service_metrics(service: str):
     return jsonify(metrics.to_dict()), 200
 
 
+@app.route("/metrics/<service>/latency", methods=["GET"])
+@cached_metrics
+def service_latency(service: str):
+    """
+    Percentiles (p50/p90/p95/p99), tasa de fallas e histograma de latencia de
+    un servicio, más la serie por bucket de tiempo.
+    
+    Query params:
+        window_hours: Ventana de tiempo en horas (default: 1)
+        bucket_minutes: Tamaño de cada bucket de la serie (default: 5)
+    """
+    window_hours = request.args.get("window_hours", 1, type=float)
+    bucket_minutes = request.args.get("bucket_minutes", 5, type=float)
+    
+    valid_services = list(MONITORED_SERVICES.keys()) + ["redis"]
+    if service not in valid_services:
+        return jsonify({"error": f"Service '{service}' not found. Valid: {valid_services}"}), 404
+    if bucket_minutes <= 0:
+        return jsonify({"error": "bucket_minutes must be > 0"}), 400
+    
+    return jsonify(get_service_latency_report(service, window_hours, bucket_minutes)), 200
+
+
 @app.route("/metrics/experiment", methods=["GET"])
+@cached_metrics
 def experiment_metrics():
     """
     Genera resumen del experimento ASR-03.
@@ -86,22 +243,65 @@ def experiment_metrics():
     return jsonify(summary), 200
 
 
+# ==================== PAGINACIÓN ====================
+
+def _limit_arg(default: int = 50) -> int:
+    """Lee `limit` acotado a MAX_PAGE_SIZE; ValueError si no es positivo"""
+    limit = request.args.get("limit", default, type=int)
+    if limit is None or limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _page_args() -> dict:
+    """Lee los parámetros de paginación; ValueError si son inválidos"""
+    return {
+        "limit": _limit_arg(),
+        "before_id": request.args.get("before_id", type=int),
+        "after_id": request.args.get("after_id", type=int),
+        "before_ts": request.args.get("before_ts"),
+    }
+
+
+def _page_response(key: str, items: list, has_more: bool, args: dict, **extra) -> dict:
+    """
+    Cuerpo de una página con sus cursores. has_more se refiere a la dirección
+    recorrida: hacia atrás (before_id / sin cursor) o hacia adelante (after_id).
+    """
+    forward = args["after_id"] is not None and args["before_id"] is None
+    has_older = bool(items) and (forward or has_more)
+    has_newer = bool(items) and (
+        has_more if forward else (args["before_id"] is not None or args["before_ts"] is not None)
+    )
+    return {
+        **extra,
+        "total": len(items),
+        "limit": args["limit"],
+        key: [item.to_dict() for item in items],
+        "next": {"before_id": items[-1].id} if has_older else None,
+        "prev": {"after_id": items[0].id} if has_newer else None,
+    }
+
+
 # ==================== INCIDENTS ====================
 
 @app.route("/incidents", methods=["GET"])
 def all_incidents():
     """
-    Lista todos los incidentes.
+    Lista todos los incidentes (before_ts filtra por started_at).
     
-    Query params:
-        limit: Número máximo de incidentes (default: 50)
+    Query params (paginación por keyset, más reciente primero):
+        limit: Filas por página (default: 50, máximo: MAX_PAGE_SIZE)
+        before_id: Filas más viejas que este id (cursor "next")
+        after_id: Filas más nuevas que este id (cursor "prev")
+        before_ts: Sólo filas anteriores a este timestamp ISO8601
     """
-    limit = request.args.get("limit", 50, type=int)
-    incidents = get_all_incidents(limit)
-    return jsonify({
-        "total": len(incidents),
-        "incidents": [i.to_dict() for i in incidents],
-    }), 200
+    try:
+        args = _page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    incidents, has_more = get_incidents_page(**args)
+    return jsonify(_page_response("incidents", incidents, has_more, args)), 200
 
 
 @app.route("/incidents/<service>", methods=["GET"])
@@ -110,16 +310,18 @@ def service_incidents(service: str):
     Lista incidentes de un servicio específico.
     
     Query params:
-        limit: Número máximo de incidentes (default: 50)
+        limit: Número máximo de incidentes (default: 50, máximo: MAX_PAGE_SIZE)
     """
-    limit = request.args.get("limit", 50, type=int)
+    try:
+        limit = _limit_arg()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     valid_services = list(MONITORED_SERVICES.keys()) + ["redis"]
     if service not in valid_services:
         return jsonify({"error": f"Service '{service}' not found"}), 404
     
-    incidents = get_incidents_by_service(service, limit)
-    active = get_active_incident(service)
+    incidents, active = get_service_incidents(service, limit)
     
     return jsonify({
         "service": service,
@@ -132,14 +334,19 @@ def service_incidents(service: str):
 
 @app.route("/incidents/active", methods=["GET"])
 def active_incidents():
-    """Lista todos los incidentes activos"""
-    services = list(MONITORED_SERVICES.keys()) + ["redis"]
-    active_incidents = []
+    """
+    Lista todos los incidentes activos.
     
-    for service in services:
-        incident = get_active_incident(service)
-        if incident:
-            active_incidents.append(incident.to_dict())
+    Query params:
+        type: OUTAGE o DEGRADATION (default: ambos)
+    """
+    incident_type = request.args.get("type")
+    if incident_type is not None:
+        incident_type = incident_type.upper()
+        if incident_type not in (INCIDENT_OUTAGE, INCIDENT_DEGRADATION):
+            return jsonify({"error": f"type must be {INCIDENT_OUTAGE} or {INCIDENT_DEGRADATION}"}), 400
+    services = list(MONITORED_SERVICES.keys()) + ["redis"]
+    active_incidents = [i.to_dict() for i in get_active_incidents(services, incident_type=incident_type)]
     
     return jsonify({
         "total": len(active_incidents),
@@ -154,16 +361,18 @@ def all_health_checks():
     """
     Obtiene los últimos health checks de todos los servicios.
     
-    Query params:
-        limit: Número máximo de checks (default: 50)
+    Query params (paginación por keyset, más reciente primero):
+        limit: Filas por página (default: 50, máximo: MAX_PAGE_SIZE)
+        before_id: Filas más viejas que este id (cursor "next")
+        after_id: Filas más nuevas que este id (cursor "prev")
+        before_ts: Sólo filas anteriores a este timestamp ISO8601
     """
-    limit = request.args.get("limit", 50, type=int)
-    checks = get_all_recent_health_checks(limit)
-    
-    return jsonify({
-        "total": len(checks),
-        "checks": [c.to_dict() for c in checks],
-    }), 200
+    try:
+        args = _page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    checks, has_more = get_health_checks_page(**args)
+    return jsonify(_page_response("checks", checks, has_more, args)), 200
 
 
 @app.route("/health-checks/<service>", methods=["GET"])
@@ -171,24 +380,125 @@ def service_health_checks(service: str):
     """
     Obtiene los últimos health checks de un servicio.
     
-    Query params:
-        limit: Número máximo de checks (default: 50)
+    Query params (paginación por keyset, más reciente primero):
+        limit: Filas por página (default: 50, máximo: MAX_PAGE_SIZE)
+        before_id: Filas más viejas que este id (cursor "next")
+        after_id: Filas más nuevas que este id (cursor "prev")
+        before_ts: Sólo filas anteriores a este timestamp ISO8601
     """
-    limit = request.args.get("limit", 50, type=int)
-    
     valid_services = list(MONITORED_SERVICES.keys()) + ["redis"]
     if service not in valid_services:
         return jsonify({"error": f"Service '{service}' not found"}), 404
     
-    checks = get_recent_health_checks(service, limit)
+    try:
+        args = _page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    checks, has_more = get_health_checks_page(service=service, **args)
+    return jsonify(_page_response("checks", checks, has_more, args, service=service)), 200
+
+
+# ==================== EXPORT ====================
+
+EXPORT_KINDS = {"health-checks": "health_checks", "incidents": "incidents"}
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _export_lines(table: str, fmt: str, batches):
+    """Serializa lote a lote: la memoria no depende de cuántas filas se exporten"""
+    columns = export_columns(table)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+    for rows in batches:
+        buffer = io.StringIO()
+        if fmt == "csv":
+            csv.writer(buffer).writerows(rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(columns, row))))
+                buffer.write("\n")
+        yield buffer.getvalue()
+
+
+@app.route("/export/<kind>", methods=["GET"])
+def export_history(kind: str):
+    """
+    Exporta health-checks o incidents completos en streaming (chunked).
+    
+    Query params:
+        format: ndjson (default) o csv
+        since: Desde este timestamp ISO8601 (inclusive)
+        until: Hasta este timestamp ISO8601 (exclusive)
+        service: Sólo este servicio
+    """
+    table = EXPORT_KINDS.get(kind)
+    if table is None:
+        return jsonify({"error": f"Unknown export '{kind}'. Valid: {list(EXPORT_KINDS)}"}), 404
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format '{fmt}'. Valid: {list(EXPORT_FORMATS)}"}), 400
+    service = request.args.get("service")
+    valid_services = list(MONITORED_SERVICES.keys()) + ["redis"]
+    if service is not None and service not in valid_services:
+        return jsonify({"error": f"Service '{service}' not found"}), 404
+    
+    batches = iter_export_batches(
+        table,
+        since=request.args.get("since"),
+        until=request.args.get("until"),
+        service=service,
+    )
+    return Response(
+        stream_with_context(_export_lines(table, fmt, batches)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{fmt}"'},
+    )
+
+
+# ==================== SEGURIDAD ====================
+
+@app.route("/security/violations/by-<dimension>", methods=["GET"])
+def security_violations(dimension: str):
+    """
+    Violaciones de seguridad (accesos FORBIDDEN) agrupadas por hotel, IP o
+    endpoint: /security/violations/by-hotel | by-ip | by-endpoint
     
+    Query params:
+        window_hours: Ventana de tiempo en horas (default: 1)
+        limit: Grupos a retornar, de mayor a menor (default: 50)
+    """
+    if dimension not in SECURITY_REPORT_DIMENSIONS:
+        return jsonify({"error": f"Unknown dimension '{dimension}'. Valid: {list(SECURITY_REPORT_DIMENSIONS)}"}), 404
+    window_hours = request.args.get("window_hours", 1, type=float)
+    limit = request.args.get("limit", 50, type=int)
+    if window_hours is None or window_hours <= 0 or limit is None or limit < 1:
+        return jsonify({"error": "window_hours and limit must be > 0"}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    since = (datetime.utcnow() - timedelta(hours=window_hours)).isoformat() + "Z"
+    groups = get_security_violation_stats(dimension, since, limit)
     return jsonify({
-        "service": service,
-        "total": len(checks),
-        "checks": [c.to_dict() for c in checks],
+        "dimension": dimension,
+        "window_hours": window_hours,
+        "since": since,
+        "total": len(groups),
+        "groups": groups,
     }), 200
 
 
+@app.route("/security/deny-list", methods=["GET"])
+def security_deny_list():
+    """Tokens (huella) e IPs bloqueados por el detector de tampering"""
+    try:
+        entries = get_deny_list().entries()
+    except Exception as e:
+        return jsonify({"error": f"Deny-list unavailable: {e}"}), 503
+    return jsonify({"total": len(entries), "entries": entries}), 200
+
+
 # ==================== CONTROL ====================
 
 @app.route("/ping", methods=["POST"])
@@ -0,0 +1,314 @@
+"""Coordinación entre instancias del monitor: membresía, sharding y líder
+
+Con una sola instancia el monitor prueba todos los servicios y ejecuta los
+recoveries. Para escalar horizontalmente cada instancia:
+
+- publica un heartbeat en el LeaseStore (miembros vivos = heartbeat dentro
+  del TTL). Cuando cambia la membresía se reconstruye el ConsistentHashRing y
+  cada instancia prueba sólo los servicios que le asigna (owns()). Agregar o
+  quitar una instancia mueve ~1/N de los servicios.
+- compite por un lease de liderazgo (SET NX + TTL en Redis). Sólo el líder
+  ejecuta acciones de recovery (is_leader()); el dueño de un servicio crea el
+  incidente y el líder toma los que quedaron sin recovery.
+
+El líder se considera vigente sólo hasta `lease_expires_at - margen` según el
+reloj local, así nunca cree seguir siendo líder después de que otra instancia
+pudo tomar el lease.
+
+Backends: RedisLeaseStore (compartido entre contenedores) e
+InMemoryLeaseStore (una instancia / tests). MONITOR_CLUSTER_BACKEND elige
+entre "redis" y "memory" (default: memory, una sola instancia).
+"""
+
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+MONITOR_CLUSTER_BACKEND = os.getenv("MONITOR_CLUSTER_BACKEND", "memory")  # memory | redis
+MONITOR_NODE_ID = os.getenv("MONITOR_NODE_ID") or socket.gethostname()
+MONITOR_HEARTBEAT_SECONDS = float(os.getenv("MONITOR_HEARTBEAT_SECONDS", "1"))
+MONITOR_LEASE_TTL_SECONDS = float(os.getenv("MONITOR_LEASE_TTL_SECONDS", "5"))
+# Puntos por nodo en el anillo (más puntos = reparto más parejo)
+HASH_RING_VNODES = 64
+
+LEADER_LEASE = "monitor:leader"
+MEMBERS_KEY = "monitor:members"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """Anillo de hashing consistente con nodos virtuales"""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = HASH_RING_VNODES):
+        self.vnodes = vnodes
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._hashes:
+            return None
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[i]
+
+    def assignments(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """nodo -> claves que le tocan"""
+        result: Dict[str, List[str]] = {node: [] for node in self.nodes}
+        for key in keys:
+            node = self.node_for(key)
+            if node is not None:
+                result[node].append(key)
+        return result
+
+
+# ==================== LEASE STORES ====================
+
+class InMemoryLeaseStore:
+    """Leases y membresía en memoria (compartible entre instancias del mismo proceso)"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._leases: Dict[str, tuple] = {}  # nombre -> (holder, expires_at)
+        self._members: Dict[str, float] = {}  # nodo -> expires_at
+        self._lock = threading.Lock()
+
+    def acquire(self, name: str, holder: str, ttl: float) -> bool:
+        """Toma o renueva el lease; False si lo tiene otro holder vigente"""
+        now = self.clock()
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current[0] != holder and current[1] > now:
+                return False
+            self._leases[name] = (holder, now + ttl)
+            return True
+
+    def release(self, name: str, holder: str) -> None:
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current[0] == holder:
+                del self._leases[name]
+
+    def holder(self, name: str) -> Optional[str]:
+        current = self._leases.get(name)
+        return current[0] if current is not None and current[1] > self.clock() else None
+
+    def heartbeat(self, node: str, ttl: float) -> None:
+        with self._lock:
+            self._members[node] = self.clock() + ttl
+
+    def leave(self, node: str) -> None:
+        with self._lock:
+            self._members.pop(node, None)
+
+    def members(self) -> List[str]:
+        now = self.clock()
+        with self._lock:
+            self._members = {node: exp for node, exp in self._members.items() if exp > now}
+            return sorted(self._members)
+
+
+# Renovar / liberar sólo si el lease sigue siendo del holder (atómico en Redis)
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLeaseStore:
+    """Leases con SET NX PX y membresía en un ZSET (score = expiración)"""
+
+    def __init__(self, redis_url: str = BROKER_URL, clock: Callable[[], float] = time.time, client=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1)
+        self.client = client
+        self.clock = clock
+        self._renew = client.register_script(_RENEW_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def acquire(self, name: str, holder: str, ttl: float) -> bool:
+        ttl_ms = int(ttl * 1000)
+        if self.client.set(name, holder, nx=True, px=ttl_ms):
+            return True
+        return bool(self._renew(keys=[name], args=[holder, ttl_ms]))
+
+    def release(self, name: str, holder: str) -> None:
+        self._release(keys=[name], args=[holder])
+
+    def holder(self, name: str) -> Optional[str]:
+        value = self.client.get(name)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def heartbeat(self, node: str, ttl: float) -> None:
+        self.client.zadd(MEMBERS_KEY, {node: self.clock() + ttl})
+
+    def leave(self, node: str) -> None:
+        self.client.zrem(MEMBERS_KEY, node)
+
+    def members(self) -> List[str]:
+        now = self.clock()
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(MEMBERS_KEY, "-inf", now)
+        pipe.zrangebyscore(MEMBERS_KEY, now, "+inf")
+        _, rows = pipe.execute()
+        return sorted(m.decode() if isinstance(m, bytes) else m for m in rows)
+
+
+# ==================== CLUSTER ====================
+
+class MonitorCluster:
+    """Vista local de la membresía, el anillo y el liderazgo de esta instancia"""
+
+    def __init__(
+        self,
+        node_id: str = MONITOR_NODE_ID,
+        store=None,
+        lease_ttl: float = MONITOR_LEASE_TTL_SECONDS,
+        heartbeat_interval: float = MONITOR_HEARTBEAT_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.node_id = node_id
+        self.store = store if store is not None else InMemoryLeaseStore(clock=clock)
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.clock = clock
+        self.members: List[str] = []
+        # Hasta que haya un heartbeat exitoso la instancia se asume sola
+        self.ring = ConsistentHashRing([node_id])
+        self.rebalances = 0
+        self.leader_changes = 0
+        self.last_error: Optional[str] = None
+        self._leader_until = 0.0
+        self._listeners: List[Callable[[List[str], List[str]], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def on_rebalance(self, listener: Callable[[List[str], List[str]], None]) -> None:
+        """listener(nodos_nuevos, nodos_que_salieron) tras reconstruir el anillo"""
+        self._listeners.append(listener)
+
+    def heartbeat(self) -> None:
+        """Renueva membresía y lease, y rebalancea si cambió la membresía"""
+        try:
+            now = self.clock()
+            self.store.heartbeat(self.node_id, self.lease_ttl)
+            members = self.store.members()
+            leader = self.store.acquire(LEADER_LEASE, self.node_id, self.lease_ttl)
+            self.last_error = None
+        except Exception as e:
+            # Sin el store no hay garantías: se deja de ser líder al vencer el lease
+            self.last_error = str(e)
+            logger.warning(f"Cluster heartbeat failed: {e}")
+            return
+
+        with self._lock:
+            was_leader = self.is_leader()
+            # Margen de un heartbeat: nunca se actúa como líder con el lease vencido
+            self._leader_until = now + self.lease_ttl - self.heartbeat_interval if leader else 0.0
+            if leader != was_leader:
+                self.leader_changes += 1
+                logger.info(f"👑 Monitor {self.node_id} {'is now' if leader else 'is no longer'} leader")
+
+            if self.node_id not in members:
+                members = sorted(members + [self.node_id])
+            if members == self.members:
+                return
+            joined = [m for m in members if m not in self.members]
+            left = [m for m in self.members if m not in members]
+            self.members = members
+            self.ring = ConsistentHashRing(members)
+            self.rebalances += 1
+            listeners = list(self._listeners)
+
+        logger.info(f"🔀 Monitor ring rebalanced: members={members} joined={joined} left={left}")
+        for listener in listeners:
+            try:
+                listener(joined, left)
+            except Exception as e:
+                logger.error(f"Rebalance listener failed: {e}")
+
+    def owns(self, service: str) -> bool:
+        return self.ring.node_for(service) in (self.node_id, None)
+
+    def owned(self, services: Iterable[str]) -> List[str]:
+        return [service for service in services if self.owns(service)]
+
+    def is_leader(self) -> bool:
+        return self.clock() < self._leader_until
+
+    def start(self) -> None:
+        """Heartbeat inmediato y luego en un thread cada heartbeat_interval (idempotente)"""
+        if self._thread is not None:
+            return
+        self.heartbeat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="monitor-cluster", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.heartbeat_interval):
+            self.heartbeat()
+
+    def stop(self) -> None:
+        """Sale del anillo y libera el liderazgo (las otras instancias rebalancean)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.heartbeat_interval * 2)
+            self._thread = None
+        try:
+            self.store.release(LEADER_LEASE, self.node_id)
+            self.store.leave(self.node_id)
+        except Exception as e:
+            logger.warning(f"Could not leave cluster cleanly: {e}")
+        self._leader_until = 0.0
+
+    def snapshot(self, services: Iterable[str] = ()) -> dict:
+        services = list(services)
+        return {
+            "node_id": self.node_id,
+            "members": list(self.members),
+            "is_leader": self.is_leader(),
+            "owned_services": self.owned(services),
+            "rebalances": self.rebalances,
+            "leader_changes": self.leader_changes,
+            "last_error": self.last_error,
+        }
+
+
+_cluster: Optional[MonitorCluster] = None
+_cluster_lock = threading.Lock()
+
+
+def get_cluster() -> MonitorCluster:
+    """Cluster del proceso según MONITOR_CLUSTER_BACKEND (se inicia en el primer uso)"""
+    global _cluster
+    with _cluster_lock:
+        if _cluster is None:
+            store = RedisLeaseStore() if MONITOR_CLUSTER_BACKEND == "redis" else InMemoryLeaseStore()
+            _cluster = MonitorCluster(store=store)
+            _cluster.start()
+        return _cluster
@@ -0,0 +1,235 @@
+"""Cliente mínimo de la Docker Engine API sobre el socket unix
+
+Reemplaza las invocaciones al CLI `docker` (un proceso nuevo por llamada, de
+cientos de ms a segundos que cuentan contra el MTTR) por requests HTTP sobre
+/var/run/docker.sock con conexiones persistentes:
+
+- ping / inspect / restart sobre conexiones keep-alive reutilizadas.
+- events: stream de eventos de un container en una conexión aparte. Con
+  `since` Docker re-emite los eventos ya ocurridos, así que el start de un
+  restart recién hecho se confirma apenas se abre el stream.
+"""
+
+import http.client
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Iterable, Iterator, Optional
+from urllib.parse import quote, urlencode
+
+logger = logging.getLogger(__name__)
+
+DOCKER_SOCKET_PATH = os.getenv("DOCKER_SOCKET_PATH", "/var/run/docker.sock")
+DOCKER_API_TIMEOUT_SECONDS = 5
+
+
+class DockerAPIError(Exception):
+    """Respuesta de error de la Docker Engine API"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection sobre un socket AF_UNIX"""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = DOCKER_API_TIMEOUT_SECONDS):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class DockerClient:
+    """
+    Requests a la Engine API reutilizando conexiones keep-alive.
+
+    Las conexiones ociosas se guardan en un pool chico: un restart largo en un
+    thread no bloquea los inspect/ping de otro.
+    """
+
+    MAX_IDLE_CONNECTIONS = 4
+
+    def __init__(self, socket_path: str = DOCKER_SOCKET_PATH, timeout: float = DOCKER_API_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _acquire(self) -> UnixHTTPConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.connections_opened += 1
+        return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+
+    def _release(self, conn: UnixHTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.MAX_IDLE_CONNECTIONS:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _request(self, method: str, path: str, timeout: Optional[float] = None):
+        """Retorna (status, body decodificado). Reintenta una vez si la conexión ociosa se cerró."""
+        for attempt in (1, 2):
+            conn = self._acquire()
+            reused = conn.sock is not None
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                conn.request(method, path, headers={"Host": "docker"})
+                response = conn.getresponse()
+                raw = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                if attempt == 2 or not reused:
+                    raise
+                continue
+            except Exception:
+                # Timeout u otro error a mitad de la respuesta: la conexión no es reutilizable
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            body = raw.decode("utf-8", errors="replace")
+            if response.getheader("Content-Type", "").startswith("application/json") and body:
+                body = json.loads(body)
+            return response.status, body
+
+    @staticmethod
+    def _error_message(body) -> str:
+        if isinstance(body, dict):
+            return body.get("message", str(body))
+        return str(body).strip()
+
+    # ==================== API ====================
+
+    def ping(self) -> bool:
+        """True si el daemon responde"""
+        try:
+            status, body = self._request("GET", "/_ping")
+        except OSError:
+            return False
+        return status == 200
+
+    def inspect(self, container: str) -> Optional[dict]:
+        """Detalle del container o None si no existe"""
+        status, body = self._request("GET", f"/containers/{quote(container)}/json")
+        if status == 404:
+            return None
+        if status != 200:
+            raise DockerAPIError(status, self._error_message(body))
+        return body
+
+    def container_status(self, container: str) -> Optional[str]:
+        """Estado del container (running, exited, ...) o None si no existe"""
+        info = self.inspect(container)
+        return info.get("State", {}).get("Status") if info else None
+
+    def restart(self, container: str, timeout: int = 30) -> None:
+        """
+        Reinicia un container. La API responde cuando el restart terminó, por
+        eso el timeout HTTP es el de stop del container más un margen.
+        """
+        status, body = self._request(
+            "POST",
+            f"/containers/{quote(container)}/restart?t={int(timeout)}",
+            timeout=timeout + 10,
+        )
+        if status != 204:
+            raise DockerAPIError(status, self._error_message(body))
+
+    def events(
+        self,
+        container: Optional[str] = None,
+        actions: Iterable[str] = (),
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[dict]:
+        """
+        Stream de eventos de containers (una conexión dedicada por stream).
+        Termina al llegar a `until` o al cerrarse la conexión.
+        """
+        filters = {"type": ["container"]}
+        if container:
+            filters["container"] = [container]
+        actions = list(actions)
+        if actions:
+            filters["event"] = actions
+        params = {"filters": json.dumps(filters)}
+        if since is not None:
+            params["since"] = f"{since:.9f}"
+        if until is not None:
+            params["until"] = f"{until:.9f}"
+
+        conn = UnixHTTPConnection(self.socket_path, timeout=timeout)
+        try:
+            conn.request("GET", f"/events?{urlencode(params)}", headers={"Host": "docker"})
+            response = conn.getresponse()
+            if response.status != 200:
+                raise DockerAPIError(response.status, response.read().decode("utf-8", errors="replace"))
+            while True:
+                line = response.readline()
+                if not line:
+                    return
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    def wait_for_event(
+        self,
+        container: str,
+        actions: Iterable[str] = ("start",),
+        since: Optional[float] = None,
+        timeout: float = 10.0,
+    ) -> Optional[dict]:
+        """Primer evento del container con alguna de las acciones desde `since` (None si no llega)"""
+        now = time.time()
+        since = now if since is None else since
+        try:
+            for event in self.events(container, actions, since=since, until=now + timeout, timeout=timeout + 1):
+                return event
+        except (OSError, DockerAPIError) as e:
+            logger.warning(f"Docker events stream for {container} failed: {e}")
+        return None
+
+
+_client: Optional[DockerClient] = None
+_client_lock = threading.Lock()
+
+
+def get_docker_client() -> DockerClient:
+    """Cliente global del proceso (reutiliza la conexión entre llamadas)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = DockerClient()
+        return _client
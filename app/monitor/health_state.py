@@ -0,0 +1,210 @@
+"""Estado de salud en memoria por servicio (ventana deslizante)
+
+Cada servicio tiene un ring buffer con los últimos N resultados (estado,
+latencia, timestamp) y los contadores de racha que usa el detector de
+incidentes (fallas para las caídas, checks DEGRADED para las
+degradaciones). Lo alimentan directamente los probes y los echos del
+proceso, y se reconstruye desde SQLite la primera vez que se consulta un
+servicio.
+
+Un proceso que no recibe checks de un servicio (p.ej. la API Flask) lo
+refresca desde la DB cuando su copia tiene más de `max_age` segundos.
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from threading import RLock
+from typing import Dict, Iterable, List, Optional
+
+from app.models.monitoring import (
+    DEGRADED_STATUS,
+    INCIDENT_DEGRADATION,
+    INCIDENT_OUTAGE,
+    HealthCheck,
+    Incident,
+)
+from app.worker.db import (
+    get_active_incident,
+    get_active_incidents,
+    get_recent_health_checks,
+    get_recent_health_checks_for_services,
+)
+from app.constants.queues import HEALTH_STATE_WINDOW_SIZE
+
+
+@dataclass
+class CheckOutcome:
+    """Resultado de un check dentro de la ventana"""
+    status: str
+    is_failure: bool
+    latency_ms: Optional[float]
+    timestamp: str
+
+
+@dataclass
+class ServiceHealthState:
+    """Ventana de los últimos checks de un servicio + rachas"""
+    service: str
+    window: deque = field(default_factory=lambda: deque(maxlen=HEALTH_STATE_WINDOW_SIZE))
+    consecutive_failures: int = 0
+    first_failure_ts: Optional[str] = None
+    consecutive_ups: int = 0
+    active_incident: Optional[Incident] = None
+    # Racha de checks DEGRADED y de checks UP con latencia normal
+    consecutive_degraded: int = 0
+    first_degraded_ts: Optional[str] = None
+    consecutive_normal: int = 0
+    active_degradation: Optional[Incident] = None
+    # True si el proceso recibe checks de este servicio (no hace falta refrescar)
+    fed_locally: bool = False
+    loaded_at: float = 0.0
+
+    def record(self, status: str, is_failure: bool, timestamp: str, latency_ms: Optional[float] = None) -> None:
+        """Agrega un check a la ventana y actualiza las rachas en O(1)"""
+        self.window.append(CheckOutcome(status, is_failure, latency_ms, timestamp))
+        self.fed_locally = True
+        if is_failure:
+            self.consecutive_ups = 0
+            if self.consecutive_failures == 0:
+                self.first_failure_ts = timestamp
+            self.consecutive_failures += 1
+        else:
+            self.consecutive_failures = 0
+            self.first_failure_ts = None
+            self.consecutive_ups += 1
+
+        if status == DEGRADED_STATUS:
+            self.consecutive_normal = 0
+            if self.consecutive_degraded == 0:
+                self.first_degraded_ts = timestamp
+            self.consecutive_degraded += 1
+        else:
+            self.consecutive_degraded = 0
+            self.first_degraded_ts = None
+            self.consecutive_normal = 0 if is_failure else self.consecutive_normal + 1
+
+    @property
+    def last(self) -> Optional[CheckOutcome]:
+        return self.window[-1] if self.window else None
+
+    def snapshot(self) -> dict:
+        latencies = sorted(o.latency_ms for o in self.window if o.latency_ms is not None)
+        failures = sum(1 for o in self.window if o.is_failure)
+        last = self.last
+        return {
+            "service": self.service,
+            "status": last.status if last else None,
+            "last_check_at": last.timestamp if last else None,
+            "consecutive_failures": self.consecutive_failures,
+            "consecutive_ups": self.consecutive_ups,
+            "has_active_incident": self.active_incident is not None,
+            "active_incident_id": self.active_incident.id if self.active_incident else None,
+            "consecutive_degraded": self.consecutive_degraded,
+            "has_active_degradation": self.active_degradation is not None,
+            "window_size": len(self.window),
+            "window_failure_rate": round(failures / len(self.window), 4) if self.window else None,
+            "window_avg_latency_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "window_max_latency_ms": round(latencies[-1], 2) if latencies else None,
+            "source": "local" if self.fed_locally else "db",
+        }
+
+
+def build_service_state(
+    service: str,
+    checks: List[HealthCheck],
+    active_incident: Optional[Incident],
+    active_degradation: Optional[Incident] = None,
+) -> ServiceHealthState:
+    """Arma el estado desde los últimos checks (más reciente primero) y los incidentes activos"""
+    state = ServiceHealthState(service=service, loaded_at=time.monotonic())
+    for check in reversed(checks):
+        state.record(check.status, check.is_failure(), check.timestamp, check.latency_ms)
+    state.fed_locally = False
+    state.active_incident = active_incident
+    state.active_degradation = active_degradation
+    return state
+
+
+def load_service_state(service: str) -> ServiceHealthState:
+    """Reconstruye el estado de un servicio desde SQLite (últimos N checks + incidentes activos)"""
+    return build_service_state(
+        service,
+        get_recent_health_checks(service, HEALTH_STATE_WINDOW_SIZE),
+        get_active_incident(service),
+        get_active_incident(service, INCIDENT_DEGRADATION),
+    )
+
+
+class HealthStateRegistry:
+    """Estados por servicio del proceso, protegidos por un único lock"""
+
+    def __init__(self):
+        self._states: Dict[str, ServiceHealthState] = {}
+        # Reentrante: el detector toma el lock y vuelve a pedir el estado
+        self.lock = RLock()
+
+    def get(self, service: str, max_age: Optional[float] = None) -> ServiceHealthState:
+        """
+        Estado del servicio; se carga desde la DB si no existe o si no se
+        alimenta localmente y tiene más de `max_age` segundos.
+        """
+        with self.lock:
+            state = self._states.get(service)
+            if self._needs_load(state, max_age):
+                state = self._states[service] = load_service_state(service)
+            return state
+
+    @staticmethod
+    def _needs_load(state: Optional[ServiceHealthState], max_age: Optional[float]) -> bool:
+        if state is None:
+            return True
+        return (
+            not state.fed_locally
+            and max_age is not None
+            and time.monotonic() - state.loaded_at > max_age
+        )
+
+    def peek(self, service: str) -> Optional[ServiceHealthState]:
+        """Estado en memoria sin tocar la DB (None si el proceso no lo cargó)"""
+        with self.lock:
+            return self._states.get(service)
+
+    def rebuild(self, services: Iterable[str]) -> None:
+        """
+        Reconstruye desde la DB los estados de los servicios indicados
+        (arranque): dos consultas en total, sin importar cuántos servicios haya.
+        """
+        services = list(services)
+        checks = get_recent_health_checks_for_services(services, HEALTH_STATE_WINDOW_SIZE)
+        active: Dict[tuple, Incident] = {}
+        # Vienen del más reciente al más antiguo: queda el último activo por servicio y tipo
+        for incident in get_active_incidents(services, incident_type=None):
+            active.setdefault((incident.service, incident.incident_type), incident)
+        with self.lock:
+            for service in services:
+                self._states[service] = build_service_state(
+                    service,
+                    checks[service],
+                    active.get((service, INCIDENT_OUTAGE)),
+                    active.get((service, INCIDENT_DEGRADATION)),
+                )
+
+    def reset(self, service: Optional[str] = None) -> None:
+        with self.lock:
+            if service is None:
+                self._states.clear()
+            else:
+                self._states.pop(service, None)
+
+    def snapshot(self, services: Iterable[str], max_age: Optional[float] = None) -> List[dict]:
+        services = list(services)
+        with self.lock:
+            # Los estados vencidos se recargan juntos (consultas constantes)
+            stale = [s for s in services if self._needs_load(self._states.get(s), max_age)]
+            if stale:
+                self.rebuild(stale)
+            return [self._states[service].snapshot() for service in services]
+
+
+health_registry = HealthStateRegistry()
@@ -1,23 +1,57 @@
-"""Detector de incidentes basado en N fallas consecutivas + Recovery automático"""
+"""Detector de incidentes basado en N fallas consecutivas + Recovery automático
+
+Las decisiones se toman sobre el estado en memoria de cada servicio
+(app/monitor/health_state.py): ventana de los últimos checks + rachas.
+
+- ingest_check_result / ingest_echo_results: guiado por eventos. Cada check nuevo
+  se agrega al estado del servicio y la DB sólo se toca cuando la racha cruza
+  un umbral (crear o resolver incidente). Costo O(1) por check.
+- evaluate_service_health / check_all_services: re-evaluación a demanda sobre el
+  mismo estado (endpoint /evaluate); en procesos que no reciben checks el
+  estado se refresca desde SQLite si tiene más de HEALTH_STATE_REFRESH_SECONDS.
+
+Flapping: FlapTracker cuenta los cambios UP <-> falla de cada servicio. Con
+FLAP_THRESHOLD cambios dentro de FLAP_WINDOW_SECONDS el servicio está
+flapping y su incidente activo no se resuelve (hold-down) hasta que pasen
+FLAP_HOLD_DOWN_SECONDS sin cambios: las re-fallas rápidas quedan dentro del
+mismo incidente en vez de abrir uno nuevo (y disparar otro restart) cada vez.
+
+Degradación: los checks DEGRADED (latencia anómala, ver latency_anomaly) no
+son fallas y tienen su propia racha. Con DEGRADATION_CHECK_THRESHOLD
+consecutivos se abre un incidente DEGRADATION (sin recovery; MTTD desde el
+primer check degradado) que se resuelve con RECOVERY_CHECK_THRESHOLD checks
+normales, o al abrirse una caída (la degradación escaló).
+"""
 
 import logging
-from typing import Optional, Tuple
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
 
-from app.models.monitoring import Incident
+from app.models.monitoring import FAILURE_STATUSES, INCIDENT_DEGRADATION, FlapState, Incident
 from app.worker.db import (
-    count_consecutive_failures,
-    get_active_incident,
+    attach_recovery_result,
+    get_active_incidents,
+    save_flap_state,
     save_incident,
     update_incident,
-    get_recent_health_checks,
 )
 from app.constants.queues import (
     CONSECUTIVE_FAILURES_THRESHOLD,
+    DEGRADATION_CHECK_THRESHOLD,
+    FLAP_HOLD_DOWN_SECONDS,
+    FLAP_THRESHOLD,
+    FLAP_WINDOW_SECONDS,
+    HEALTH_STATE_REFRESH_SECONDS,
     RECOVERY_CHECK_THRESHOLD,
     SEVERITY_CRITICAL,
     SEVERITY_WARNING,
 )
-from app.monitor.recovery import recover_service
+from app.monitor.health_state import ServiceHealthState, health_registry
+from app.monitor.cluster import get_cluster
+from app.monitor.recovery_executor import RECOVERY_DEFERRED, submit_recovery
 
 logger = logging.getLogger(__name__)
 
@@ -25,118 +59,376 @@ logger = logging.getLogger(__name__)
 AUTO_RECOVERY_ENABLED = True
 
 
+def _epoch_to_iso(epoch: float) -> str:
+    return datetime.utcfromtimestamp(epoch).isoformat() + "Z"
+
+
+class FlapTracker:
+    """Frecuencia de cambios de estado por servicio (ventana deslizante + hold-down)"""
+
+    def __init__(
+        self,
+        window_seconds: float = FLAP_WINDOW_SECONDS,
+        threshold: int = FLAP_THRESHOLD,
+        hold_down_seconds: float = FLAP_HOLD_DOWN_SECONDS,
+        clock: Callable[[], float] = time.time,
+        persist: Callable[[FlapState], None] = save_flap_state,
+    ):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.hold_down_seconds = hold_down_seconds
+        self.clock = clock
+        self.persist = persist
+        self._transitions: Dict[str, Deque[float]] = {}
+        self._states: Dict[str, FlapState] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, service: str, now: float) -> Deque[float]:
+        transitions = self._transitions.setdefault(service, deque())
+        while transitions and now - transitions[0] > self.window_seconds:
+            transitions.popleft()
+        return transitions
+
+    def _save(self, state: FlapState, now: float) -> None:
+        state.updated_at = _epoch_to_iso(now)
+        try:
+            self.persist(state)
+        except Exception as e:
+            logger.error(f"Could not persist flap state of {state.service}: {e}")
+
+    def record_transition(self, service: str) -> FlapState:
+        """Registra un cambio UP <-> falla del servicio"""
+        now = self.clock()
+        with self._lock:
+            transitions = self._prune(service, now)
+            transitions.append(now)
+            state = self._states.setdefault(service, FlapState(service=service))
+            state.transitions = len(transitions)
+            state.last_transition_at = _epoch_to_iso(now)
+            if not state.flapping and state.transitions >= self.threshold:
+                state.flapping = True
+                state.flapping_since = state.last_transition_at
+                state.episodes += 1
+                logger.warning(
+                    f"🔁 FLAPPING: {service} - {state.transitions} state changes "
+                    f"in {self.window_seconds:.0f}s"
+                )
+            self._save(state, now)
+            return state
+
+    def is_flapping(self, service: str) -> bool:
+        """True mientras haya FLAP_THRESHOLD cambios en la ventana o no pasó el hold-down"""
+        now = self.clock()
+        with self._lock:
+            state = self._states.get(service)
+            if state is None or not state.flapping:
+                return False
+            transitions = self._transitions.get(service)
+            last_transition = transitions[-1] if transitions else 0.0
+            transitions = self._prune(service, now)
+            if len(transitions) >= self.threshold or now - last_transition < self.hold_down_seconds:
+                return True
+            state.flapping = False
+            state.flapping_since = None
+            state.transitions = len(transitions)
+            self._save(state, now)
+        logger.info(f"✅ {service} stopped flapping")
+        return False
+
+    def snapshot(self, service: str) -> dict:
+        state = self._states.get(service)
+        return state.to_dict() if state else FlapState(service=service).to_dict()
+
+    def reset(self, service: Optional[str] = None) -> None:
+        with self._lock:
+            if service is None:
+                self._transitions.clear()
+                self._states.clear()
+            else:
+                self._transitions.pop(service, None)
+                self._states.pop(service, None)
+
+
+flap_tracker = FlapTracker()
+
+
+def reset_detector_state(service: Optional[str] = None) -> None:
+    """Descarta el estado en memoria (se reconstruye desde la DB en el próximo check)"""
+    health_registry.reset(service)
+    flap_tracker.reset(service)
+
+
+def is_suspect(service: str) -> bool:
+    """
+    True si el servicio tiene una racha de fallas o un incidente activo según
+    el estado en memoria (sin tocar la DB; False si el proceso no lo vio aún).
+    """
+    state = health_registry.peek(service)
+    return state is not None and (
+        state.consecutive_failures > 0 or state.active_incident is not None
+    )
+
+
+def _open_incident(
+    service: str,
+    consecutive_failures: int,
+    first_failure_ts: str,
+    trigger_recovery: bool,
+) -> Tuple[Incident, Optional[dict]]:
+    """Crea y persiste un incidente; encola el recovery si corresponde"""
+    recovery_result = None
+    severity = (
+        SEVERITY_CRITICAL
+        if consecutive_failures >= CONSECUTIVE_FAILURES_THRESHOLD * 2
+        else SEVERITY_WARNING
+    )
+    incident = Incident.create(
+        service=service,
+        first_failure_time=first_failure_ts,
+        consecutive_failures=consecutive_failures,
+        severity=severity,
+    )
+    incident_id = save_incident(incident)
+    incident.id = incident_id
+
+    logger.warning(
+        f"🚨 INCIDENT CREATED: {service} - "
+        f"{consecutive_failures} consecutive failures - "
+        f"MTTD: {incident.mttd_seconds:.2f}s"
+    )
+
+    # RECOVERY AUTOMÁTICO: se encola, el resultado llega asíncrono al incidente.
+    # Sólo el líder del cluster de monitores actúa; si esta instancia no lo
+    # es, el incidente queda DEFERRED y lo toma recover_deferred_incidents()
+    if AUTO_RECOVERY_ENABLED and trigger_recovery:
+        if get_cluster().is_leader():
+            logger.info(f"🔄 Submitting automatic recovery for {service}")
+            recovery_result = submit_recovery(service, incident_id=incident.id)
+        else:
+            logger.info(f"⏸️ Recovery for {service} deferred to the cluster leader")
+            attach_recovery_result(incident.id, RECOVERY_DEFERRED, None)
+            incident.recovery_status = RECOVERY_DEFERRED
+
+    return incident, recovery_result
+
+
+def recover_deferred_incidents() -> List[dict]:
+    """
+    En el líder: encola el recovery de los incidentes activos que abrió una
+    instancia no líder. Retorna los tickets de los pedidos encolados.
+    """
+    if not AUTO_RECOVERY_ENABLED or not get_cluster().is_leader():
+        return []
+    tickets = []
+    for incident in get_active_incidents():
+        if incident.recovery_status == RECOVERY_DEFERRED:
+            logger.info(f"🔄 Leader taking over deferred recovery for {incident.service} (incident {incident.id})")
+            tickets.append(submit_recovery(incident.service, incident_id=incident.id))
+    return tickets
+
+
+def _resolve_incident(service: str, incident: Incident, action: str = "auto-recovery") -> Incident:
+    """Marca un incidente como resuelto y lo persiste"""
+    incident.resolve(action=action)
+    update_incident(incident)
+
+    label = "DEGRADATION" if incident.incident_type == INCIDENT_DEGRADATION else "INCIDENT"
+    logger.info(
+        f"✅ {label} RESOLVED: {service} ({action}) - "
+        f"MTTR: {incident.mttr_seconds:.2f}s"
+    )
+    return incident
+
+
+def _open_degradation(service: str, consecutive_degraded: int, first_degraded_ts: str) -> Incident:
+    """Crea y persiste un incidente de degradación (no dispara recovery)"""
+    incident = Incident.create(
+        service=service,
+        first_failure_time=first_degraded_ts,
+        consecutive_failures=consecutive_degraded,
+        severity=SEVERITY_WARNING,
+        incident_type=INCIDENT_DEGRADATION,
+    )
+    incident.id = save_incident(incident)
+    logger.warning(
+        f"🐢 DEGRADATION DETECTED: {service} - "
+        f"{consecutive_degraded} consecutive slow checks - "
+        f"MTTD: {incident.mttd_seconds:.2f}s"
+    )
+    return incident
+
+
+def _apply_degradation_thresholds(state: ServiceHealthState) -> Optional[Tuple[str, Incident]]:
+    """Abre o resuelve el incidente de degradación; None si no hubo cambios"""
+    service = state.service
+    if state.active_degradation is None:
+        if state.consecutive_degraded >= DEGRADATION_CHECK_THRESHOLD and state.active_incident is None:
+            state.active_degradation = _open_degradation(
+                service, state.consecutive_degraded, state.first_degraded_ts
+            )
+            return "degradation_created", state.active_degradation
+        return None
+
+    if state.active_incident is not None:
+        # La degradación terminó en caída: la sigue el incidente OUTAGE
+        action, resolution = "degradation_escalated", "escalated"
+    elif state.consecutive_normal >= RECOVERY_CHECK_THRESHOLD:
+        action, resolution = "degradation_resolved", "auto-recovery"
+    else:
+        return None
+    incident = _resolve_incident(service, state.active_degradation, action=resolution)
+    state.active_degradation = None
+    return action, incident
+
+
+def _evaluate_state(
+    state: ServiceHealthState, trigger_recovery: bool
+) -> Tuple[str, Optional[Incident], Optional[dict]]:
+    """Umbrales de caída y luego de degradación; la acción de la caída tiene prioridad"""
+    outcome = _apply_thresholds(state, trigger_recovery)
+    degradation = _apply_degradation_thresholds(state)
+    if degradation is not None and outcome[0] == "healthy":
+        return degradation[0], degradation[1], None
+    return outcome
+
+
+def _apply_thresholds(
+    state: ServiceHealthState, trigger_recovery: bool
+) -> Tuple[str, Optional[Incident], Optional[dict]]:
+    """Decide sobre el estado del servicio: crear, mantener o resolver incidente"""
+    service = state.service
+    if state.consecutive_failures >= CONSECUTIVE_FAILURES_THRESHOLD:
+        if state.active_incident is not None:
+            return "incident_ongoing", state.active_incident, None
+        incident, recovery_result = _open_incident(
+            service, state.consecutive_failures, state.first_failure_ts, trigger_recovery
+        )
+        state.active_incident = incident
+        return "incident_created", incident, recovery_result
+
+    if state.active_incident is None:
+        return "healthy", None, None
+    if state.consecutive_ups < RECOVERY_CHECK_THRESHOLD:
+        return "incident_ongoing", state.active_incident, None
+    if flap_tracker.is_flapping(service):
+        # Hold-down: el incidente sigue abierto; una re-falla se suma a él
+        return "incident_held", state.active_incident, None
+
+    incident = _resolve_incident(service, state.active_incident)
+    state.active_incident = None
+    return "incident_resolved", incident, None
+
+
 def evaluate_service_health(service: str, trigger_recovery: bool = True) -> Tuple[str, Optional[Incident], Optional[dict]]:
     """
     Evalúa la salud de un servicio y detecta/resuelve incidentes.
-    
+
     Args:
         service: Nombre del servicio a evaluar
         trigger_recovery: Si True, dispara recovery automático al crear incidente
-    
+
     Returns:
         Tuple[str, Optional[Incident], Optional[dict]]: (acción tomada, incidente si aplica, resultado recovery)
-        - acciones: "healthy", "incident_created", "incident_resolved", "incident_ongoing"
+        - acciones: "healthy", "incident_created", "incident_resolved", "incident_ongoing",
+          "incident_held" (recuperado pero flapping: se mantiene abierto),
+          "degradation_created", "degradation_resolved", "degradation_escalated"
     """
-    recovery_result = None
-    
-    # Contar fallas consecutivas
-    consecutive_failures, first_failure_ts = count_consecutive_failures(
-        service, CONSECUTIVE_FAILURES_THRESHOLD
-    )
-    
-    # Obtener incidente activo si existe
-    active_incident = get_active_incident(service)
-    
-    # CASO 1: Hay fallas suficientes para crear/mantener incidente
-    if consecutive_failures >= CONSECUTIVE_FAILURES_THRESHOLD:
-        if active_incident is None:
-            # Crear nuevo incidente
-            severity = (
-                SEVERITY_CRITICAL 
-                if consecutive_failures >= CONSECUTIVE_FAILURES_THRESHOLD * 2 
-                else SEVERITY_WARNING
-            )
-            incident = Incident.create(
-                service=service,
-                first_failure_time=first_failure_ts,
-                consecutive_failures=consecutive_failures,
-                severity=severity,
-            )
-            incident_id = save_incident(incident)
-            incident.id = incident_id
-            
-            logger.warning(
-                f"🚨 INCIDENT CREATED: {service} - "
-                f"{consecutive_failures} consecutive failures - "
-                f"MTTD: {incident.mttd_seconds:.2f}s"
-            )
-            
-            # RECOVERY AUTOMÁTICO
-            if AUTO_RECOVERY_ENABLED and trigger_recovery:
-                logger.info(f"🔄 Triggering automatic recovery for {service}")
-                recovery_result = recover_service(service, incident_id=incident.id)
-                
-                if recovery_result.get("success"):
-                    logger.info(f"✅ Recovery initiated for {service}")
-                else:
-                    logger.error(f"❌ Recovery failed for {service}: {recovery_result.get('error')}")
-            
-            return "incident_created", incident, recovery_result
-        else:
-            # Incidente ya existe, sigue activo
-            logger.info(f"⚠️ INCIDENT ONGOING: {service} - {consecutive_failures} failures")
-            return "incident_ongoing", active_incident, None
-    
-    # CASO 2: No hay suficientes fallas
-    else:
-        if active_incident is not None:
-            # Verificar si hay suficientes UPs para resolver
-            recent_checks = get_recent_health_checks(service, RECOVERY_CHECK_THRESHOLD)
-            consecutive_ups = sum(1 for c in recent_checks if not c.is_failure())
-            
-            if consecutive_ups >= RECOVERY_CHECK_THRESHOLD:
-                # Resolver incidente
-                active_incident.resolve(action="auto-recovery")
-                update_incident(active_incident)
-                
-                logger.info(
-                    f"✅ INCIDENT RESOLVED: {service} - "
-                    f"MTTR: {active_incident.mttr_seconds:.2f}s"
-                )
-                
-                return "incident_resolved", active_incident, None
-            else:
-                # Aún no hay suficientes UPs
-                return "incident_ongoing", active_incident, None
-        else:
-            # Todo healthy
-            return "healthy", None, None
+    with health_registry.lock:
+        state = health_registry.get(service, max_age=HEALTH_STATE_REFRESH_SECONDS)
+        return _evaluate_state(state, trigger_recovery)
+
+
+def ingest_check_result(
+    service: str,
+    is_failure: bool,
+    timestamp: str,
+    trigger_recovery: bool = True,
+    status: Optional[str] = None,
+    latency_ms: Optional[float] = None,
+) -> Tuple[str, Optional[Incident], Optional[dict]]:
+    """
+    Incorpora un check recién obtenido al estado del servicio.
+
+    Sólo se accede a la DB cuando la racha cruza un umbral: al llegar a
+    CONSECUTIVE_FAILURES_THRESHOLD fallas (crear incidente) o a
+    RECOVERY_CHECK_THRESHOLD UPs con un incidente activo (resolverlo).
+
+    Returns:
+        Igual que evaluate_service_health: (acción, incidente, resultado recovery)
+    """
+    status = status or ("DOWN" if is_failure else "UP")
+    with health_registry.lock:
+        state = health_registry.get(service)
+        previous = state.last
+        state.record(status, is_failure, timestamp, latency_ms)
+        if previous is not None and previous.is_failure != is_failure:
+            flap_tracker.record_transition(service)
+        return _evaluate_state(state, trigger_recovery)
+
+
+def _summarize(action: str, incident: Optional[Incident], recovery_result: Optional[dict]) -> dict:
+    return {
+        "action": action,
+        "has_active_incident": incident is not None and incident.is_active() if incident else False,
+        "incident_id": incident.id if incident else None,
+        "mttd_seconds": incident.mttd_seconds if incident else None,
+        "mttr_seconds": incident.mttr_seconds if incident else None,
+        "recovery_triggered": bool(recovery_result and recovery_result.get("submitted")),
+        "recovery_status": recovery_result.get("status") if recovery_result else None,
+    }
+
+
+def ingest_echo_results(
+    results: List[dict],
+    timestamp: str,
+    skip_services: Iterable[str] = (),
+    trigger_recovery: bool = True,
+) -> dict:
+    """
+    Incorpora los resultados que trae un echo (sin releer SQLite).
+
+    Args:
+        results: Lista de {"service", "status", "is_failure", ...} del payload del echo
+        timestamp: Timestamp del echo
+        skip_services: Servicios que se evalúan por otra vía (p.ej. ping HTTP directo)
+
+    Returns:
+        dict con el estado de cada servicio incluido en el echo
+    """
+    skip = set(skip_services)
+    summary = {}
+    for result in results:
+        service = result.get("service")
+        if not service or service in skip:
+            continue
+        is_failure = result.get("is_failure")
+        if is_failure is None:
+            is_failure = result.get("status") in FAILURE_STATUSES
+        summary[service] = _summarize(*ingest_check_result(
+            service,
+            bool(is_failure),
+            timestamp,
+            trigger_recovery,
+            status=result.get("status"),
+            latency_ms=result.get("latency_ms"),
+        ))
+    return summary
 
 
 def check_all_services(services: list[str], trigger_recovery: bool = True) -> dict:
     """
     Evalúa la salud de todos los servicios.
-    
+
     Args:
         services: Lista de servicios a evaluar
         trigger_recovery: Si True, dispara recovery automático al detectar incidente
-    
+
     Returns:
         dict con el estado de cada servicio
     """
     results = {}
-    
+
     for service in services:
-        action, incident, recovery_result = evaluate_service_health(service, trigger_recovery)
-        
-        results[service] = {
-            "action": action,
-            "has_active_incident": incident is not None and incident.is_active() if incident else False,
-            "incident_id": incident.id if incident else None,
-            "mttd_seconds": incident.mttd_seconds if incident else None,
-            "mttr_seconds": incident.mttr_seconds if incident else None,
-            "recovery_triggered": recovery_result is not None,
-            "recovery_success": recovery_result.get("success") if recovery_result else None,
-        }
-    
+        results[service] = _summarize(*evaluate_service_health(service, trigger_recovery))
+
     return results
@@ -0,0 +1,157 @@
+"""Analítica de latencia de health checks con NumPy (columnar)
+
+Las columnas service / timestamp / latency_ms / falla se leen de SQLite en
+lotes (fetchmany) y se acumulan como arrays, sin un HealthCheck por fila, así
+la memoria y el costo siguen siendo razonables para ventanas largas.
+
+Sobre esos arrays se calculan percentiles (p50/p90/p95/p99), tasa de fallas e
+histogramas de latencia por servicio y por bucket de tiempo. Los buckets del
+histograma son los mismos que usan las métricas de tasks (BUCKETS_MS).
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.worker.db import iter_health_check_columns
+from app.worker.task_metrics import BUCKETS_MS
+
+PERCENTILES = (50, 90, 95, 99)
+FETCH_BATCH_SIZE = 5000
+
+_BUCKET_EDGES = np.array(BUCKETS_MS, dtype=float)
+_BUCKET_LABELS = [str(b) for b in BUCKETS_MS] + ["+Inf"]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+@dataclass
+class HealthCheckColumns:
+    """Health checks de una ventana como arrays paralelos"""
+    service: np.ndarray  # str
+    ts: np.ndarray  # epoch en segundos (float64)
+    latency_ms: np.ndarray  # float64, NaN si el check no tiene latencia
+    failure: np.ndarray  # bool
+
+    @staticmethod
+    def empty() -> "HealthCheckColumns":
+        return HealthCheckColumns(
+            service=np.array([], dtype=str),
+            ts=np.array([], dtype=float),
+            latency_ms=np.array([], dtype=float),
+            failure=np.array([], dtype=bool),
+        )
+
+    def __len__(self) -> int:
+        return len(self.failure)
+
+    def take(self, index: np.ndarray) -> "HealthCheckColumns":
+        return HealthCheckColumns(self.service[index], self.ts[index], self.latency_ms[index], self.failure[index])
+
+    def summary(self) -> dict:
+        """Conteos, tasa de fallas y percentiles de latencia"""
+        count = len(self)
+        failures = int(self.failure.sum())
+        latencies = self.latency_ms[~np.isnan(self.latency_ms)]
+        if latencies.size:
+            values = np.percentile(latencies, PERCENTILES)
+            percentiles = {f"p{p}_ms": _round(v) for p, v in zip(PERCENTILES, values)}
+            avg, max_ = latencies.mean(), latencies.max()
+        else:
+            percentiles = {f"p{p}_ms": None for p in PERCENTILES}
+            avg = max_ = None
+        return {
+            "count": count,
+            "failures": failures,
+            "failure_rate": round(failures / count, 4) if count else None,
+            "avg_latency_ms": _round(avg),
+            **percentiles,
+            "max_latency_ms": _round(max_),
+        }
+
+    def histogram(self) -> Dict[str, int]:
+        """Cantidad de checks por bucket de latencia (límite superior inclusivo)"""
+        latencies = self.latency_ms[~np.isnan(self.latency_ms)]
+        index = np.searchsorted(_BUCKET_EDGES, latencies, side="left")
+        counts = np.bincount(index, minlength=len(_BUCKET_LABELS))
+        return dict(zip(_BUCKET_LABELS, (int(c) for c in counts)))
+
+    def _groups(self, keys: np.ndarray) -> Iterator[Tuple[object, "HealthCheckColumns"]]:
+        """Agrupa por clave con un único sort (sin una máscara por grupo)"""
+        if not len(self):
+            return
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(sorted_keys)]
+        for start, end in zip(starts, ends):
+            yield sorted_keys[start], self.take(order[start:end])
+
+    def by_service(self) -> Dict[str, "HealthCheckColumns"]:
+        return {str(service): group for service, group in self._groups(self.service)}
+
+    def by_time_bucket(self, bucket_seconds: float, start: float) -> Dict[float, "HealthCheckColumns"]:
+        """Grupos por bucket de tiempo; la clave es el inicio del bucket (epoch)"""
+        buckets = np.floor((self.ts - start) / bucket_seconds).astype(np.int64)
+        return {start + int(b) * bucket_seconds: group for b, group in self._groups(buckets)}
+
+
+def load_health_check_columns(
+    since: datetime,
+    services: Optional[List[str]] = None,
+    batch_size: int = FETCH_BATCH_SIZE,
+) -> HealthCheckColumns:
+    """Carga los checks desde `since` (UTC naive) como columnas"""
+    chunks = []
+    for rows in iter_health_check_columns(since.isoformat() + "Z", services, batch_size):
+        service, ts, latency, failure = zip(*rows)
+        chunks.append((
+            np.array(service, dtype=str),
+            np.array(ts, dtype=float),
+            np.array(latency, dtype=float),  # None -> NaN
+            np.array(failure, dtype=bool),
+        ))
+    if not chunks:
+        return HealthCheckColumns.empty()
+    return HealthCheckColumns(*(np.concatenate(column) for column in zip(*chunks)))
+
+
+def get_latency_analytics(window_hours: float, services: List[str]) -> Dict[str, dict]:
+    """Resumen + histograma por servicio para la ventana (una sola lectura)"""
+    columns = load_health_check_columns(datetime.utcnow() - timedelta(hours=window_hours), services)
+    groups = columns.by_service()
+    results = {}
+    for service in services:
+        group = groups.get(service, HealthCheckColumns.empty())
+        results[service] = {**group.summary(), "histogram_le_ms": group.histogram()}
+    return results
+
+
+def get_service_latency_report(service: str, window_hours: float = 1, bucket_minutes: float = 5) -> dict:
+    """Percentiles, histograma y serie temporal por bucket de un servicio"""
+    now = datetime.utcnow()
+    since = now - timedelta(hours=window_hours)
+    columns = load_health_check_columns(since, [service])
+    bucket_seconds = bucket_minutes * 60
+    start = (since - datetime(1970, 1, 1)).total_seconds()
+
+    series = []
+    for bucket_start, group in columns.by_time_bucket(bucket_seconds, start).items():
+        series.append({
+            "bucket_start": datetime.utcfromtimestamp(bucket_start).isoformat() + "Z",
+            **group.summary(),
+        })
+
+    return {
+        "service": service,
+        "window_hours": window_hours,
+        "bucket_minutes": bucket_minutes,
+        "timestamp": now.isoformat() + "Z",
+        "summary": columns.summary(),
+        "histogram_le_ms": columns.histogram(),
+        "buckets": series,
+    }
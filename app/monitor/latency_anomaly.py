@@ -0,0 +1,148 @@
+"""Detección online de latencia anómala por servicio
+
+Cada servicio tiene una línea base de latencia con media y varianza
+exponencialmente ponderadas (EWMA): actualizarla cuesta O(1) y ocupa tres
+números por servicio, sin guardar historial.
+
+Un check UP se marca DEGRADED cuando, pasado el warm-up, su latencia está a la
+vez LATENCY_ANOMALY_SIGMAS desvíos sobre la media, LATENCY_ANOMALY_MIN_RATIO
+veces la media y por encima de LATENCY_ANOMALY_MIN_MS. Las muestras anómalas
+no alimentan la línea base: una degradación sostenida sigue siendo anómala en
+vez de volverse "normal" a los pocos checks. Pasadas LATENCY_REBASELINE_AFTER
+anomalías seguidas sí la alimentan, con el peso menor LATENCY_REBASELINE_ALPHA:
+un cambio de nivel permanente (p.ej. un deploy más lento) deja de ser DEGRADED
+al cabo de un rato en vez de quedar degradado para siempre.
+
+La línea base vive en memoria; al arrancar el monitor la reconstruye con seed()
+a partir de los últimos checks UP guardados.
+
+Lo usa el ProbeEngine antes de persistir cada ronda; el detector de incidentes
+trata los checks DEGRADED como una racha aparte (incidentes DEGRADATION).
+"""
+
+import math
+import threading
+from typing import Dict, Iterable, Optional
+
+from app.constants.queues import (
+    LATENCY_ANOMALY_MIN_MS,
+    LATENCY_ANOMALY_MIN_RATIO,
+    LATENCY_ANOMALY_SIGMAS,
+    LATENCY_BASELINE_WARMUP,
+    LATENCY_EWMA_ALPHA,
+    LATENCY_REBASELINE_AFTER,
+    LATENCY_REBASELINE_ALPHA,
+)
+
+
+class LatencyBaseline:
+    """Media y varianza EWMA de la latencia de un servicio"""
+
+    __slots__ = ("mean", "variance", "samples", "anomalies", "anomaly_streak")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.samples = 0
+        self.anomalies = 0
+        self.anomaly_streak = 0
+
+    def update(self, value: float, alpha: float) -> None:
+        if self.samples == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.variance = (1 - alpha) * (self.variance + diff * increment)
+        self.samples += 1
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> dict:
+        return {
+            "mean_ms": round(self.mean, 2),
+            "stddev_ms": round(self.stddev, 2),
+            "samples": self.samples,
+            "anomalies": self.anomalies,
+            "anomaly_streak": self.anomaly_streak,
+        }
+
+
+class LatencyAnomalyDetector:
+    """Líneas base por servicio; observe() decide si una latencia es anómala"""
+
+    def __init__(
+        self,
+        alpha: float = LATENCY_EWMA_ALPHA,
+        warmup: int = LATENCY_BASELINE_WARMUP,
+        sigmas: float = LATENCY_ANOMALY_SIGMAS,
+        min_ratio: float = LATENCY_ANOMALY_MIN_RATIO,
+        min_latency_ms: float = LATENCY_ANOMALY_MIN_MS,
+        rebaseline_after: int = LATENCY_REBASELINE_AFTER,
+        rebaseline_alpha: float = LATENCY_REBASELINE_ALPHA,
+    ):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.sigmas = sigmas
+        self.min_ratio = min_ratio
+        self.min_latency_ms = min_latency_ms
+        self.rebaseline_after = rebaseline_after
+        self.rebaseline_alpha = rebaseline_alpha
+        self._baselines: Dict[str, LatencyBaseline] = {}
+        self._lock = threading.Lock()
+
+    def _is_anomalous(self, baseline: LatencyBaseline, latency_ms: float) -> bool:
+        return (
+            baseline.samples >= self.warmup
+            and latency_ms >= self.min_latency_ms
+            and latency_ms >= baseline.mean * self.min_ratio
+            and latency_ms > baseline.mean + self.sigmas * baseline.stddev
+        )
+
+    def observe(self, service: str, latency_ms: Optional[float]) -> bool:
+        """Incorpora la latencia de un check exitoso; True si es anómala"""
+        if latency_ms is None:
+            return False
+        with self._lock:
+            baseline = self._baselines.get(service)
+            if baseline is None:
+                baseline = self._baselines[service] = LatencyBaseline()
+            if self._is_anomalous(baseline, latency_ms):
+                baseline.anomalies += 1
+                baseline.anomaly_streak += 1
+                if baseline.anomaly_streak >= self.rebaseline_after:
+                    baseline.update(latency_ms, self.rebaseline_alpha)
+                return True
+            baseline.anomaly_streak = 0
+            baseline.update(latency_ms, self.alpha)
+            return False
+
+    def seed(self, service: str, latencies: Iterable[float]) -> None:
+        """Reconstruye la línea base desde latencias históricas (la más vieja primero) si aún no hay una"""
+        with self._lock:
+            if service in self._baselines:
+                return
+            baseline = self._baselines[service] = LatencyBaseline()
+            for latency_ms in latencies:
+                baseline.update(latency_ms, self.alpha)
+
+    def baseline(self, service: str) -> Optional[dict]:
+        baseline = self._baselines.get(service)
+        return baseline.to_dict() if baseline else None
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {service: baseline.to_dict() for service, baseline in self._baselines.items()}
+
+    def reset(self, service: Optional[str] = None) -> None:
+        with self._lock:
+            if service is None:
+                self._baselines.clear()
+            else:
+                self._baselines.pop(service, None)
+
+
+latency_detector = LatencyAnomalyDetector()
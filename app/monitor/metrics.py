@@ -1,12 +1,27 @@
 """Cálculo de métricas de disponibilidad: MTTD, MTTR, Availability"""
 
+import math
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from app.models.monitoring import Incident, HealthCheck
-from app.worker.db import get_incidents_by_service, get_all_incidents, get_recent_health_checks
-from app.constants.queues import MONITORED_SERVICES
+from app.models.monitoring import INCIDENT_DEGRADATION, FlapState, Incident, IncidentAggregate, HealthCheck
+from app.worker.db import (
+    get_flap_states,
+    get_health_check_window_stats,
+    get_incident_aggregates,
+    get_incident_window_stats,
+    get_ping_flights,
+)
+from app.worker.task_metrics import BUCKETS_MS, Histogram
+from app.constants.queues import (
+    MONITORED_SERVICES,
+    ECHO_TIMEOUT_SECONDS,
+    FLAP_HOLD_DOWN_SECONDS,
+    FLAP_WINDOW_SECONDS,
+    PING_ECHO_LOST_AFTER_SECONDS,
+)
 
 
 @dataclass
@@ -39,6 +54,14 @@ class ServiceMetrics:
     successful_checks: int
     failed_checks: int
     avg_latency_ms: Optional[float]
+    # Percentiles / histograma de latencia en la ventana (estimados por bucket)
+    latency: Optional[dict] = None
+    # Acumuladores de todo el historial (incident_aggregates)
+    lifetime: Optional[dict] = None
+    # Estado de flapping (service_flaps)
+    flapping: Optional[dict] = None
+    # Incidentes de degradación (latencia anómala) en la ventana, con su propio MTTD/MTTR
+    degradation: Optional[dict] = None
 
     def to_dict(self) -> dict:
         return {
@@ -59,6 +82,9 @@ class ServiceMetrics:
                 "max_seconds": round(self.mttr_max, 2) if self.mttr_max else None,
             },
             "mtbf_avg_seconds": round(self.mtbf_avg, 2) if self.mtbf_avg else None,
+            "lifetime": self.lifetime,
+            "flapping": self.flapping,
+            "degradation": self.degradation,
             "availability": {
                 "percent": round(self.availability_percent, 4),
                 "total_downtime_seconds": round(self.total_downtime_seconds, 2),
@@ -69,6 +95,7 @@ class ServiceMetrics:
                 "failed": self.failed_checks,
                 "success_rate": round(self.successful_checks / self.total_checks * 100, 2) if self.total_checks > 0 else 100.0,
                 "avg_latency_ms": round(self.avg_latency_ms, 2) if self.avg_latency_ms else None,
+                "latency": self.latency,
             },
         }
 
@@ -191,63 +218,262 @@ def calculate_health_check_stats(checks: List[HealthCheck]) -> tuple[int, int, i
     return total, successful, failed, avg_latency
 
 
-def get_service_metrics(service: str, window_hours: float = 24) -> ServiceMetrics:
-    """Obtiene todas las métricas de un servicio"""
-    incidents = get_incidents_by_service(service, limit=100)
-    checks = get_recent_health_checks(service, limit=500)
-    
-    active = [i for i in incidents if i.is_active()]
-    resolved = [i for i in incidents if not i.is_active()]
-    
-    mttd_avg, mttd_min, mttd_max = calculate_mttd(incidents)
-    mttr_avg, mttr_min, mttr_max = calculate_mttr(resolved)
-    mtbf_avg = calculate_mtbf(resolved)
-    availability, downtime = calculate_availability(incidents, window_hours)
-    total_checks, successful_checks, failed_checks, avg_latency = calculate_health_check_stats(checks)
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not sorted_values:
+        return None
+    rank = max(int(math.ceil(pct / 100 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def _distribution(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": _round(percentile(values, 50)),
+        "p95_ms": _round(percentile(values, 95)),
+        "p99_ms": _round(percentile(values, 99)),
+        "max_ms": _round(values[-1] if values else None),
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+def get_ping_rtt_metrics(window_minutes: float = 15, now: Optional[float] = None) -> dict:
+    """
+    Round-trip de los pings vía Celery (send_task -> echo) en la ventana.
+
+    - rtt: envío del ping hasta la recepción del echo en el monitor.
+    - queue_lag: envío hasta que el worker ejecutó la tarea (espera en la cola
+      de pings); el resto del RTT es la vuelta por la cola de echos.
+    - Un ping sin echo después de PING_ECHO_LOST_AFTER_SECONDS cuenta como
+      perdido; uno con RTT mayor a ECHO_TIMEOUT_SECONDS como demorado. Ambos
+      indican backlog en el broker o un worker saturado.
+    """
+    now = time.time() if now is None else now
+    flights = get_ping_flights(now - window_minutes * 60)
+
+    rtts, queue_lags = [], []
+    in_flight = lost = 0
+    oldest_in_flight = None
+    for _, sent_at, worker_at, echo_at, rtt_ms in flights:
+        if echo_at is None:
+            age = now - sent_at
+            if age > PING_ECHO_LOST_AFTER_SECONDS:
+                lost += 1
+            else:
+                in_flight += 1
+                oldest_in_flight = max(oldest_in_flight or 0.0, age)
+            continue
+        rtts.append(rtt_ms)
+        if worker_at is not None:
+            queue_lags.append(max(worker_at - sent_at, 0.0) * 1000)
+
+    lagged = sum(1 for rtt in rtts if rtt > ECHO_TIMEOUT_SECONDS * 1000)
+    settled = len(rtts) + lost
+    return {
+        "window_minutes": window_minutes,
+        "sent": len(flights),
+        "echoed": len(rtts),
+        "in_flight": in_flight,
+        "oldest_in_flight_seconds": _round(oldest_in_flight),
+        "lost": lost,
+        "lagged": lagged,
+        "loss_rate": round(lost / settled, 4) if settled else None,
+        "rtt": _distribution(rtts),
+        "queue_lag": _distribution(queue_lags),
+    }
+
+
+def _window_bounds(window_hours: float) -> tuple[str, str]:
+    now = datetime.utcnow()
+    return (now - timedelta(hours=window_hours)).isoformat() + "Z", now.isoformat() + "Z"
+
+
+def _avg(total: Optional[float], count: Optional[int]) -> Optional[float]:
+    return total / count if count else None
+
+
+def _latency_summary(stats: dict) -> dict:
+    """Percentiles estimados desde los conteos por bucket (límite superior del bucket)"""
+    histogram = Histogram()
+    histogram.merge({
+        "buckets": stats["buckets"],
+        "count": stats["latency_count"],
+        "sum_ms": stats["latency_sum"],
+        "max_ms": stats["latency_max"] or 0.0,
+    })
+    return {
+        **{f"p{p}_ms": histogram.percentile(p) for p in (50, 90, 95, 99)},
+        "max_ms": round(histogram.max_ms, 2) if histogram.count else None,
+        "histogram_le_ms": dict(zip([str(b) for b in BUCKETS_MS] + ["+Inf"], histogram.counts)),
+    }
+
+
+def _lifetime(aggregate: IncidentAggregate) -> dict:
+    return {
+        "total_incidents": aggregate.total_incidents,
+        "mttd_avg_seconds": round(aggregate.mttd_avg, 2) if aggregate.mttd_avg else None,
+        "mttr_avg_seconds": round(aggregate.mttr_avg, 2) if aggregate.mttr_avg else None,
+        "downtime_seconds": round(aggregate.downtime_seconds, 2),
+    }
+
+
+_EMPTY_CHECKS = {
+    "count": 0, "failures": 0, "latency_count": 0, "latency_sum": 0.0,
+    "latency_max": None, "buckets": [0] * (len(BUCKETS_MS) + 1),
+}
+_EMPTY_INCIDENTS = {
+    "incidents": 0, "active": 0, "resolved": 0,
+    "mttd_sum": None, "mttd_count": 0, "mttd_min": None, "mttd_max": None,
+    "mttr_sum": None, "mttr_count": 0, "mttr_min": None, "mttr_max": None,
+    "downtime_seconds": 0.0,
+}
+
+
+def _flapping(service: str, state: Optional[FlapState], now: Optional[datetime] = None) -> dict:
+    """
+    Estado de flapping para las métricas. La fila sólo se actualiza cuando el
+    detector ve un cambio o evalúa una recuperación: si el último cambio es más
+    viejo que la ventana y el hold-down, el servicio ya no está flapping.
+    """
+    state = state or FlapState(service=service)
+    result = state.to_dict()
+    if state.flapping and state.last_transition_at:
+        now = now or datetime.utcnow()
+        quiet_seconds = (now - datetime.fromisoformat(state.last_transition_at.rstrip("Z"))).total_seconds()
+        result["flapping"] = quiet_seconds < max(FLAP_WINDOW_SECONDS, FLAP_HOLD_DOWN_SECONDS)
+    return result
+
+
+def _degradation_summary(stats: dict) -> dict:
+    """Incidentes DEGRADATION de la ventana: cantidad, MTTD/MTTR y tiempo degradado"""
+    mttd = _avg(stats["mttd_sum"], stats["mttd_count"])
+    mttr = _avg(stats["mttr_sum"], stats["mttr_count"])
+    return {
+        "total": stats["incidents"],
+        "active": stats["active"],
+        "resolved": stats["resolved"],
+        "mttd_avg_seconds": round(mttd, 2) if mttd else None,
+        "mttr_avg_seconds": round(mttr, 2) if mttr else None,
+        "degraded_seconds": round(stats["downtime_seconds"] or 0.0, 2),
+    }
+
+
+def _build_service_metrics(
+    service: str,
+    incident_stats: dict,
+    check_stats: dict,
+    aggregate: IncidentAggregate,
+    window_hours: float,
+    flap_state: Optional[FlapState] = None,
+    degradation_stats: Optional[dict] = None,
+) -> ServiceMetrics:
+    """
+    Incidentes, disponibilidad y checks de la ventana salen de agregados SQL
+    (exactos); MTBF y el historial completo, de incident_aggregates.
+    """
+    window_seconds = window_hours * 3600
+    downtime = min(incident_stats["downtime_seconds"] or 0.0, window_seconds)
     
     return ServiceMetrics(
         service=service,
-        total_incidents=len(incidents),
-        active_incidents=len(active),
-        resolved_incidents=len(resolved),
-        mttd_avg=mttd_avg,
-        mttd_min=mttd_min,
-        mttd_max=mttd_max,
-        mttr_avg=mttr_avg,
-        mttr_min=mttr_min,
-        mttr_max=mttr_max,
-        mtbf_avg=mtbf_avg,
-        availability_percent=availability,
+        total_incidents=incident_stats["incidents"],
+        active_incidents=incident_stats["active"],
+        resolved_incidents=incident_stats["resolved"],
+        mttd_avg=_avg(incident_stats["mttd_sum"], incident_stats["mttd_count"]),
+        mttd_min=incident_stats["mttd_min"],
+        mttd_max=incident_stats["mttd_max"],
+        mttr_avg=_avg(incident_stats["mttr_sum"], incident_stats["mttr_count"]),
+        mttr_min=incident_stats["mttr_min"],
+        mttr_max=incident_stats["mttr_max"],
+        mtbf_avg=aggregate.mtbf_avg,
+        availability_percent=(window_seconds - downtime) / window_seconds * 100,
         total_downtime_seconds=downtime,
-        total_checks=total_checks,
-        successful_checks=successful_checks,
-        failed_checks=failed_checks,
-        avg_latency_ms=avg_latency,
+        total_checks=check_stats["count"],
+        successful_checks=check_stats["count"] - check_stats["failures"],
+        failed_checks=check_stats["failures"],
+        avg_latency_ms=_avg(check_stats["latency_sum"], check_stats["latency_count"]),
+        latency=_latency_summary(check_stats),
+        lifetime=_lifetime(aggregate),
+        flapping=_flapping(service, flap_state),
+        degradation=_degradation_summary(degradation_stats or _EMPTY_INCIDENTS),
+    )
+
+
+def _collect_window_stats(services: List[str], window_hours: float) -> tuple[dict, dict, dict, dict, dict]:
+    """
+    Cinco consultas para todos los servicios: checks, caídas, acumuladores,
+    flapping y degradaciones.
+    """
+    since, now = _window_bounds(window_hours)
+    check_stats = get_health_check_window_stats(since, BUCKETS_MS)
+    incident_stats = get_incident_window_stats(since, now)
+    aggregates = get_incident_aggregates(services)
+    flaps = get_flap_states(services)
+    degradation_stats = get_incident_window_stats(since, now, INCIDENT_DEGRADATION)
+    return check_stats, incident_stats, aggregates, flaps, degradation_stats
+
+
+def get_service_metrics(service: str, window_hours: float = 24) -> ServiceMetrics:
+    """Obtiene todas las métricas de un servicio"""
+    check_stats, incident_stats, aggregates, flaps, degradation_stats = _collect_window_stats([service], window_hours)
+    return _build_service_metrics(
+        service,
+        incident_stats.get(service, _EMPTY_INCIDENTS),
+        check_stats.get(service, _EMPTY_CHECKS),
+        aggregates[service],
+        window_hours,
+        flaps.get(service),
+        degradation_stats.get(service),
     )
 
 
 def get_all_services_metrics(window_hours: float = 24) -> dict:
     """Obtiene métricas de todos los servicios monitoreados"""
     services = list(MONITORED_SERVICES.keys()) + ["redis"]
+    check_stats, incident_stats, aggregates, flaps, degradation_stats = _collect_window_stats(services, window_hours)
     
     results = {}
     for service in services:
-        metrics = get_service_metrics(service, window_hours)
+        metrics = _build_service_metrics(
+            service,
+            incident_stats.get(service, _EMPTY_INCIDENTS),
+            check_stats.get(service, _EMPTY_CHECKS),
+            aggregates[service],
+            window_hours,
+            flaps.get(service),
+            degradation_stats.get(service),
+        )
         results[service] = metrics.to_dict()
     
-    # Calcular métricas globales
-    all_incidents = get_all_incidents(limit=200)
-    global_mttd_avg, _, _ = calculate_mttd(all_incidents)
-    global_mttr_avg, _, _ = calculate_mttr([i for i in all_incidents if not i.is_active()])
-    global_availability, global_downtime = calculate_availability(all_incidents, window_hours)
+    # Calcular métricas globales (todos los servicios con incidentes en la ventana)
+    window_stats = list(incident_stats.values())
+    mttd_count = sum(s["mttd_count"] for s in window_stats)
+    mttr_count = sum(s["mttr_count"] for s in window_stats)
+    global_mttd_avg = _avg(sum(s["mttd_sum"] or 0.0 for s in window_stats), mttd_count)
+    global_mttr_avg = _avg(sum(s["mttr_sum"] or 0.0 for s in window_stats), mttr_count)
+    window_seconds = window_hours * 3600
+    global_downtime = min(sum(s["downtime_seconds"] or 0.0 for s in window_stats), window_seconds)
+    global_availability = (window_seconds - global_downtime) / window_seconds * 100
     
     results["_global"] = {
-        "total_incidents": len(all_incidents),
-        "active_incidents": sum(1 for i in all_incidents if i.is_active()),
+        "total_incidents": sum(s["incidents"] for s in window_stats),
+        "active_incidents": sum(s["active"] for s in window_stats),
         "mttd_avg_seconds": round(global_mttd_avg, 2) if global_mttd_avg else None,
         "mttr_avg_seconds": round(global_mttr_avg, 2) if global_mttr_avg else None,
         "availability_percent": round(global_availability, 4),
         "total_downtime_seconds": round(global_downtime, 2),
+        "lifetime": _lifetime(IncidentAggregate.combine(list(aggregates.values()))),
+        "degradation": _degradation_summary({
+            key: sum(s[key] or 0 for s in degradation_stats.values())
+            for key in ("incidents", "active", "resolved", "mttd_sum", "mttd_count", "mttr_sum", "mttr_count", "downtime_seconds")
+        }),
+        "flapping_services": sorted(
+            service for service in services if results[service]["flapping"]["flapping"]
+        ),
     }
     
     return results
@@ -1,8 +1,13 @@
 """Monitor Service - Loop principal de Ping/Echo híbrido
 
 Diseño:
-- Worker: Ping HTTP directo (sin depender de Celery)
-- Otros servicios: Via cola asíncrona Celery
+- Todos los servicios HTTP: probes directos concurrentes desde el monitor
+  (ProbeEngine, sin depender del worker ni del broker)
+- Cola Celery: ping end-to-end (broker + worker + echo) que además reporta Redis
+
+El proceso que corre el monitor lo registra con set_monitor(): con el runtime
+de un solo proceso (start_monitor.py) el consumidor de echos y la API usan esa
+misma instancia, así /status ve los contadores y el estado en memoria vivos.
 """
 
 import logging
@@ -10,8 +15,8 @@ import os
 import sys
 import time
 import threading
-import requests
 from datetime import datetime
+from typing import Dict, Iterable, Optional
 from uuid import uuid4
 
 from celery import Celery
@@ -19,9 +24,37 @@ from celery import Celery
 # Asegurar que la app está en el path
 sys.path.insert(0, '/app')
 
-from app.worker.db import init_db, save_health_check
-from app.models.monitoring import HealthCheck
-from app.monitor.incident_detector import evaluate_service_health, check_all_services
+from app.worker.db import (
+    get_recent_health_checks_for_services,
+    get_services_under_suspicion,
+    init_db,
+    prune_ping_flights,
+    record_echo_received,
+    record_ping_sent,
+)
+from app.worker.task_metrics import install_task_signal_handlers
+from app.audit.security_event_store import get_security_event_store
+from app.audit.tampering_detector import get_tampering_detector, react_to_alerts
+from app.models.security import SecurityEvent
+from app.models.monitoring import FAILURE_STATUSES
+from app.monitor.incident_detector import (
+    ingest_check_result,
+    ingest_echo_results,
+    is_suspect,
+    recover_deferred_incidents,
+)
+from app.monitor.cluster import (
+    MONITOR_CLUSTER_BACKEND,
+    MONITOR_HEARTBEAT_SECONDS,
+    MONITOR_NODE_ID,
+    MonitorCluster,
+    get_cluster,
+)
+from app.monitor.health_state import health_registry
+from app.monitor.probe_engine import ProbeEngine
+from app.monitor.recovery_executor import get_recovery_executor
+from app.monitor.scheduler import DeadlineScheduler
+from app.monitor.metrics import get_ping_rtt_metrics
 from app.constants.queues import (
     ECHO_QUEUE,
     LOGS_QUEUE,
@@ -30,7 +63,11 @@ from app.constants.queues import (
     TASK_ECHO_RESPONSE,
     TASK_LOG_RECORD,
     MONITOR_PING_INTERVAL_SECONDS,
-    PING_TIMEOUT_SECONDS,
+    MONITOR_SUSPECT_PING_INTERVAL_SECONDS,
+    HEALTH_STATE_REFRESH_SECONDS,
+    LATENCY_BASELINE_SEED_CHECKS,
+    PING_EXPIRY_SECONDS,
+    PING_FLIGHTS_RETENTION_HOURS,
     MONITORED_SERVICES,
 )
 
@@ -52,113 +89,259 @@ monitor_celery.conf.update(
     timezone="UTC",
     enable_utc=True,
 )
+install_task_signal_handlers()
+
+# Jobs del scheduler de pings
+DIRECT_PROBE_JOB = "direct-probes"
+CELERY_PING_JOB = "celery-fanout"
+RECOVERY_SWEEP_JOB = "deferred-recovery"
+
+# Servicios que sólo se observan a través del ping vía Celery
+QUEUE_PROBED_SERVICES = ["redis"]
+
+# Cada cuántos pings vía Celery se purgan los vuelos viejos
+PING_FLIGHTS_PRUNE_EVERY = 500
+
+
+def echo_reply_queue(node_id: str = MONITOR_NODE_ID) -> str:
+    """
+    Cola donde esta instancia recibe los echos de sus pings vía Celery. Con
+    varias instancias (backend redis) cada una tiene la suya, así el echo llega
+    al dueño del servicio y no a cualquier consumidor de monitoring.echo.
+    """
+    return f"{ECHO_QUEUE}.{node_id}" if MONITOR_CLUSTER_BACKEND == "redis" else ECHO_QUEUE
 
 
 class MonitorService:
     """Servicio de monitoreo con Ping/Echo asíncrono"""
     
-    def __init__(self, ping_interval: int = MONITOR_PING_INTERVAL_SECONDS):
+    def __init__(
+        self,
+        ping_interval: float = MONITOR_PING_INTERVAL_SECONDS,
+        suspect_interval: float = MONITOR_SUSPECT_PING_INTERVAL_SECONDS,
+        service_intervals: Optional[Dict[str, float]] = None,
+        probe_engine: Optional[ProbeEngine] = None,
+        cluster: Optional[MonitorCluster] = None,
+    ):
         self.ping_interval = ping_interval
+        self.suspect_interval = suspect_interval
+        # Intervalos por servicio (los no listados usan ping_interval)
+        self.service_intervals = service_intervals or {}
         self.running = False
+        self.last_worker_status = None
         self.last_ping_time = None
         self.last_echo_time = None
+        self.last_rtt_ms = None
         self.ping_count = 0
         self.echo_count = 0
+        self.celery_ping_count = 0
+        # Servicios evaluados por probe HTTP directo (sus resultados vía echo se ignoran)
+        self.direct_services = set(MONITORED_SERVICES)
+        self.all_services = list(MONITORED_SERVICES) + QUEUE_PROBED_SERVICES
+        self.probe_engine = probe_engine or ProbeEngine(MONITORED_SERVICES)
+        self._last_probed: Dict[str, float] = {}
+        # Los echos pueden llegar desde varios threads del consumidor
+        self._echo_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.scheduler = self._build_schedule()
         
-        # Inicializar DB
+        # Inicializar DB y reconstruir el estado en memoria de cada servicio
         init_db()
+        health_registry.rebuild(self.all_services)
+        self._seed_latency_baselines(self.probe_engine.targets)
+        
+        # Sharding entre instancias: cada una prueba los servicios que le asigna el anillo
+        self.cluster = cluster or get_cluster()
+        self._owned = set(self.cluster.owned(self.all_services))
+        self.cluster.on_rebalance(self._on_rebalance)
         logger.info("Monitor Service initialized")
     
+    def _on_rebalance(self, joined: list, left: list) -> None:
+        """
+        Servicios recibidos de otra instancia: su estado en memoria se recarga
+        desde SQLite (los checks recientes los escribió el dueño anterior).
+        """
+        owned = set(self.cluster.owned(self.all_services))
+        gained, lost = owned - self._owned, self._owned - owned
+        self._owned = owned
+        if gained:
+            health_registry.rebuild(sorted(gained))
+            self._seed_latency_baselines(gained)
+            self.scheduler.reschedule(DIRECT_PROBE_JOB)
+        for service in lost:
+            self._last_probed.pop(service, None)
+        if gained or lost:
+            logger.info(f"🔀 Services gained={sorted(gained)} lost={sorted(lost)}")
+    
+    def _seed_latency_baselines(self, services: Iterable[str]) -> None:
+        """Las líneas base de latencia viven en memoria: se reconstruyen con los últimos checks UP"""
+        services = sorted(set(services) & set(self.probe_engine.targets))
+        recent = get_recent_health_checks_for_services(services, LATENCY_BASELINE_SEED_CHECKS)
+        for service, checks in recent.items():
+            self.probe_engine.anomaly_detector.seed(service, [
+                check.latency_ms for check in reversed(checks)
+                if check.status == "UP" and check.latency_ms is not None
+            ])
+    
     def send_ping(self) -> str:
         """
         Ejecuta ping híbrido:
-        1. HTTP directo al Worker (para detectar si Celery está caído)
-        2. Tarea Celery para los otros servicios
+        1. Probes HTTP directos a todos los servicios (sin depender de Celery)
+        2. Tarea Celery como probe end-to-end de la cola (y de Redis)
         """
         request_id = f"ping-{uuid4().hex[:8]}"
+        self.probe_direct_services(request_id, force=True)
+        self.send_celery_ping(request_id)
+        return request_id
+    
+    def _due_services(self, now: float) -> list:
+        """Servicios cuyo intervalo propio ya venció (tolerancia de medio tick de la ronda)"""
+        tolerance = self.service_interval(self.direct_services) / 2
+        return [
+            service for service in self.cluster.owned(self.probe_engine.targets)
+            if now - self._last_probed.get(service, float("-inf"))
+            >= self.service_interval([service]) - tolerance
+        ]
+    
+    def probe_direct_services(self, request_id: Optional[str] = None, force: bool = False) -> list:
+        """
+        Ronda de probes HTTP directos (concurrentes, un batch a SQLite) y
+        evaluación inmediata de incidentes de cada servicio probado.
+        """
+        request_id = request_id or f"ping-{uuid4().hex[:8]}"
+        now = time.monotonic()
+        services = self.cluster.owned(self.probe_engine.targets) if force else self._due_services(now)
+        if not services:
+            return []
         
-        # 1. PING DIRECTO AL WORKER (HTTP)
-        worker_result = self._ping_worker_direct(request_id)
-        self._log_ping_result(worker_result)
-        
-        # Evaluar incidente del worker inmediatamente
-        worker_incident = evaluate_service_health("worker")
-        if worker_incident[0] == "incident_created":
-            logger.warning(f"🚨 NEW INCIDENT: worker (detected via direct HTTP)")
-        elif worker_incident[0] == "incident_resolved":
-            logger.info(f"✅ INCIDENT RESOLVED: worker")
-        
-        # 2. PING VIA CELERY para otros servicios (solo si el worker está UP)
-        if worker_result["status"] == "UP":
-            try:
-                monitor_celery.send_task(
-                    TASK_PING_ALL_SERVICES,
-                    kwargs={"request_id": request_id},
-                    queue=PING_QUEUE,
-                )
-                logger.debug(f"📤 Celery PING sent: {request_id}")
-            except Exception as e:
-                logger.error(f"Failed to send Celery ping: {e}")
-        else:
-            logger.warning(f"⚠️ Skipping Celery ping - Worker is DOWN")
+        checks = self.probe_engine.probe_round(request_id, services)
+        for check in checks:
+            self._last_probed[check.service] = now
+            self._log_ping_result({**check.to_dict(), "method": "HTTP_DIRECT"})
+            if check.service == "worker":
+                self.last_worker_status = check.status
+            
+            action, _, _ = ingest_check_result(
+                check.service,
+                check.is_failure(),
+                check.timestamp,
+                status=check.status,
+                latency_ms=check.latency_ms,
+            )
+            if action == "incident_created":
+                logger.warning(f"🚨 NEW INCIDENT: {check.service} (detected via direct HTTP)")
+            elif action == "incident_resolved":
+                logger.info(f"✅ INCIDENT RESOLVED: {check.service}")
         
         self.last_ping_time = datetime.utcnow()
         self.ping_count += 1
+        return checks
+    
+    def send_celery_ping(self, request_id: Optional[str] = None) -> Optional[str]:
+        """
+        Ping vía Celery (salvo con el worker caído): mide la salud end-to-end
+        de broker + worker + cola de echo, y de Redis. Los servicios HTTP ya se
+        prueban en forma directa, así que el worker no los vuelve a consultar.
+        """
+        if not self.cluster.owned(QUEUE_PROBED_SERVICES):
+            return None  # Lo envía la instancia dueña de los servicios vía cola
+        if self.last_worker_status in FAILURE_STATUSES:
+            # Un worker DEGRADED (lento) sigue consumiendo: el ping end-to-end se envía igual
+            logger.warning(f"⚠️ Skipping Celery ping - Worker is {self.last_worker_status}")
+            return None
         
+        request_id = request_id or f"ping-{uuid4().hex[:8]}"
+        self._record_flight(request_id)
+        try:
+            # Un ping viejo se descarta en vez de procesarse tarde y
+            # reportar como caídos servicios que están sanos
+            monitor_celery.send_task(
+                TASK_PING_ALL_SERVICES,
+                kwargs={
+                    "request_id": request_id,
+                    "services": [s for s in MONITORED_SERVICES if s not in self.direct_services],
+                    "reply_queue": echo_reply_queue(self.cluster.node_id),
+                },
+                queue=PING_QUEUE,
+                expires=PING_EXPIRY_SECONDS,
+            )
+            logger.debug(f"📤 Celery PING sent: {request_id}")
+        except Exception as e:
+            logger.error(f"Failed to send Celery ping: {e}")
+            return None
         return request_id
     
-    def _ping_worker_direct(self, request_id: str) -> dict:
+    def _record_flight(self, request_id: str) -> None:
         """
-        Hace ping HTTP directo al worker.
-        Esto permite detectar si el worker/Celery está caído.
+        Registra el ping como en vuelo antes de publicarlo (el echo puede llegar
+        antes de que send_task retorne). Si la publicación falla el ping queda
+        sin echo y cuenta como perdido: el broker no lo aceptó.
         """
-        worker_url = MONITORED_SERVICES.get("worker", "http://celery-worker:5005/health")
-        start_time = time.time()
-        status = "DOWN"
-        http_code = None
-        is_timeout = False
-        error_message = None
-        
         try:
-            response = requests.get(worker_url, timeout=PING_TIMEOUT_SECONDS)
-            http_code = response.status_code
-            status = "UP" if response.ok else "DOWN"
-        except requests.Timeout:
-            is_timeout = True
-            error_message = "Timeout"
-        except requests.ConnectionError as e:
-            error_message = f"Connection error: {str(e)[:100]}"
+            record_ping_sent(request_id, time.time())
+            self.celery_ping_count += 1
+            if self.celery_ping_count % PING_FLIGHTS_PRUNE_EVERY == 0:
+                prune_ping_flights(time.time() - PING_FLIGHTS_RETENTION_HOURS * 3600)
         except Exception as e:
-            error_message = str(e)[:100]
-        
-        latency_ms = (time.time() - start_time) * 1000
-        
-        # Guardar en SQLite
-        health_check = HealthCheck(
-            id=0,  # Auto-increment en DB
-            service="worker",
-            request_id=request_id,
-            status=status,
-            timestamp=datetime.utcnow().isoformat(),
-            latency_ms=latency_ms,
-            http_code=http_code,
-            is_timeout=is_timeout,
-            error_message=error_message,
+            logger.error(f"Could not record ping flight {request_id}: {e}")
+    
+    def _close_flight(self, request_id: Optional[str], ts: Optional[str]) -> Optional[float]:
+        """Cierra el vuelo del ping con su echo; retorna el RTT en ms (None si no era un ping registrado)"""
+        if not request_id:
+            return None
+        worker_at = None
+        if ts:
+            try:
+                worker_at = datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                pass
+        try:
+            return record_echo_received(request_id, time.time(), worker_at)
+        except Exception as e:
+            logger.error(f"Could not close ping flight {request_id}: {e}")
+            return None
+    
+    def service_interval(self, services: Iterable[str]) -> float:
+        """
+        Intervalo vigente para un grupo de servicios: el configurado por
+        servicio, acortado a suspect_interval mientras alguno tenga fallas
+        consecutivas o un incidente activo (confirma el incidente antes).
+        """
+        services = list(services)
+        base = min(self.service_intervals.get(s, self.ping_interval) for s in services)
+        if any(is_suspect(s) for s in services):
+            return min(base, self.suspect_interval)
+        # Servicios evaluados en otro proceso (consumidor de echos): se consulta SQLite
+        remote = [s for s in services if s not in self.direct_services]
+        if remote and get_services_under_suspicion(remote):
+            return min(base, self.suspect_interval)
+        return base
+    
+    def _build_schedule(self) -> DeadlineScheduler:
+        scheduler = DeadlineScheduler()
+        scheduler.add_job(
+            DIRECT_PROBE_JOB,
+            self.probe_direct_services,
+            lambda: self.service_interval(self.direct_services),
         )
-        save_health_check(health_check)
-        
-        return {
-            "service": "worker",
-            "status": status,
-            "latency_ms": round(latency_ms, 2),
-            "http_code": http_code,
-            "is_failure": status == "DOWN",
-            "method": "HTTP_DIRECT",
-        }
+        scheduler.add_job(
+            CELERY_PING_JOB,
+            self.send_celery_ping,
+            lambda: self.service_interval(QUEUE_PROBED_SERVICES),
+        )
+        if MONITOR_CLUSTER_BACKEND == "redis":
+            # Con una sola instancia (backend memory) siempre es líder y nunca
+            # deja incidentes DEFERRED: no hace falta barrerlos
+            scheduler.add_job(
+                RECOVERY_SWEEP_JOB,
+                recover_deferred_incidents,
+                lambda: MONITOR_HEARTBEAT_SECONDS,
+            )
+        return scheduler
     
     def _log_ping_result(self, result: dict):
         """Log del resultado de un ping"""
-        status_emoji = "✅" if result["status"] == "UP" else "❌"
+        status_emoji = {"UP": "✅", "DEGRADED": "🐢"}.get(result["status"], "❌")
         method = result.get("method", "CELERY")
         logger.info(
             f"   {status_emoji} {result['service']}: {result['status']} "
@@ -166,24 +349,43 @@ class MonitorService:
         )
     
     def process_echo(self, **kwargs):
-        """Procesa un echo recibido del Worker (para servicios via Celery)"""
+        """
+        Procesa un echo recibido del Worker (para servicios via Celery).
+
+        Los resultados del payload alimentan directamente al detector: sólo se
+        re-evalúan los servicios incluidos en el echo y sin releer SQLite.
+        Los de servicios que esta instancia no posee (p.ej. un echo en vuelo
+        durante un rebalanceo) se ignoran: los evalúa su dueño.
+        """
         request_id = kwargs.get("request_id")
-        results = kwargs.get("results", [])
+        results = kwargs.get("results")
+        if results is None and kwargs.get("service"):
+            # Echo de ping_worker: un único resultado en el cuerpo del mensaje
+            results = [{"service": kwargs["service"], "status": kwargs.get("status")}]
+        results = results or []
+        rtt_ms = self._close_flight(request_id, kwargs.get("ts"))
+        ts = kwargs.get("ts") or datetime.utcnow().isoformat() + "Z"
         
-        self.last_echo_time = datetime.utcnow()
-        self.echo_count += 1
+        with self._echo_lock:
+            self.last_echo_time = datetime.utcnow()
+            self.echo_count += 1
+            if rtt_ms is not None:
+                self.last_rtt_ms = rtt_ms
         
-        logger.info(f"📥 ECHO received: {request_id} with {len(results)} service results")
+        rtt_info = f" (rtt: {rtt_ms:.0f}ms)" if rtt_ms is not None else ""
+        logger.info(f"📥 ECHO received: {request_id} with {len(results)} service results{rtt_info}")
         
-        # Log resultados (excepto worker que ya se verificó por HTTP directo)
+        # Sólo los servicios propios que no se verificaron por HTTP directo
+        echoed = {r.get("service") for r in results if r.get("service")}
+        owned = set(self.cluster.owned(echoed)) - self.direct_services
+        results = [r for r in results if r.get("service") in owned]
         for result in results:
-            if result.get("service") != "worker":  # Worker ya se verificó
-                self._log_ping_result({**result, "method": "CELERY"})
+            self._log_ping_result({**result, "method": "CELERY"})
         
-        # Evaluar incidentes para servicios (excepto worker)
-        services_to_check = [s for s in MONITORED_SERVICES.keys() if s != "worker"]
-        services_to_check.append("redis")
-        incident_results = check_all_services(services_to_check)
+        incident_results = ingest_echo_results(results, ts)
+        if any(r.get("is_failure") or r.get("status") in FAILURE_STATUSES for r in results):
+            # Primera falla vista: adelantar el próximo ping sin esperar el intervalo normal
+            self.scheduler.reschedule(CELERY_PING_JOB)
         
         # Log de incidentes
         for service, incident_info in incident_results.items():
@@ -191,18 +393,20 @@ class MonitorService:
                 logger.warning(f"🚨 NEW INCIDENT: {service}")
             elif incident_info["action"] == "incident_resolved":
                 logger.info(f"✅ INCIDENT RESOLVED: {service}")
+        
+        return incident_results
     
     def ping_loop(self):
-        """Loop principal que envía pings periódicamente"""
-        logger.info(f"🚀 Starting ping loop (interval: {self.ping_interval}s)")
-        
-        while self.running:
-            try:
-                self.send_ping()
-                time.sleep(self.ping_interval)
-            except Exception as e:
-                logger.error(f"Error in ping loop: {e}")
-                time.sleep(1)  # Pequeña pausa antes de reintentar
+        """
+        Loop principal: pings en deadlines fijos (reloj monotónico), sin que el
+        tiempo de cada ping se sume al período.
+        """
+        logger.info(
+            f"🚀 Starting ping loop (interval: {self.ping_interval}s, "
+            f"suspect interval: {self.suspect_interval}s)"
+        )
+        self._stop_event.clear()
+        self.scheduler.run(self._stop_event)
     
     def start(self):
         """Inicia el servicio de monitoreo"""
@@ -219,18 +423,41 @@ class MonitorService:
     def stop(self):
         """Detiene el servicio de monitoreo"""
         self.running = False
+        self._stop_event.set()
+        self.probe_engine.close()
+        self.scheduler.wake()
         logger.info("Monitor Service stopped")
     
-    def get_status(self) -> dict:
-        """Retorna el estado actual del monitor"""
-        return {
+    def get_status(self, include_rtt_window: bool = True) -> dict:
+        """
+        Retorna el estado actual del monitor. Sin include_rtt_window todo sale
+        de memoria (la ventana de RTT se calcula sobre ping_flights en SQLite).
+        """
+        # Si este proceso corre el loop y prueba todos los servicios, su estado
+        # en memoria es el vigente: no hace falta refrescarlo desde la DB
+        live = self.running and self._owned == set(self.all_services)
+        status = {
             "running": self.running,
+            "pid": os.getpid(),
             "ping_interval_seconds": self.ping_interval,
+            "suspect_ping_interval_seconds": self.suspect_interval,
+            "schedule": self.scheduler.snapshot(),
+            "probe_pools": self.probe_engine.pool_stats(),
+            "recovery": get_recovery_executor().snapshot(),
+            "cluster": self.cluster.snapshot(self.all_services),
+            "services": health_registry.snapshot(
+                self.all_services, max_age=None if live else HEALTH_STATE_REFRESH_SECONDS
+            ),
+            "latency_baselines": self.probe_engine.anomaly_detector.snapshot(),
             "ping_count": self.ping_count,
             "echo_count": self.echo_count,
             "last_ping_time": self.last_ping_time.isoformat() if self.last_ping_time else None,
             "last_echo_time": self.last_echo_time.isoformat() if self.last_echo_time else None,
+            "last_rtt_ms": round(self.last_rtt_ms, 2) if self.last_rtt_ms is not None else None,
         }
+        if include_rtt_window:
+            status["ping_rtt"] = get_ping_rtt_metrics(window_minutes=5)
+        return status
 
 
 # Task para recibir Echo responses
@@ -241,20 +468,23 @@ def echo_response(**kwargs):
     # Los resultados ya están guardados en SQLite por el worker
     
     request_id = kwargs.get("request_id")
-    results = kwargs.get("results", [])
     
-    logger.info(f"Echo response processed: {request_id}")
+    # Evaluar incidentes sólo con los resultados que trae el echo
+    get_monitor().process_echo(**kwargs)
     
-    # Evaluar incidentes
-    services = list(MONITORED_SERVICES.keys()) + ["redis"]
-    check_all_services(services)
+    logger.info(f"Echo response processed: {request_id}")
     
     return {"processed": True, "request_id": request_id}
 
 
-@monitor_celery.task(name=TASK_LOG_RECORD)
+@monitor_celery.task(name=TASK_LOG_RECORD, ignore_result=True)
 def consume_security_log(**kwargs):
-    """Consume mensajes de seguridad/auditoría desde LOGS_QUEUE."""
+    """
+    Consume mensajes de seguridad/auditoría desde LOGS_QUEUE.
+
+    Nadie espera el resultado: ignore_result evita una escritura en el
+    result backend por evento durante una ráfaga.
+    """
     event_id = kwargs.get("event_id")
     requested_hotel_id = kwargs.get("requested_hotel_id")
     endpoint = kwargs.get("endpoint")
@@ -272,30 +502,46 @@ def consume_security_log(**kwargs):
         f"ipAddress={ip_address} action={action}"
     )
 
+    # Se persiste por lotes (SecurityEventStore): una ráfaga de eventos no
+    # escribe fila por fila y la cola security.logs no se atrasa
+    event = SecurityEvent.from_payload(kwargs)
+    get_security_event_store().add(event)
+
+    # Patrones de tampering -> alerta + deny-list que consulta el gateway
+    react_to_alerts(get_tampering_detector().observe(event), kwargs.get("token_fingerprint"))
+
     logger.info(
         "[AUDIT ENTRY] AuditLogEntry "
         f"id={kwargs.get('log_id')} eventId={event_id} "
-        f"receivedAt={datetime.utcnow().isoformat()}Z persistedAt=None "
+        f"receivedAt={datetime.utcnow().isoformat()}Z "
         f"status={status} payload_keys={list(kwargs.keys())}"
     )
 
-    # TODO: Persistir SecurityViolationEvent y AuditLogEntry en base de datos
-    # para habilitar reportes y analisis historico (tendencias, violaciones por hotel,
-    # origen de IPs, frecuencia por endpoint, y tasa de eventos FAILED/PERSISTED).
-
     return {"processed": True, "event_id": event_id}
 
 
 # Instancia global del monitor
-_monitor_instance = None
+_monitor_instance: Optional[MonitorService] = None
+_monitor_lock = threading.Lock()
 
 
 def get_monitor() -> MonitorService:
-    """Obtiene la instancia global del monitor"""
+    """
+    Obtiene la instancia global del monitor. Si el proceso no registró una
+    con set_monitor() se crea una nueva (que no corre el loop de pings).
+    """
+    global _monitor_instance
+    with _monitor_lock:
+        if _monitor_instance is None:
+            _monitor_instance = MonitorService()
+        return _monitor_instance
+
+
+def set_monitor(monitor: MonitorService) -> None:
+    """Registra la instancia que corre en este proceso (la comparten API y consumidor)"""
     global _monitor_instance
-    if _monitor_instance is None:
-        _monitor_instance = MonitorService()
-    return _monitor_instance
+    with _monitor_lock:
+        _monitor_instance = monitor
 
 
 if __name__ == "__main__":
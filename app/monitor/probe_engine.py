@@ -0,0 +1,267 @@
+"""Motor de probes HTTP directos del monitor (asyncio)
+
+Prueba concurrentemente todos los servicios de MONITORED_SERVICES desde el
+propio monitor, sin depender del worker ni del broker:
+
+- Un pool de conexiones HTTP/1.1 keep-alive por destino (no se paga un
+  handshake TCP por probe en cada ronda).
+- Timeout por probe (asyncio.wait_for): un servicio colgado no demora al resto.
+- Una sola escritura batch a SQLite por ronda (save_health_checks).
+- Antes de persistir, los checks UP con latencia anómala respecto de la línea
+  base del servicio se marcan DEGRADED (latency_anomaly).
+
+El event loop corre en un thread propio para que las conexiones sobrevivan
+entre rondas; `probe_round()` es la interfaz síncrona que usa el scheduler.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.models.monitoring import DEGRADED_STATUS, HealthCheck
+from app.monitor.latency_anomaly import LatencyAnomalyDetector, latency_detector
+from app.worker.db import save_health_checks
+from app.constants.queues import MONITORED_SERVICES, PING_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Conexiones ociosas que se conservan por destino
+DEFAULT_POOL_SIZE = 2
+# Tope de lectura del cuerpo de /health (las respuestas son JSON chicos)
+MAX_BODY_BYTES = 64 * 1024
+
+
+class ProbeError(Exception):
+    """Respuesta HTTP inválida o conexión cerrada a mitad de la respuesta"""
+
+
+class _ConnectionPool:
+    """Conexiones keep-alive ociosas hacia un host:port"""
+
+    def __init__(self, host: str, port: int, max_idle: int = DEFAULT_POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self._idle: deque = deque()
+        self.opened = 0
+        self.reused = 0
+
+    async def acquire(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """Retorna (reader, writer, reutilizada)"""
+        while self._idle:
+            reader, writer = self._idle.popleft()
+            if not writer.is_closing() and not reader.at_eof():
+                self.reused += 1
+                return reader, writer, True
+            writer.close()
+        self.opened += 1
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return reader, writer, False
+
+    def release(self, reader, writer, reusable: bool) -> None:
+        if reusable and len(self._idle) < self.max_idle and not writer.is_closing():
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self) -> None:
+        while self._idle:
+            _, writer = self._idle.popleft()
+            writer.close()
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bool]:
+    """Lee status + headers + cuerpo. Retorna (http_code, conexión reutilizable)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ProbeError("connection closed before response")
+    parts = status_line.decode("latin-1").split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+        raise ProbeError(f"invalid status line: {status_line[:50]!r}")
+    http_code = int(parts[1])
+    keep_alive = parts[0] == "HTTP/1.1"
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    connection = headers.get("connection", "").lower()
+    if connection == "close":
+        keep_alive = False
+    elif connection == "keep-alive":
+        keep_alive = True
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        length = int(headers["content-length"])
+        if length > MAX_BODY_BYTES:
+            raise ProbeError(f"health body too large: {length} bytes")
+        await reader.readexactly(length)
+    else:
+        # Sin longitud: el cuerpo termina al cerrar la conexión
+        await reader.read(MAX_BODY_BYTES)
+        keep_alive = False
+
+    return http_code, keep_alive
+
+
+class ProbeEngine:
+    """Probes HTTP concurrentes con pool keep-alive por destino"""
+
+    def __init__(
+        self,
+        targets: Optional[Dict[str, str]] = None,
+        timeout: float = PING_TIMEOUT_SECONDS,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        persist: bool = True,
+        anomaly_detector: Optional[LatencyAnomalyDetector] = None,
+    ):
+        self.targets = dict(targets if targets is not None else MONITORED_SERVICES)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.persist = persist
+        self.anomaly_detector = anomaly_detector or latency_detector
+        self._pools: Dict[Tuple[str, int], _ConnectionPool] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.rounds = 0
+
+    def _pool_for(self, url: str) -> Tuple[_ConnectionPool, str, str]:
+        parts = urlsplit(url)
+        host = parts.hostname
+        port = parts.port or 80
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        key = (host, port)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _ConnectionPool(host, port, self.pool_size)
+        return pool, path, parts.netloc
+
+    async def _request(self, url: str) -> int:
+        pool, path, host_header = self._pool_for(url)
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            "Connection: keep-alive\r\n"
+            "User-Agent: travelhub-monitor\r\n\r\n"
+        ).encode("latin-1")
+
+        while True:
+            reader, writer, reused = await pool.acquire()
+            reusable = False
+            try:
+                writer.write(request)
+                await writer.drain()
+                http_code, reusable = await _read_response(reader)
+                return http_code
+            except (ConnectionError, ProbeError, asyncio.IncompleteReadError):
+                # El servidor pudo cerrar una conexión ociosa del pool: se
+                # reintenta una vez con una conexión nueva antes de reportar DOWN
+                if not reused:
+                    raise
+            finally:
+                # Un probe cancelado por timeout deja la respuesta a medio leer: no se reutiliza
+                pool.release(reader, writer, reusable)
+
+    async def probe(self, service: str, request_id: str) -> HealthCheck:
+        """Un probe HTTP a un servicio, con su propio timeout"""
+        url = self.targets[service]
+        start = time.perf_counter()
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        try:
+            http_code = await asyncio.wait_for(self._request(url), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            check = HealthCheck.timeout(service, request_id, self.timeout * 1000)
+            check.error_message = "Timeout"
+            check.timestamp = timestamp
+            return check
+        except (OSError, ProbeError, ValueError, asyncio.IncompleteReadError) as e:
+            check = HealthCheck.down(service, request_id)
+            check.error_message = f"Connection error: {str(e)[:100]}"
+            check.timestamp = timestamp
+            return check
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        return HealthCheck(
+            id=0,
+            service=service,
+            request_id=request_id,
+            status="UP" if http_code < 400 else "DOWN",
+            latency_ms=latency_ms,
+            http_code=http_code,
+            timestamp=timestamp,
+            is_timeout=False,
+        )
+
+    async def probe_all(self, request_id: str, services: Optional[List[str]] = None) -> List[HealthCheck]:
+        """Prueba los destinos en paralelo y guarda la ronda en un único batch"""
+        services = list(self.targets) if services is None else services
+        checks = list(await asyncio.gather(
+            *(self.probe(service, request_id) for service in services)
+        ))
+        for check in checks:
+            if check.status == "UP" and self.anomaly_detector.observe(check.service, check.latency_ms):
+                check.status = DEGRADED_STATUS
+                check.error_message = "Latency anomaly"
+        if self.persist:
+            await asyncio.get_running_loop().run_in_executor(None, save_health_checks, checks)
+        self.rounds += 1
+        return checks
+
+    # ==================== INTERFAZ SÍNCRONA ====================
+
+    def start(self) -> None:
+        """Levanta el event loop del engine en un thread daemon (idempotente)"""
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="probe-engine", daemon=True)
+            self._thread.start()
+            self._loop = loop
+
+    def probe_round(self, request_id: str, services: Optional[List[str]] = None) -> List[HealthCheck]:
+        """Ejecuta una ronda desde código síncrono (p.ej. el scheduler)"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self.probe_all(request_id, services), self._loop)
+        # Cada probe tiene su timeout; el margen cubre la escritura batch
+        return future.result(timeout=self.timeout + 5)
+
+    def pool_stats(self) -> dict:
+        return {
+            f"{host}:{port}": {"opened": pool.opened, "reused": pool.reused, "idle": len(pool._idle)}
+            for (host, port), pool in self._pools.items()
+        }
+
+    def close(self) -> None:
+        """Cierra las conexiones ociosas y detiene el event loop"""
+        if self._loop is None:
+            return
+
+        async def _close():
+            for pool in self._pools.values():
+                pool.close()
+
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+        self._thread = None
@@ -1,10 +1,12 @@
 """Recovery module - Acciones de recuperación automática para servicios caídos"""
 
 import logging
-import os
-import subprocess
+import socket
+import time
 from typing import Optional
 
+from app.monitor.docker_client import DockerAPIError, get_docker_client
+
 logger = logging.getLogger(__name__)
 
 # Mapeo de servicios a nombres de containers Docker
@@ -17,13 +19,17 @@ SERVICE_TO_CONTAINER = {
     "redis": "redis",
 }
 
+# Espera máxima por el evento `start` que confirma un restart
+RESTART_CONFIRM_TIMEOUT_SECONDS = 10
+
 # Servicios que NO se deben reiniciar automáticamente
 DO_NOT_RESTART = {"redis"}  # Redis es infraestructura crítica
 
 
 def restart_container(container_name: str, timeout: int = 30) -> dict:
     """
-    Reinicia un container Docker usando el CLI.
+    Reinicia un container vía Docker Engine API (socket unix) y confirma el
+    restart con el evento `start` del container.
     
     Args:
         container_name: Nombre del container a reiniciar
@@ -32,34 +38,38 @@ def restart_container(container_name: str, timeout: int = 30) -> dict:
     Returns:
         dict con resultado de la operación
     """
+    client = get_docker_client()
     try:
         logger.info(f"🔄 Restarting container: {container_name}")
+        requested_at = time.time()
+        client.restart(container_name, timeout=timeout)
         
-        result = subprocess.run(
-            ["docker", "restart", "--time", str(timeout), container_name],
-            capture_output=True,
-            text=True,
-            timeout=timeout + 10,  # Un poco más que el timeout de docker
+        # La API responde al terminar el restart: el evento ya está emitido y
+        # el stream con `since` lo entrega de inmediato
+        event = client.wait_for_event(
+            container_name, ("start",), since=requested_at, timeout=RESTART_CONFIRM_TIMEOUT_SECONDS
         )
+        confirmed_at = event.get("timeNano", 0) / 1e9 if event else None
         
-        if result.returncode == 0:
-            logger.info(f"✅ Container {container_name} restarted successfully")
-            return {
-                "success": True,
-                "container": container_name,
-                "action": "restart",
-                "message": f"Container {container_name} restarted",
-            }
-        else:
-            logger.error(f"❌ Failed to restart {container_name}: {result.stderr}")
-            return {
-                "success": False,
-                "container": container_name,
-                "action": "restart",
-                "error": result.stderr,
-            }
+        logger.info(f"✅ Container {container_name} restarted successfully")
+        return {
+            "success": True,
+            "container": container_name,
+            "action": "restart",
+            "message": f"Container {container_name} restarted",
+            "start_confirmed": event is not None,
+            "restart_seconds": round(confirmed_at - requested_at, 3) if confirmed_at else None,
+        }
             
-    except subprocess.TimeoutExpired:
+    except DockerAPIError as e:
+        logger.error(f"❌ Failed to restart {container_name}: {e.message}")
+        return {
+            "success": False,
+            "container": container_name,
+            "action": "restart",
+            "error": e.message,
+        }
+    except socket.timeout:
         logger.error(f"❌ Timeout restarting container {container_name}")
         return {
             "success": False,
@@ -67,13 +77,13 @@ def restart_container(container_name: str, timeout: int = 30) -> dict:
             "action": "restart",
             "error": "Timeout expired",
         }
-    except FileNotFoundError:
-        logger.error("❌ Docker CLI not found. Is Docker installed?")
+    except (FileNotFoundError, ConnectionRefusedError):
+        logger.error(f"❌ Docker socket not available at {client.socket_path}")
         return {
             "success": False,
             "container": container_name,
             "action": "restart",
-            "error": "Docker CLI not found",
+            "error": "Docker socket not available",
         }
     except Exception as e:
         logger.error(f"❌ Error restarting container {container_name}: {e}")
@@ -159,16 +169,8 @@ def recover_service(service_name: str, incident_id: Optional[int] = None) -> dic
 
 
 def check_docker_available() -> bool:
-    """Verifica si Docker CLI está disponible"""
-    try:
-        result = subprocess.run(
-            ["docker", "version"],
-            capture_output=True,
-            timeout=5,
-        )
-        return result.returncode == 0
-    except:
-        return False
+    """Verifica si el daemon de Docker responde en el socket"""
+    return get_docker_client().ping()
 
 
 def get_container_status(container_name: str) -> Optional[str]:
@@ -179,16 +181,6 @@ def get_container_status(container_name: str) -> Optional[str]:
         Estado del container (running, exited, etc.) o None si no existe
     """
     try:
-        result = subprocess.run(
-            ["docker", "inspect", "-f", "{{.State.Status}}", container_name],
-            capture_output=True,
-            text=True,
-            timeout=5,
-        )
-        
-        if result.returncode == 0:
-            return result.stdout.strip()
-        return None
-        
-    except:
+        return get_docker_client().container_status(container_name)
+    except Exception:
         return None
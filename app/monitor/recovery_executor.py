@@ -0,0 +1,333 @@
+"""Ejecutor de acciones de recovery en background
+
+`recover_service` puede tardar hasta 40s (docker restart). Ejecutarlo inline
+congelaba el loop de pings o el consumidor de echos y dejaba al resto de los
+servicios sin monitorear. Acá las acciones se encolan y las ejecutan threads
+dedicados:
+
+- Single-flight por servicio: mientras una acción está encolada o en curso,
+  los pedidos nuevos para el mismo servicio se rechazan. Entre procesos del
+  monitor se usa además un flock no bloqueante por servicio.
+- Backoff exponencial por container: después de la acción N (consecutiva)
+  no se vuelve a actuar sobre el servicio hasta pasados
+  RECOVERY_COOLDOWN_SECONDS * 2^(N-1), con tope RECOVERY_BACKOFF_MAX_SECONDS.
+  La cuenta vuelve a 1 si pasaron RECOVERY_BACKOFF_RESET_SECONDS sin
+  acciones. Hora y número de la última acción se comparten entre procesos en
+  el lock file del servicio. Así un servicio que se cae de nuevo por el
+  propio restart no entra en un loop de reinicios.
+- Cola acotada: si está llena el pedido se rechaza en vez de acumularse.
+
+El resultado se reporta en forma asíncrona y queda asociado al incidente
+(columnas recovery_status / recovery_detail).
+"""
+
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from app.worker.db import DB_PATH, attach_recovery_result
+from app.monitor.recovery import recover_service
+
+logger = logging.getLogger(__name__)
+
+RECOVERY_WORKERS = int(os.getenv("RECOVERY_WORKERS", "2"))
+RECOVERY_MAX_PENDING = int(os.getenv("RECOVERY_MAX_PENDING", "16"))
+RECOVERY_COOLDOWN_SECONDS = float(os.getenv("RECOVERY_COOLDOWN_SECONDS", "30"))
+RECOVERY_BACKOFF_MAX_SECONDS = float(os.getenv("RECOVERY_BACKOFF_MAX_SECONDS", "600"))
+RECOVERY_BACKOFF_RESET_SECONDS = float(os.getenv("RECOVERY_BACKOFF_RESET_SECONDS", "900"))
+RECOVERY_LOCK_DIR = os.getenv(
+    "RECOVERY_LOCK_DIR",
+    os.path.join(os.path.dirname(DB_PATH), "recovery_locks"),
+)
+
+# Estados de recovery registrados en el incidente
+RECOVERY_QUEUED = "QUEUED"
+RECOVERY_SUCCEEDED = "SUCCEEDED"
+RECOVERY_FAILED = "FAILED"
+RECOVERY_SKIPPED = "SKIPPED"
+RECOVERY_REJECTED = "REJECTED"
+RECOVERY_DEFERRED = "DEFERRED"  # Detectado por una instancia que no es líder: lo ejecuta el líder
+
+
+def _store_result(incident_id: Optional[int], status: str, detail: dict) -> None:
+    if incident_id is None:
+        return
+    try:
+        attach_recovery_result(incident_id, status, json.dumps(detail, default=str))
+    except Exception as e:
+        logger.error(f"Could not attach recovery result to incident {incident_id}: {e}")
+
+
+class RecoveryExecutor:
+    """Pool de threads con cola acotada, single-flight por servicio y backoff exponencial"""
+
+    HISTORY_SIZE = 50
+
+    def __init__(
+        self,
+        recover_fn: Callable[..., dict] = recover_service,
+        workers: int = RECOVERY_WORKERS,
+        max_pending: int = RECOVERY_MAX_PENDING,
+        cooldown_seconds: float = RECOVERY_COOLDOWN_SECONDS,
+        max_backoff_seconds: float = RECOVERY_BACKOFF_MAX_SECONDS,
+        backoff_reset_seconds: float = RECOVERY_BACKOFF_RESET_SECONDS,
+        on_result: Callable[[Optional[int], str, dict], None] = _store_result,
+        lock_dir: Optional[str] = RECOVERY_LOCK_DIR,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.recover_fn = recover_fn
+        self.workers = workers
+        self.cooldown_seconds = cooldown_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.backoff_reset_seconds = backoff_reset_seconds
+        self.on_result = on_result
+        self.lock_dir = lock_dir
+        self.clock = clock
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Optional[int]] = {}
+        # servicio -> (hora de la última acción, acciones consecutivas)
+        self._last_action: Dict[str, Tuple[float, int]] = {}
+        self._threads = []
+        self._started = False
+
+        self.counters = {
+            "submitted": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "skipped": 0,
+            "rejected_in_flight": 0,
+            "rejected_cooldown": 0,
+            "rejected_queue_full": 0,
+        }
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+
+    # ==================== COORDINACIÓN ENTRE PROCESOS ====================
+
+    def _lock_path(self, service: str) -> Optional[str]:
+        if not self.lock_dir:
+            return None
+        os.makedirs(self.lock_dir, exist_ok=True)
+        return os.path.join(self.lock_dir, f"{service}.lock")
+
+    def _last_action_shared(self, service: str) -> Optional[Tuple[float, int]]:
+        """Última acción sobre el servicio registrada por cualquier proceso: (hora, acciones consecutivas)"""
+        path = self._lock_path(service)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                fields = f.read().split()
+            if not fields or not float(fields[0]):
+                return None
+            return float(fields[0]), int(fields[1]) if len(fields) > 1 else 1
+        except (OSError, ValueError):
+            return None
+
+    def _last_action_for(self, service: str) -> Optional[Tuple[float, int]]:
+        actions = [a for a in (self._last_action.get(service), self._last_action_shared(service)) if a]
+        return max(actions) if actions else None
+
+    def backoff_seconds(self, attempts: int) -> float:
+        """Espera después de `attempts` acciones consecutivas sobre un servicio"""
+        if attempts <= 0:
+            return 0.0
+        return min(self.cooldown_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+
+    def _attempts_after_action(self, service: str, now: float) -> int:
+        last = self._last_action_for(service)
+        if last is None or now - last[0] >= self.backoff_reset_seconds:
+            return 1
+        return last[1] + 1
+
+    def _in_cooldown(self, service: str) -> bool:
+        last = self._last_action_for(service)
+        return last is not None and self.clock() - last[0] < self.backoff_seconds(last[1])
+
+    # ==================== API ====================
+
+    def submit(self, service: str, incident_id: Optional[int] = None) -> dict:
+        """
+        Encola una acción de recovery. No bloquea: retorna de inmediato si el
+        pedido fue aceptado o por qué se rechazó.
+        """
+        self.start()
+        ticket = {"submitted": True, "service": service, "status": RECOVERY_QUEUED}
+        with self._lock:
+            if service in self._pending:
+                reason = "in_flight"
+            elif self._in_cooldown(service):
+                reason = "cooldown"
+            elif self._queue.full():
+                # Sólo submit encola y siempre con el lock tomado: full() es confiable
+                reason = "queue_full"
+            else:
+                reason = None
+                self._pending[service] = incident_id
+                self.counters["submitted"] += 1
+                # QUEUED se registra antes de encolar: el resultado final nunca queda pisado
+                self.on_result(incident_id, RECOVERY_QUEUED, ticket)
+                self._queue.put_nowait((service, incident_id))
+
+            if reason is not None:
+                self.counters[f"rejected_{reason}"] += 1
+
+        if reason is not None:
+            logger.info(f"⏭️ Recovery for {service} not submitted: {reason}")
+            ticket = {"submitted": False, "service": service, "status": RECOVERY_REJECTED, "reason": reason}
+            self.on_result(incident_id, RECOVERY_REJECTED, ticket)
+        return ticket
+
+    def _run_one(self, service: str, incident_id: Optional[int]) -> None:
+        path = self._lock_path(service)
+        lock_file = None
+        try:
+            if path is not None:
+                lock_file = open(path, "a+")
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    result = {"success": None, "service": service, "reason": "in flight in another process"}
+                    self._finish(service, incident_id, RECOVERY_SKIPPED, result)
+                    return
+                # Re-chequear el cooldown con el lock tomado (otro proceso pudo actuar recién)
+                if self._in_cooldown(service):
+                    result = {"success": None, "service": service, "reason": "cooldown"}
+                    self._finish(service, incident_id, RECOVERY_SKIPPED, result)
+                    return
+
+            started = self.clock()
+            try:
+                result = self.recover_fn(service, incident_id=incident_id)
+            except Exception as e:
+                result = {"success": False, "service": service, "error": str(e)}
+            result["duration_seconds"] = round(self.clock() - started, 3)
+
+            now = self.clock()
+            action = (now, self._attempts_after_action(service, now))
+            self._last_action[service] = action
+            if lock_file is not None:
+                lock_file.seek(0)
+                lock_file.truncate()
+                lock_file.write(f"{action[0]} {action[1]}")
+                lock_file.flush()
+
+            status = RECOVERY_SUCCEEDED if result.get("success") else RECOVERY_FAILED
+            self._finish(service, incident_id, status, result)
+        finally:
+            if lock_file is not None:
+                lock_file.close()  # libera el flock
+
+    def _finish(self, service: str, incident_id: Optional[int], status: str, result: dict) -> None:
+        with self._lock:
+            self._pending.pop(service, None)
+            key = {RECOVERY_SUCCEEDED: "succeeded", RECOVERY_FAILED: "failed"}.get(status, "skipped")
+            self.counters[key] += 1
+            self.history.append({
+                "service": service,
+                "incident_id": incident_id,
+                "status": status,
+                "at": datetime.utcnow().isoformat() + "Z",
+                "detail": result.get("error") or result.get("message") or result.get("reason"),
+            })
+        logger.info(f"🔧 Recovery for {service} (incident {incident_id}): {status}")
+        self.on_result(incident_id, status, result)
+
+    def _worker_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            service, incident_id = item
+            try:
+                self._run_one(service, incident_id)
+            except Exception as e:
+                logger.error(f"Recovery worker error for {service}: {e}")
+                with self._lock:
+                    self._pending.pop(service, None)
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        """Levanta los threads (idempotente)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"recovery-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que no queden acciones pendientes (tests/apagado ordenado)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def backoff_state(self, service: str) -> dict:
+        """Acciones consecutivas y espera restante antes de poder actuar de nuevo"""
+        last = self._last_action_for(service)
+        if last is None:
+            return {"attempts": 0, "backoff_seconds": 0.0, "retry_in_seconds": 0.0}
+        backoff = self.backoff_seconds(last[1])
+        return {
+            "attempts": last[1],
+            "backoff_seconds": backoff,
+            "retry_in_seconds": round(max(last[0] + backoff - self.clock(), 0.0), 1),
+        }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "pending": dict(self._pending),
+                "queue_depth": self._queue.qsize(),
+                "cooldown_seconds": self.cooldown_seconds,
+                "max_backoff_seconds": self.max_backoff_seconds,
+                "backoff": {service: self.backoff_state(service) for service in self._last_action},
+                "counters": dict(self.counters),
+                "recent": list(self.history),
+            }
+
+
+_executor: Optional[RecoveryExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_recovery_executor() -> RecoveryExecutor:
+    """Executor global del proceso"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = RecoveryExecutor()
+        return _executor
+
+
+def submit_recovery(service: str, incident_id: Optional[int] = None) -> dict:
+    """Encola el recovery de un servicio en el executor global"""
+    return get_recovery_executor().submit(service, incident_id)
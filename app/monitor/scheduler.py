@@ -0,0 +1,158 @@
+"""Scheduler de pings con deadlines fijos sobre reloj monotónico
+
+`send_ping(); sleep(interval)` hace que el período real sea intervalo + tiempo
+del ping y que el loop derive (un ping directo puede tardar hasta 5s). Acá cada
+job tiene su próximo deadline calculado como `deadline anterior + intervalo`,
+independiente de cuánto tardó la ejecución. Si un job se atrasa más de un
+intervalo completo, los slots perdidos se saltean (no se ejecutan en ráfaga).
+
+El intervalo de cada job se consulta en cada ronda (`interval_fn`), así un job
+puede acortar su período mientras el servicio tiene fallas y volver al normal
+cuando se recupera. `reschedule(name)` aplica un intervalo más corto de
+inmediato sin esperar al deadline ya calculado.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from threading import Event, Lock
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScheduledJob:
+    """Job periódico del scheduler"""
+    name: str
+    fn: Callable[[], object]
+    interval_fn: Callable[[], float]
+    next_deadline: float = 0.0
+    last_deadline: Optional[float] = None
+    last_interval: Optional[float] = None
+    runs: int = 0
+    errors: int = 0
+    missed_slots: int = 0
+    max_lag_seconds: float = 0.0
+
+
+class DeadlineScheduler:
+    """Ejecuta jobs periódicos en deadlines fijos medidos con un reloj monotónico"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._lock = Lock()
+        self._wakeup = Event()
+
+    def add_job(
+        self,
+        name: str,
+        fn: Callable[[], object],
+        interval_fn: Callable[[], float],
+        start_delay: float = 0.0,
+    ) -> ScheduledJob:
+        """Registra un job; la primera ejecución es a `start_delay` segundos"""
+        job = ScheduledJob(name=name, fn=fn, interval_fn=interval_fn)
+        job.next_deadline = self.clock() + start_delay
+        with self._lock:
+            self._jobs[name] = job
+        self._wakeup.set()
+        return job
+
+    def _interval(self, job: ScheduledJob) -> float:
+        try:
+            interval = float(job.interval_fn())
+        except Exception as e:
+            logger.warning(f"Interval for job {job.name} failed, keeping previous: {e}")
+            interval = job.last_interval or 1.0
+        return max(interval, 0.01)
+
+    def _advance(self, job: ScheduledJob, now: float) -> None:
+        """Calcula el próximo deadline desde el anterior (no desde `now`)"""
+        interval = self._interval(job)
+        job.last_interval = interval
+        next_deadline = job.last_deadline + interval
+        if next_deadline <= now:
+            # Atrasado más de un intervalo: saltear los slots perdidos
+            missed = int((now - next_deadline) // interval) + 1
+            job.missed_slots += missed
+            next_deadline += missed * interval
+        job.next_deadline = next_deadline
+
+    def reschedule(self, name: str) -> None:
+        """
+        Re-evalúa el intervalo de un job y adelanta su deadline si el nuevo
+        intervalo es más corto (p.ej. apenas se observa la primera falla).
+        """
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is None or job.last_deadline is None:
+                return
+            interval = self._interval(job)
+            candidate = max(job.last_deadline + interval, self.clock())
+            if candidate < job.next_deadline:
+                job.next_deadline = candidate
+                job.last_interval = interval
+        self._wakeup.set()
+
+    def run_pending(self) -> List[str]:
+        """Ejecuta los jobs cuyo deadline ya venció. Retorna sus nombres."""
+        now = self.clock()
+        with self._lock:
+            due = sorted(
+                (job for job in self._jobs.values() if job.next_deadline <= now),
+                key=lambda job: job.next_deadline,
+            )
+
+        fired = []
+        for job in due:
+            started = self.clock()
+            job.max_lag_seconds = max(job.max_lag_seconds, started - job.next_deadline)
+            job.last_deadline = job.next_deadline
+            try:
+                job.fn()
+            except Exception as e:
+                job.errors += 1
+                logger.error(f"Error in scheduled job {job.name}: {e}")
+            job.runs += 1
+            fired.append(job.name)
+            with self._lock:
+                self._advance(job, self.clock())
+        return fired
+
+    def seconds_until_next(self) -> Optional[float]:
+        with self._lock:
+            if not self._jobs:
+                return None
+            next_deadline = min(job.next_deadline for job in self._jobs.values())
+        return max(next_deadline - self.clock(), 0.0)
+
+    def run(self, stop_event: Event) -> None:
+        """Loop hasta que se active stop_event"""
+        while not stop_event.is_set():
+            self._wakeup.clear()
+            self.run_pending()
+            timeout = self.seconds_until_next()
+            # Un reschedule/add_job/wake despierta el loop antes del timeout
+            self._wakeup.wait(timeout if timeout is not None else 1.0)
+
+    def wake(self) -> None:
+        """Despierta el loop (p.ej. para que observe stop_event)"""
+        self._wakeup.set()
+
+    def snapshot(self) -> dict:
+        """Estado de los jobs (intervalo vigente, atrasos y slots salteados)"""
+        now = self.clock()
+        with self._lock:
+            return {
+                job.name: {
+                    "interval_seconds": job.last_interval,
+                    "next_in_seconds": round(max(job.next_deadline - now, 0.0), 3),
+                    "runs": job.runs,
+                    "errors": job.errors,
+                    "missed_slots": job.missed_slots,
+                    "max_lag_seconds": round(job.max_lag_seconds, 3),
+                }
+                for job in self._jobs.values()
+            }
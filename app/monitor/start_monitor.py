@@ -1,34 +1,66 @@
 #!/usr/bin/env python
-"""Script de inicio para el Monitor Service con Celery + Flask + Ping Loop"""
+"""Script de inicio para el Monitor Service con Celery + Flask + Ping Loop
+
+MONITOR_RUNTIME elige cómo se levantan las tres piezas:
+
+- single (default): un solo intérprete. El loop de pings corre en su thread
+  (scheduler + event loop del ProbeEngine), la API en un thread de werkzeug y
+  el consumidor Celery en el thread principal con pool de threads. Los tres
+  comparten el mismo MonitorService (set_monitor): /status reporta contadores
+  y estado en memoria vivos.
+- multi: un proceso por pieza (esquema anterior). Cada proceso tiene su
+  propio estado en memoria; /status ve una instancia que no corre el loop.
+"""
 
 import os
 import sys
+import threading
 from multiprocessing import Process
 
 # Asegurar que la app está en el path
 sys.path.insert(0, '/app')
 
-from app.monitor.monitor_service import MonitorService, monitor_celery
+from werkzeug.serving import make_server
+
+from app.monitor.monitor_service import MonitorService, echo_reply_queue, monitor_celery, set_monitor
 from app.monitor.api import app as flask_app
 from app.worker.db import init_db
-from app.constants.queues import ECHO_QUEUE, LOGS_QUEUE
+from app.constants.queues import (
+    ECHO_QUEUE,
+    LOGS_QUEUE,
+    MONITOR_PING_INTERVAL_SECONDS,
+    MONITOR_SUSPECT_PING_INTERVAL_SECONDS,
+)
 
+MONITOR_RUNTIME = os.getenv("MONITOR_RUNTIME", "single")  # single | multi
+MONITOR_API_HOST = "0.0.0.0"
+MONITOR_API_PORT = 5006
+# Threads del consumidor de echos / security.logs en el runtime de un solo proceso
+MONITOR_CONSUMER_THREADS = int(os.getenv("MONITOR_CONSUMER_THREADS", "4"))
 
-def run_celery():
-    """Ejecuta el worker Celery que consume echo responses"""
-    monitor_celery.worker_main(argv=[
+
+def _celery_argv(*extra: str) -> list:
+    # monitoring.echo (echos de ping_worker) + la cola de echos propia de la instancia
+    queues = dict.fromkeys([ECHO_QUEUE, echo_reply_queue(), LOGS_QUEUE])
+    return [
         'worker',
         '--loglevel=info',
-        f'--queues={ECHO_QUEUE},{LOGS_QUEUE}',
+        f'--queues={",".join(queues)}',
         '--hostname=monitor@%h',
-    ])
+        *extra,
+    ]
+
+
+def run_celery():
+    """Ejecuta el worker Celery que consume echo responses"""
+    monitor_celery.worker_main(argv=_celery_argv())
 
 
 def run_flask():
     """Ejecuta el servidor Flask con la API del monitor"""
     flask_app.run(
-        host='0.0.0.0',
-        port=5006,
+        host=MONITOR_API_HOST,
+        port=MONITOR_API_PORT,
         debug=False,
         use_reloader=False,
     )
@@ -37,28 +69,56 @@ def run_flask():
 def run_ping_loop():
     """Ejecuta el loop de ping del monitor"""
     monitor = MonitorService()
+    set_monitor(monitor)
     monitor.running = True
     monitor.ping_loop()
 
 
-if __name__ == '__main__':
-    # Inicializar DB
-    init_db()
-    
-    # Crear procesos para Celery, Flask y Ping Loop
+def _print_banner(runtime: str) -> None:
+    print(f"🔍 Iniciando Monitor Service (runtime: {runtime})...")
+    print("   - Celery: escuchando colas monitoring.echo y security.logs")
+    print(f"   - Flask API: escuchando en puerto {MONITOR_API_PORT}")
+    print(
+        f"   - Ping Loop: deadlines fijos cada {MONITOR_PING_INTERVAL_SECONDS}s "
+        f"({MONITOR_SUSPECT_PING_INTERVAL_SECONDS}s mientras un servicio falla)"
+    )
+
+
+def run_single_process():
+    """Loop de pings, API y consumidor Celery en un solo proceso"""
+    _print_banner("single")
+    monitor = MonitorService()
+    set_monitor(monitor)
+    monitor.start()
+
+    server = make_server(MONITOR_API_HOST, MONITOR_API_PORT, flask_app, threaded=True)
+    api_thread = threading.Thread(target=server.serve_forever, name="monitor-api", daemon=True)
+    api_thread.start()
+
+    try:
+        # En el thread principal: Celery maneja SIGTERM/SIGINT (warm shutdown)
+        monitor_celery.worker_main(argv=_celery_argv(
+            '--pool=threads',
+            f'--concurrency={MONITOR_CONSUMER_THREADS}',
+        ))
+    finally:
+        print("\n📴 Deteniendo Monitor Service...")
+        server.shutdown()
+        monitor.stop()
+
+
+def run_multi_process():
+    """Un proceso para Celery, otro para Flask y otro para el Ping Loop"""
     celery_process = Process(target=run_celery, daemon=False)
     flask_process = Process(target=run_flask, daemon=False)
     ping_process = Process(target=run_ping_loop, daemon=False)
-    
-    print("🔍 Iniciando Monitor Service...")
-    print("   - Celery: escuchando colas monitoring.echo y security.logs")
-    print("   - Flask API: escuchando en puerto 5006")
-    print("   - Ping Loop: enviando pings cada 5 segundos")
-    
+
+    _print_banner("multi")
+
     celery_process.start()
     flask_process.start()
     ping_process.start()
-    
+
     try:
         celery_process.join()
         flask_process.join()
@@ -68,3 +128,13 @@ if __name__ == '__main__':
         celery_process.terminate()
         flask_process.terminate()
         ping_process.terminate()
+
+
+if __name__ == '__main__':
+    # Inicializar DB
+    init_db()
+
+    if MONITOR_RUNTIME == "multi":
+        run_multi_process()
+    else:
+        run_single_process()
@@ -0,0 +1,327 @@
+"""Autoscaler del pool de Celery guiado por profundidad de cola y latencia
+
+Cada intervalo se toma una muestra de:
+- profundidad de la cola (mensajes esperando en el broker)
+- p95 del tiempo de espera en cola de las tasks (delta desde la muestra anterior)
+
+y se decide crecer, achicar o mantener el pool entre min y max procesos.
+
+Histéresis: crecer exige presión sostenida por `scale_up_samples` muestras y
+achicar exige calma sostenida por `scale_down_samples` (umbrales distintos
+para subir y bajar). Después de cada cambio hay un cooldown antes del
+siguiente. Las decisiones se exportan como métricas en un archivo JSON que
+expone el Flask del worker (GET /metrics/autoscaler).
+"""
+
+import json
+import logging
+import math
+import os
+import socket
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from threading import Event, Lock
+from typing import Callable, Optional
+
+from app.worker.db import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+AUTOSCALER_STATE_DIR = os.getenv(
+    "AUTOSCALER_STATE_DIR",
+    os.path.join(os.path.dirname(DB_PATH), "autoscaler"),
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+@dataclass
+class AutoscalerConfig:
+    """Parámetros del autoscaler (sobreescribibles por variables de entorno)"""
+
+    min_concurrency: int = 2
+    max_concurrency: int = 8
+    interval_seconds: float = 2.0
+    # Mensajes en cola por proceso a partir de los cuales hay presión para crecer
+    scale_up_backlog_per_process: float = 2.0
+    # Mensajes en cola por proceso por debajo de los cuales se puede achicar
+    scale_down_backlog_per_process: float = 0.5
+    # p95 de espera en cola (ms) que también cuenta como presión para crecer
+    max_queue_wait_ms: float = 2000.0
+    scale_up_samples: int = 2
+    scale_down_samples: int = 5
+    scale_up_cooldown_seconds: float = 10.0
+    scale_down_cooldown_seconds: float = 60.0
+    max_step: int = 4
+
+    @staticmethod
+    def from_env() -> "AutoscalerConfig":
+        defaults = AutoscalerConfig()
+        return AutoscalerConfig(
+            min_concurrency=int(os.getenv("WORKER_MIN_CONCURRENCY", defaults.min_concurrency)),
+            max_concurrency=int(os.getenv("WORKER_MAX_CONCURRENCY", defaults.max_concurrency)),
+            interval_seconds=_env_float("WORKER_AUTOSCALE_INTERVAL_SECONDS", defaults.interval_seconds),
+            scale_up_backlog_per_process=_env_float(
+                "WORKER_SCALE_UP_BACKLOG_PER_PROCESS", defaults.scale_up_backlog_per_process
+            ),
+            scale_down_backlog_per_process=_env_float(
+                "WORKER_SCALE_DOWN_BACKLOG_PER_PROCESS", defaults.scale_down_backlog_per_process
+            ),
+            max_queue_wait_ms=_env_float("WORKER_MAX_QUEUE_WAIT_MS", defaults.max_queue_wait_ms),
+            scale_up_samples=int(os.getenv("WORKER_SCALE_UP_SAMPLES", defaults.scale_up_samples)),
+            scale_down_samples=int(os.getenv("WORKER_SCALE_DOWN_SAMPLES", defaults.scale_down_samples)),
+            scale_up_cooldown_seconds=_env_float(
+                "WORKER_SCALE_UP_COOLDOWN_SECONDS", defaults.scale_up_cooldown_seconds
+            ),
+            scale_down_cooldown_seconds=_env_float(
+                "WORKER_SCALE_DOWN_COOLDOWN_SECONDS", defaults.scale_down_cooldown_seconds
+            ),
+            max_step=int(os.getenv("WORKER_SCALE_MAX_STEP", defaults.max_step)),
+        )
+
+
+# ==================== FUENTES Y CONTROL ====================
+
+class RedisQueueDepthSource:
+    """Profundidad de una cola Celery sobre Redis (el transport usa una lista por cola)"""
+
+    def __init__(self, broker_url: str, queue: str):
+        import redis
+
+        self.queue = queue
+        self._client = redis.Redis.from_url(broker_url, socket_timeout=2)
+
+    def __call__(self) -> int:
+        return int(self._client.llen(self.queue))
+
+
+class TaskQueueWaitSource:
+    """
+    p95 del tiempo de espera en cola de una task desde la muestra anterior.
+
+    Los histogramas de task_metrics son acumulados; se restan los conteos de la
+    muestra previa para obtener sólo lo ocurrido en el último intervalo.
+    """
+
+    def __init__(self, task_name: str):
+        self.task_name = task_name
+        self._previous: Optional[list] = None
+
+    def __call__(self) -> Optional[float]:
+        from app.worker.task_metrics import Histogram, get_aggregated_task_stats
+
+        stats = get_aggregated_task_stats().get(self.task_name)
+        if stats is None:
+            return None
+        counts = list(stats.queue_wait.counts)
+        previous, self._previous = self._previous, counts
+        if previous is None:
+            return None
+
+        delta = Histogram()
+        delta.counts = [max(now - before, 0) for now, before in zip(counts, previous)]
+        delta.count = sum(delta.counts)
+        delta.max_ms = stats.queue_wait.max_ms
+        return delta.percentile(95)
+
+
+class CeleryPoolControl:
+    """Crece/achica el pool de un nodo Celery vía remote control (pool_grow/pool_shrink)"""
+
+    def __init__(self, app, destination: str):
+        self.app = app
+        self.destination = destination
+
+    def grow(self, n: int) -> None:
+        self.app.control.pool_grow(n, destination=[self.destination])
+
+    def shrink(self, n: int) -> None:
+        self.app.control.pool_shrink(n, destination=[self.destination])
+
+
+# ==================== AUTOSCALER ====================
+
+class QueueDepthAutoscaler:
+    """Decide el tamaño del pool a partir de profundidad de cola y latencia"""
+
+    HISTORY_SIZE = 20
+
+    def __init__(
+        self,
+        depth_source: Callable[[], int],
+        pool_control,
+        config: Optional[AutoscalerConfig] = None,
+        latency_source: Optional[Callable[[], Optional[float]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "worker",
+        state_path: Optional[str] = None,
+    ):
+        self.config = config or AutoscalerConfig()
+        self.depth_source = depth_source
+        self.latency_source = latency_source
+        self.pool_control = pool_control
+        self.clock = clock
+        self.name = name
+        self.state_path = state_path
+
+        self.concurrency = self.config.min_concurrency
+        self._up_streak = 0
+        self._down_streak = 0
+        self._last_scale_at: Optional[float] = None
+        self._lock = Lock()
+
+        self.last_depth: Optional[int] = None
+        self.last_queue_wait_p95_ms: Optional[float] = None
+        self.decisions = {"scale_up": 0, "scale_down": 0, "hold": 0, "sample_error": 0, "control_error": 0}
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+
+    def _in_cooldown(self, cooldown: float) -> bool:
+        return self._last_scale_at is not None and self.clock() - self._last_scale_at < cooldown
+
+    def _decide(self, depth: int, queue_wait_ms: Optional[float]) -> tuple:
+        cfg = self.config
+        current = self.concurrency
+        latency_pressure = queue_wait_ms is not None and queue_wait_ms > cfg.max_queue_wait_ms
+        up_pressure = depth > current * cfg.scale_up_backlog_per_process or latency_pressure
+        calm = depth <= current * cfg.scale_down_backlog_per_process and not latency_pressure
+
+        self._up_streak = self._up_streak + 1 if up_pressure else 0
+        self._down_streak = self._down_streak + 1 if calm else 0
+
+        if up_pressure and current < cfg.max_concurrency:
+            if self._up_streak < cfg.scale_up_samples:
+                return "hold", current, "scale-up pressure not sustained yet"
+            if self._in_cooldown(cfg.scale_up_cooldown_seconds):
+                return "hold", current, "scale-up cooldown"
+            wanted = math.ceil(depth / cfg.scale_up_backlog_per_process) if cfg.scale_up_backlog_per_process else current + 1
+            step = min(max(wanted - current, 1), cfg.max_step)
+            target = min(current + step, cfg.max_concurrency)
+            reason = f"depth={depth} queue_wait_p95_ms={queue_wait_ms}"
+            return "scale_up", target, reason
+
+        if calm and current > cfg.min_concurrency:
+            if self._down_streak < cfg.scale_down_samples:
+                return "hold", current, "scale-down calm not sustained yet"
+            if self._in_cooldown(cfg.scale_down_cooldown_seconds):
+                return "hold", current, "scale-down cooldown"
+            # Achicar de a un proceso: liberar capacidad es menos urgente que sumarla
+            return "scale_down", current - 1, f"depth={depth} queue_wait_p95_ms={queue_wait_ms}"
+
+        return "hold", current, "within bounds"
+
+    def sample(self) -> dict:
+        """Toma una muestra, decide y aplica. Retorna la decisión tomada."""
+        with self._lock:
+            try:
+                depth = int(self.depth_source())
+                queue_wait_ms = self.latency_source() if self.latency_source else None
+            except Exception as e:
+                self.decisions["sample_error"] += 1
+                logger.warning(f"Autoscaler sample failed: {e}")
+                return {"action": "sample_error", "error": str(e)}
+
+            self.last_depth = depth
+            self.last_queue_wait_p95_ms = queue_wait_ms
+            action, target, reason = self._decide(depth, queue_wait_ms)
+            previous = self.concurrency
+
+            try:
+                if action == "scale_up":
+                    self.pool_control.grow(target - previous)
+                elif action == "scale_down":
+                    self.pool_control.shrink(previous - target)
+            except Exception as e:
+                # El pool no cambió: se conservan tamaño, cooldown y rachas y
+                # la próxima muestra vuelve a intentar
+                logger.warning(f"Autoscaler {self.name}: {action} {previous} -> {target} failed: {e}")
+                reason = f"{action} failed: {e}"
+                action = "control_error"
+
+            if action in ("scale_up", "scale_down"):
+                self.concurrency = target
+                self._last_scale_at = self.clock()
+                self._up_streak = 0
+                self._down_streak = 0
+                logger.info(f"📈 Autoscaler {self.name}: {action} {previous} -> {target} ({reason})")
+
+            self.decisions[action] += 1
+            decision = {
+                "action": action,
+                "from": previous,
+                "to": self.concurrency,
+                "depth": depth,
+                "queue_wait_p95_ms": queue_wait_ms,
+                "reason": reason,
+                "at": datetime.utcnow().isoformat() + "Z",
+            }
+            if action != "hold":
+                self.history.append(decision)
+
+        self._export()
+        return decision
+
+    def snapshot(self) -> dict:
+        """Métricas del autoscaler"""
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "min_concurrency": self.config.min_concurrency,
+            "max_concurrency": self.config.max_concurrency,
+            "last_depth": self.last_depth,
+            "last_queue_wait_p95_ms": self.last_queue_wait_p95_ms,
+            "decisions": dict(self.decisions),
+            "recent_scaling_decisions": list(self.history),
+            "config": asdict(self.config),
+            "updated_at": datetime.utcnow().isoformat() + "Z",
+        }
+
+    def _export(self) -> None:
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.debug(f"Could not export autoscaler state: {e}")
+
+    def run(self, stop_event: Event) -> None:
+        """Loop de muestreo hasta que se active stop_event"""
+        logger.info(
+            f"🚀 Autoscaler {self.name} started "
+            f"({self.config.min_concurrency}-{self.config.max_concurrency} processes)"
+        )
+        while not stop_event.wait(self.config.interval_seconds):
+            self.sample()
+
+
+def autoscaler_state_path(name: str = "worker") -> str:
+    """Archivo donde el autoscaler de este host exporta sus métricas"""
+    return os.path.join(AUTOSCALER_STATE_DIR, f"{socket.gethostname()}-{name}.json")
+
+
+def read_autoscaler_state() -> dict:
+    """Lee las métricas exportadas por los autoscalers de este host"""
+    states = {}
+    prefix = f"{socket.gethostname()}-"
+    try:
+        names = os.listdir(AUTOSCALER_STATE_DIR)
+    except OSError:
+        return states
+
+    for file_name in names:
+        if not (file_name.startswith(prefix) and file_name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(AUTOSCALER_STATE_DIR, file_name)) as f:
+                state = json.load(f)
+            states[state.get("name", file_name)] = state
+        except (OSError, ValueError):
+            continue
+    return states
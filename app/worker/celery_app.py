@@ -12,6 +12,7 @@ from app.constants.queues import (
     TASK_ECHO_RESPONSE,
     TASK_LOG_RECORD,
 )
+from app.worker.task_metrics import install_task_signal_handlers
 
 BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", BROKER_URL)
@@ -33,4 +34,7 @@ celery_app.conf.update(
     enable_utc=True,
 )
 
+# Instrumentación de tiempo en cola / ejecución / reintentos por task
+install_task_signal_handlers()
+
 celery_app.autodiscover_tasks(["app.worker"])
@@ -1,99 +1,226 @@
-"""Configuración dinámica del worker para inyectar fallos"""
-
+"""Configuración dinámica del worker para inyectar fallos
+
+La configuración vive en un segmento de memoria compartida (archivo mapeado con
+mmap, por defecto en /dev/shm) para que el proceso Flask de configuración, el
+proceso Celery y los hijos prefork vean los mismos valores.
+
+Layout del segmento (little-endian, 32 bytes):
+    [0:8]   seq           - contador seqlock (impar = escritura en curso)
+    [8:16]  failure_rate  - double
+    [16:24] force_failure - uint64 (0/1)
+    [24:32] last_failure  - double, epoch UTC en segundos (0.0 = sin fallos)
+
+Las lecturas no toman locks: leen seq, copian los campos y vuelven a leer seq;
+si cambió (o era impar) reintentan, con un límite de reintentos y una pausa
+corta entre ellos. Si un escritor murió a mitad de escritura (seq queda impar)
+el lector no gira para siempre: devuelve el último valor leído bien. Las
+escrituras se serializan con un lock de thread + flock sobre el archivo del
+segmento; el siguiente escritor cierra la secuencia que quedó impar.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
 from threading import Lock
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+
+_SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+CONFIG_SEGMENT_PATH = os.getenv(
+    "WORKER_CONFIG_SEGMENT_PATH",
+    os.path.join(_SHM_DIR, "travelhub_worker_config"),
+)
+
+_SEQ = struct.Struct("<Q")
+_FIELDS = struct.Struct("<dQd")
+_SEGMENT_SIZE = _SEQ.size + _FIELDS.size
+
+# Reintentos de lectura mientras hay una escritura en curso (~50 ms en total)
+_READ_MAX_RETRIES = 50
+_READ_RETRY_SLEEP_SECONDS = 0.001
 
 _config_lock = Lock()
-_failure_rate: float = 0.0  # Probabilidad de fallo (0.0 a 1.0)
-_force_failure: bool = False  # Fuerza fallo garantizado
-_last_failure: Optional[datetime] = None  # Timestamp del último fallo
+_segment: Optional[mmap.mmap] = None
+_segment_fd: Optional[int] = None
+_segment_pid: Optional[int] = None
+_last_read: Tuple[float, bool, float] = (0.0, False, 0.0)
+
+
+def _get_segment() -> mmap.mmap:
+    """Abre (o crea) el segmento compartido la primera vez que se usa en el proceso"""
+    global _segment, _segment_fd, _segment_pid
+    if _segment is not None:
+        return _segment
+
+    with _config_lock:
+        if _segment is None:
+            fd = os.open(CONFIG_SEGMENT_PATH, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                # Un archivo recién creado tiene tamaño 0; ftruncate lo rellena con
+                # ceros, que equivalen a la configuración por defecto.
+                if os.fstat(fd).st_size < _SEGMENT_SIZE:
+                    os.ftruncate(fd, _SEGMENT_SIZE)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            _segment = mmap.mmap(fd, _SEGMENT_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            _segment_fd = fd
+            _segment_pid = os.getpid()
+    return _segment
+
+
+def _read() -> Tuple[float, bool, float]:
+    """
+    Lectura seqlock sin locks: (failure_rate, force_failure, last_failure_epoch).
+
+    Tras _READ_MAX_RETRIES intentos fallidos devuelve el último valor consistente
+    leído por el proceso (o la configuración por defecto).
+    """
+    global _last_read
+    segment = _get_segment()
+    for attempt in range(_READ_MAX_RETRIES):
+        if attempt:
+            time.sleep(_READ_RETRY_SLEEP_SECONDS)
+        (seq_before,) = _SEQ.unpack_from(segment, 0)
+        if seq_before & 1:
+            continue  # Escritura en curso
+        rate, force, last_failure = _FIELDS.unpack_from(segment, _SEQ.size)
+        (seq_after,) = _SEQ.unpack_from(segment, 0)
+        if seq_before == seq_after:
+            _last_read = (rate, bool(force), last_failure)
+            return _last_read
+    return _last_read
+
+
+def _lock_fd() -> int:
+    """
+    Descriptor propio del proceso para flock.
+
+    Tras un fork el hijo comparte la descripción de archivo del padre y flock no
+    los excluiría entre sí, así que cada proceso reabre el archivo del segmento.
+    """
+    global _segment_fd, _segment_pid
+    if _segment_pid != os.getpid():
+        _segment_fd = os.open(CONFIG_SEGMENT_PATH, os.O_RDWR)
+        _segment_pid = os.getpid()
+    return _segment_fd
+
+
+@contextmanager
+def _write():
+    """Sección crítica de escritura: serializa escritores y publica vía seqlock"""
+    segment = _get_segment()
+    with _config_lock:
+        lock_fd = _lock_fd()
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        try:
+            # Con el flock tomado, un seq impar es de un escritor que murió a mitad
+            # de escritura: se reutiliza como marca de escritura en curso.
+            (seq,) = _SEQ.unpack_from(segment, 0)
+            seq |= 1
+            _SEQ.pack_into(segment, 0, seq)
+            try:
+                yield segment
+            finally:
+                _SEQ.pack_into(segment, 0, seq + 1)
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+
+
+def _write_fields(
+    rate: Optional[float] = None,
+    force: Optional[bool] = None,
+    last_failure: Optional[float] = None,
+) -> None:
+    """Actualiza los campos indicados dejando el resto intactos"""
+    with _write() as segment:
+        current_rate, current_force, current_last = _FIELDS.unpack_from(segment, _SEQ.size)
+        _FIELDS.pack_into(
+            segment,
+            _SEQ.size,
+            current_rate if rate is None else rate,
+            current_force if force is None else int(force),
+            current_last if last_failure is None else last_failure,
+        )
 
 
 def set_failure_rate(rate: float) -> None:
     """
     Establece la probabilidad de fallo.
-    
+
     Args:
         rate: Número entre 0.0 (sin fallos) y 1.0 (fallo garantizado)
     """
-    global _failure_rate
     if not (0.0 <= rate <= 1.0):
         raise ValueError(f"Failure rate debe estar entre 0.0 y 1.0, recibido: {rate}")
-    
-    with _config_lock:
-        _failure_rate = rate
+
+    _write_fields(rate=rate)
 
 
 def set_force_failure(force: bool) -> None:
     """
     Fuerza fallo garantizado.
-    
+
     Args:
         force: True para forzar siempre fallo, False para deshabilitar
     """
-    global _force_failure
-    with _config_lock:
-        _force_failure = force
+    _write_fields(force=force)
 
 
 def get_failure_config() -> dict:
     """Retorna la configuración actual de fallos"""
-    with _config_lock:
-        return {
-            "failure_rate": _failure_rate,
-            "force_failure": _force_failure,
-            "last_failure": _last_failure.isoformat() if _last_failure else None,
-        }
+    rate, force, last_failure = _read()
+    return {
+        "failure_rate": rate,
+        "force_failure": force,
+        "last_failure": datetime.utcfromtimestamp(last_failure).isoformat() if last_failure else None,
+    }
 
 
 def record_failure() -> None:
     """Registra que ocurrió un fallo"""
-    global _last_failure
-    with _config_lock:
-        _last_failure = datetime.utcnow()
+    _write_fields(last_failure=time.time())
 
 
 def should_fail() -> bool:
     """Determina si la próxima operación debe fallar"""
-    with _config_lock:
-        return _force_failure or _failure_rate > 0
+    rate, force, _ = _read()
+    return force or rate > 0
 
 
 def get_failure_rate() -> float:
     """Retorna la probabilidad de fallo actual"""
-    with _config_lock:
-        return _failure_rate
+    return _read()[0]
 
 
 def get_force_failure() -> bool:
     """Retorna si el fallo está forzado"""
-    with _config_lock:
-        return _force_failure
+    return _read()[1]
 
 
 def reset_config() -> None:
     """Resetea la configuración a valores por defecto"""
-    global _failure_rate, _force_failure, _last_failure
-    with _config_lock:
-        _failure_rate = 0.0
-        _force_failure = False
-        _last_failure = None
+    with _write() as segment:
+        _FIELDS.pack_into(segment, _SEQ.size, 0.0, 0, 0.0)
 
 
 def has_recent_failure(seconds: int = 30) -> bool:
     """
     Verifica si hubo un fallo en los últimos N segundos.
-    
+
     Args:
         seconds: Ventana de tiempo en segundos
-        
+
     Returns:
         True si hubo fallo reciente, False en caso contrario
     """
-    with _config_lock:
-        if _last_failure is None:
-            return False
-        
-        time_since_failure = datetime.utcnow() - _last_failure
-        return time_since_failure < timedelta(seconds=seconds)
+    last_failure = _read()[2]
+    if not last_failure:
+        return False
+
+    time_since_failure = timedelta(seconds=time.time() - last_failure)
+    return time_since_failure < timedelta(seconds=seconds)
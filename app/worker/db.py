@@ -3,18 +3,58 @@ import os
 import sqlite3
 from contextlib import closing
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 from app.models.operation import Operation
-from app.models.monitoring import HealthCheck, Incident
+from app.models.monitoring import (
+    FAILURE_STATUSES,
+    INCIDENT_OUTAGE,
+    FlapState,
+    HealthCheck,
+    Incident,
+    IncidentAggregate,
+)
+from app.models.security import VIOLATION_STATUSES, SecurityEvent
 
 DB_PATH = os.getenv("SQLITE_DB_PATH", "/data/operations.db")
 
+# Columnas en el orden que esperan HealthCheck.from_row / Incident.from_row
+HEALTH_CHECK_COLUMNS = "id, service, request_id, status, latency_ms, http_code, timestamp, is_timeout"
+INCIDENT_COLUMNS = (
+    "id, service, started_at, detected_at, resolved_at, severity, "
+    "consecutive_failures, resolution_action, mttd_seconds, mttr_seconds, "
+    "recovery_status, recovery_detail, incident_type"
+)
+
+# Tope de filas por página de los listados paginados
+MAX_PAGE_SIZE = 500
+
+# Filas por lote de los exports en streaming
+EXPORT_BATCH_SIZE = 2000
+
+# Dimensiones de los reportes de violaciones de seguridad -> columna de security_events
+SECURITY_REPORT_DIMENSIONS = {
+    "hotel": "requested_hotel_id",
+    "ip": "ip_address",
+    "endpoint": "endpoint",
+}
+
+# Fila de data_versions que cubre incidents (los health checks no la mueven:
+# llegan en cada ronda de pings e invalidarían la cache en casi cada pedido)
+MONITORING_DATA_VERSION = "monitoring"
+
 
 def _utc_now_iso() -> str:
     return datetime.utcnow().isoformat() + "Z"
 
 
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    """Agrega una columna a una tabla existente si todavía no la tiene (migración liviana)"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
 def init_db() -> None:
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     with closing(sqlite3.connect(DB_PATH)) as conn:
@@ -74,6 +114,12 @@ def init_db() -> None:
             """
         )
         
+        # Resultado de la acción de recovery (se completa en forma asíncrona)
+        _ensure_column(conn, "incidents", "recovery_status", "TEXT")
+        _ensure_column(conn, "incidents", "recovery_detail", "TEXT")
+        # OUTAGE (fallas) o DEGRADATION (latencia anómala); los previos son caídas
+        _ensure_column(conn, "incidents", "incident_type", f"TEXT NOT NULL DEFAULT '{INCIDENT_OUTAGE}'")
+        
         # Índice para incidentes activos
         conn.execute(
             """
@@ -82,6 +128,154 @@ def init_db() -> None:
             """
         )
         
+        # Paginación por keyset: (service, id) evita ordenar todos los checks del servicio
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_health_checks_service_id
+            ON health_checks(service, id)
+            """
+        )
+        
+        # Índice parcial: sólo los incidentes activos (get_active_incidents)
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_incidents_active
+            ON incidents(service, id) WHERE resolved_at IS NULL
+            """
+        )
+        
+        # Índices para las agregaciones por ventana de tiempo (métricas)
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_health_checks_timestamp
+            ON health_checks(timestamp)
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_incidents_resolved_at
+            ON incidents(resolved_at)
+            """
+        )
+        
+        # Acumuladores de MTTD/MTTR/MTBF por servicio (se mantienen al escribir incidentes)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS incident_aggregates (
+                service TEXT PRIMARY KEY,
+                total_incidents INTEGER NOT NULL DEFAULT 0,
+                resolved_incidents INTEGER NOT NULL DEFAULT 0,
+                mttd_count INTEGER NOT NULL DEFAULT 0,
+                mttd_sum REAL NOT NULL DEFAULT 0,
+                mttd_min REAL,
+                mttd_max REAL,
+                mttr_count INTEGER NOT NULL DEFAULT 0,
+                mttr_sum REAL NOT NULL DEFAULT 0,
+                mttr_min REAL,
+                mttr_max REAL,
+                mtbf_count INTEGER NOT NULL DEFAULT 0,
+                mtbf_sum REAL NOT NULL DEFAULT 0,
+                last_resolved_at TEXT,
+                downtime_seconds REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # Backfill: DBs con incidentes previos a la tabla de acumuladores
+        has_aggregates = conn.execute("SELECT 1 FROM incident_aggregates LIMIT 1").fetchone()
+        has_incidents = conn.execute("SELECT 1 FROM incidents LIMIT 1").fetchone()
+        if has_incidents and not has_aggregates:
+            _rebuild_incident_aggregates(conn)
+        
+        # Versión de los datos de monitoreo: la mueven triggers en cada escritura de
+        # health checks o incidentes (la usa la cache de respuestas de la API)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO data_versions(name, version) VALUES (?, 0)",
+            (MONITORING_DATA_VERSION,),
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_health_checks_{event.lower()}_version")
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_incidents_{event.lower()}_version
+                AFTER {event} ON incidents
+                BEGIN
+                    UPDATE data_versions SET version = version + 1
+                    WHERE name = '{MONITORING_DATA_VERSION}';
+                END
+                """
+            )
+        
+        # Flapping por servicio (lo escribe el proceso que recibe los checks,
+        # lo leen las métricas de la API)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS service_flaps (
+                service TEXT PRIMARY KEY,
+                flapping INTEGER NOT NULL DEFAULT 0,
+                transitions INTEGER NOT NULL DEFAULT 0,
+                flapping_since TEXT,
+                last_transition_at TEXT,
+                episodes INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT
+            )
+            """
+        )
+        
+        # Pings en vuelo: correlación ping -> echo por request_id (RTT y lag de la cola)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ping_flights (
+                request_id TEXT PRIMARY KEY,
+                sent_at REAL NOT NULL,
+                worker_at REAL,
+                echo_at REAL,
+                rtt_ms REAL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_ping_flights_sent_at
+            ON ping_flights(sent_at)
+            """
+        )
+        
+        # Eventos de seguridad/auditoría del gateway (sólo INSERT, en lotes).
+        # event_id UNIQUE: una redelivery del mismo mensaje no duplica filas
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS security_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id TEXT NOT NULL UNIQUE,
+                ts TEXT NOT NULL,
+                user_id TEXT,
+                token_hotel_id TEXT,
+                requested_hotel_id TEXT,
+                endpoint TEXT,
+                method TEXT,
+                ip_address TEXT,
+                action TEXT,
+                status TEXT,
+                http_code INTEGER,
+                message TEXT,
+                received_at TEXT NOT NULL
+            )
+            """
+        )
+        # Un índice por dimensión de los reportes (agrupar por dimensión dentro de una ventana)
+        for dimension, column in SECURITY_REPORT_DIMENSIONS.items():
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_security_events_{dimension}_ts ON security_events({column}, ts)"
+            )
+        
         # Mantener tabla legacy para compatibilidad
         conn.execute(
             """
@@ -212,12 +406,38 @@ def save_health_check(check: HealthCheck) -> int:
         return cursor.lastrowid
 
 
+def save_health_checks(checks: List[HealthCheck]) -> None:
+    """Guarda una ronda de health checks en una sola transacción (executemany)"""
+    if not checks:
+        return
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.executemany(
+            """
+            INSERT INTO health_checks(service, request_id, status, latency_ms, http_code, timestamp, is_timeout)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    check.service,
+                    check.request_id,
+                    check.status,
+                    check.latency_ms,
+                    check.http_code,
+                    check.timestamp,
+                    1 if check.is_timeout else 0,
+                )
+                for check in checks
+            ],
+        )
+        conn.commit()
+
+
 def get_recent_health_checks(service: str, limit: int = 10) -> List[HealthCheck]:
     """Obtiene los últimos N health checks de un servicio"""
     with closing(sqlite3.connect(DB_PATH)) as conn:
         rows = conn.execute(
-            """
-            SELECT id, service, request_id, status, latency_ms, http_code, timestamp, is_timeout 
+            f"""
+            SELECT {HEALTH_CHECK_COLUMNS}
             FROM health_checks 
             WHERE service = ? 
             ORDER BY id DESC 
@@ -233,8 +453,8 @@ def get_all_recent_health_checks(limit: int = 50) -> List[HealthCheck]:
     """Obtiene los últimos N health checks de TODOS los servicios"""
     with closing(sqlite3.connect(DB_PATH)) as conn:
         rows = conn.execute(
-            """
-            SELECT id, service, request_id, status, latency_ms, http_code, timestamp, is_timeout 
+            f"""
+            SELECT {HEALTH_CHECK_COLUMNS}
             FROM health_checks 
             ORDER BY id DESC 
             LIMIT ?
@@ -245,6 +465,162 @@ def get_all_recent_health_checks(limit: int = 50) -> List[HealthCheck]:
     return [HealthCheck.from_row(row) for row in rows]
 
 
+def _placeholders(values: List[Any]) -> str:
+    return ", ".join("?" for _ in values)
+
+
+def _fetch_page(
+    table: str,
+    columns: str,
+    ts_column: str,
+    limit: int,
+    service: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    before_ts: Optional[str] = None,
+) -> tuple[List[tuple], bool]:
+    """
+    Página por keyset sobre `id`: con before_id (o sin cursor) devuelve las
+    filas más viejas que el cursor, con after_id las más nuevas. Siempre en
+    orden descendente. Retorna (filas, hay más en la dirección pedida).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    conditions, params = [], []
+    if service is not None:
+        conditions.append("service = ?")
+        params.append(service)
+    if before_id is not None:
+        conditions.append("id < ?")
+        params.append(before_id)
+    if after_id is not None:
+        conditions.append("id > ?")
+        params.append(after_id)
+    if before_ts is not None:
+        conditions.append(f"{ts_column} < ?")
+        params.append(before_ts)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # Hacia adelante se recorre en orden ascendente desde el cursor y se invierte
+    order = "ASC" if after_id is not None and before_id is None else "DESC"
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(
+            f"SELECT {columns} FROM {table} {where} ORDER BY id {order} LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if order == "ASC":
+        rows.reverse()
+    return rows, has_more
+
+
+def get_health_checks_page(
+    limit: int = 50,
+    service: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    before_ts: Optional[str] = None,
+) -> tuple[List[HealthCheck], bool]:
+    """Página de health checks (más reciente primero); before_ts filtra por timestamp"""
+    rows, has_more = _fetch_page(
+        "health_checks", HEALTH_CHECK_COLUMNS, "timestamp", limit, service, before_id, after_id, before_ts
+    )
+    return [HealthCheck.from_row(row) for row in rows], has_more
+
+
+def get_recent_health_checks_for_services(services: List[str], limit: int = 10) -> Dict[str, List[HealthCheck]]:
+    """
+    Últimos N health checks de cada servicio (más reciente primero) sobre una
+    sola conexión: una consulta por servicio, cada una resuelta con
+    idx_health_checks_service_id sin recorrer el historial.
+    """
+    result: Dict[str, List[HealthCheck]] = {service: [] for service in services}
+    if not services:
+        return result
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        for service in services:
+            rows = conn.execute(
+                f"SELECT {HEALTH_CHECK_COLUMNS} FROM health_checks WHERE service = ? ORDER BY id DESC LIMIT ?",
+                (service, limit),
+            ).fetchall()
+            result[service] = [HealthCheck.from_row(row) for row in rows]
+    return result
+
+
+def iter_health_check_columns(
+    since: str,
+    services: Optional[List[str]] = None,
+    batch_size: int = 5000,
+) -> Iterator[List[tuple]]:
+    """
+    Health checks desde `since` (ISO8601) en lotes de filas
+    (service, epoch_seconds, latency_ms, is_failure), sin construir un
+    HealthCheck por fila. El timestamp se convierte a epoch en SQLite.
+    """
+    query = f"""
+        SELECT service,
+               (julianday(timestamp) - 2440587.5) * 86400.0,
+               latency_ms,
+               status IN ({', '.join('?' for _ in FAILURE_STATUSES)})
+        FROM health_checks
+        WHERE timestamp >= ?
+    """
+    params: List[Any] = [*FAILURE_STATUSES, since]
+    if services is not None:
+        query += f" AND service IN ({', '.join('?' for _ in services)})"
+        params.extend(services)
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+
+def get_health_check_window_stats(since: str, buckets_ms: List[float]) -> Dict[str, dict]:
+    """
+    Conteos, fallas, latencia (suma/conteo/máximo) e histograma por servicio
+    desde `since` (ISO8601), agregados en SQLite con un GROUP BY
+    (service, bucket): no se transfiere ninguna fila de checks.
+    """
+    bucket_case = " ".join(f"WHEN latency_ms <= {float(b)!r} THEN {i}" for i, b in enumerate(buckets_ms))
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT service,
+                   CASE WHEN latency_ms IS NULL THEN NULL {bucket_case} ELSE {len(buckets_ms)} END AS bucket,
+                   COUNT(*),
+                   SUM(status IN ({', '.join('?' for _ in FAILURE_STATUSES)})),
+                   COUNT(latency_ms),
+                   SUM(latency_ms),
+                   MAX(latency_ms)
+            FROM health_checks
+            WHERE timestamp >= ?
+            GROUP BY service, bucket
+            """,
+            (*FAILURE_STATUSES, since),
+        ).fetchall()
+
+    stats: Dict[str, dict] = {}
+    for service, bucket, count, failures, latency_count, latency_sum, latency_max in rows:
+        entry = stats.setdefault(service, {
+            "count": 0,
+            "failures": 0,
+            "latency_count": 0,
+            "latency_sum": 0.0,
+            "latency_max": None,
+            "buckets": [0] * (len(buckets_ms) + 1),
+        })
+        entry["count"] += count
+        entry["failures"] += failures
+        if bucket is not None:
+            entry["buckets"][bucket] += latency_count
+            entry["latency_count"] += latency_count
+            entry["latency_sum"] += latency_sum
+            entry["latency_max"] = max(entry["latency_max"] or 0.0, latency_max)
+    return stats
+
+
 def get_last_n_health_checks(service: str, n: int) -> List[HealthCheck]:
     """Obtiene los últimos N health checks (ordenados del más reciente al más antiguo)"""
     return get_recent_health_checks(service, limit=n)
@@ -272,16 +648,122 @@ def count_consecutive_failures(service: str, threshold: int) -> tuple[int, Optio
 
 # ==================== INCIDENTS ====================
 
+def _load_aggregate(conn: sqlite3.Connection, service: str) -> IncidentAggregate:
+    row = conn.execute(
+        f"SELECT {', '.join(IncidentAggregate.COLUMNS)} FROM incident_aggregates WHERE service = ?",
+        (service,),
+    ).fetchone()
+    return IncidentAggregate.from_row(row) if row else IncidentAggregate(service=service)
+
+
+def _store_aggregate(conn: sqlite3.Connection, aggregate: IncidentAggregate) -> None:
+    columns = IncidentAggregate.COLUMNS
+    conn.execute(
+        f"INSERT OR REPLACE INTO incident_aggregates({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' for _ in columns)})",
+        aggregate.to_row(),
+    )
+
+
+def _rebuild_incident_aggregates(conn: sqlite3.Connection) -> None:
+    """Recalcula todos los acumuladores recorriendo los incidentes en orden"""
+    aggregates: Dict[str, IncidentAggregate] = {}
+    rows = conn.execute(
+        f"SELECT {INCIDENT_COLUMNS} FROM incidents WHERE incident_type = ? ORDER BY id",
+        (INCIDENT_OUTAGE,),
+    )
+    for row in rows:
+        incident = Incident.from_row(row)
+        aggregate = aggregates.setdefault(incident.service, IncidentAggregate(service=incident.service))
+        aggregate.record_opened(incident)
+        if incident.resolved_at:
+            aggregate.record_resolved(incident)
+    conn.execute("DELETE FROM incident_aggregates")
+    for aggregate in aggregates.values():
+        _store_aggregate(conn, aggregate)
+
+
+def rebuild_incident_aggregates() -> None:
+    """Reconstruye incident_aggregates desde la tabla incidents"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_incident_aggregates(conn)
+        conn.commit()
+
+
+def get_incident_aggregate(service: str) -> IncidentAggregate:
+    """Acumuladores de un servicio (vacíos si nunca tuvo incidentes)"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        return _load_aggregate(conn, service)
+
+
+def get_incident_aggregates(services: List[str]) -> Dict[str, IncidentAggregate]:
+    """Acumuladores de varios servicios en una sola consulta"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(IncidentAggregate.COLUMNS)} FROM incident_aggregates "
+            f"WHERE service IN ({', '.join('?' for _ in services)})",
+            list(services),
+        ).fetchall()
+    found = {row[0]: IncidentAggregate.from_row(row) for row in rows}
+    return {service: found.get(service) or IncidentAggregate(service=service) for service in services}
+
+
+def get_incident_window_stats(since: str, now: str, incident_type: str = INCIDENT_OUTAGE) -> Dict[str, dict]:
+    """
+    Estadísticas de incidentes de un tipo por servicio para la ventana
+    [since, now] (ISO8601) en una sola consulta GROUP BY: incidentes iniciados
+    en la ventana, activos, MTTD/MTTR (sumas, conteos, min/max) y downtime
+    recortado a la ventana (incluye incidentes que empezaron antes y siguen
+    activos). Para DEGRADATION el "downtime" es el tiempo degradado.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(
+            """
+            SELECT service,
+                   SUM(started_at >= :since),
+                   SUM(resolved_at IS NULL),
+                   SUM(started_at >= :since AND resolved_at IS NOT NULL),
+                   SUM(CASE WHEN started_at >= :since THEN mttd_seconds END),
+                   COUNT(CASE WHEN started_at >= :since THEN mttd_seconds END),
+                   MIN(CASE WHEN started_at >= :since THEN mttd_seconds END),
+                   MAX(CASE WHEN started_at >= :since THEN mttd_seconds END),
+                   SUM(CASE WHEN resolved_at IS NOT NULL THEN mttr_seconds END),
+                   COUNT(CASE WHEN resolved_at IS NOT NULL THEN mttr_seconds END),
+                   MIN(CASE WHEN resolved_at IS NOT NULL THEN mttr_seconds END),
+                   MAX(CASE WHEN resolved_at IS NOT NULL THEN mttr_seconds END),
+                   SUM(MAX(0.0, (
+                       MIN(julianday(COALESCE(resolved_at, :now)), julianday(:now))
+                       - MAX(julianday(started_at), julianday(:since))
+                   ) * 86400.0))
+            FROM incidents
+            WHERE incident_type = :incident_type AND (resolved_at IS NULL OR resolved_at >= :since)
+            GROUP BY service
+            """,
+            {"since": since, "now": now, "incident_type": incident_type},
+        ).fetchall()
+
+    keys = (
+        "incidents", "active", "resolved",
+        "mttd_sum", "mttd_count", "mttd_min", "mttd_max",
+        "mttr_sum", "mttr_count", "mttr_min", "mttr_max",
+        "downtime_seconds",
+    )
+    return {row[0]: dict(zip(keys, row[1:])) for row in rows}
+
+
 def save_incident(incident: Incident) -> int:
-    """Guarda un incidente y retorna el ID"""
+    """Guarda un incidente y retorna el ID (actualiza sus acumuladores en la misma transacción)"""
     with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
         cursor = conn.execute(
             """
             INSERT INTO incidents(
                 service, started_at, detected_at, resolved_at, severity, 
-                consecutive_failures, resolution_action, mttd_seconds, mttr_seconds
+                consecutive_failures, resolution_action, mttd_seconds, mttr_seconds,
+                incident_type
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 incident.service,
@@ -293,25 +775,31 @@ def save_incident(incident: Incident) -> int:
                 incident.resolution_action,
                 incident.mttd_seconds,
                 incident.mttr_seconds,
+                incident.incident_type,
             ),
         )
+        if incident.incident_type == INCIDENT_OUTAGE:
+            aggregate = _load_aggregate(conn, incident.service)
+            aggregate.record_opened(incident)
+            if incident.resolved_at:
+                aggregate.record_resolved(incident)
+            _store_aggregate(conn, aggregate)
         conn.commit()
         return cursor.lastrowid
 
 
-def get_active_incident(service: str) -> Optional[Incident]:
-    """Obtiene el incidente activo (no resuelto) para un servicio"""
+def get_active_incident(service: str, incident_type: str = INCIDENT_OUTAGE) -> Optional[Incident]:
+    """Obtiene el incidente activo (no resuelto) de un tipo para un servicio"""
     with closing(sqlite3.connect(DB_PATH)) as conn:
         row = conn.execute(
-            """
-            SELECT id, service, started_at, detected_at, resolved_at, severity,
-                   consecutive_failures, resolution_action, mttd_seconds, mttr_seconds
+            f"""
+            SELECT {INCIDENT_COLUMNS}
             FROM incidents 
-            WHERE service = ? AND resolved_at IS NULL 
+            WHERE service = ? AND resolved_at IS NULL AND incident_type = ?
             ORDER BY id DESC 
             LIMIT 1
             """,
-            (service,),
+            (service, incident_type),
         ).fetchone()
 
     if not row:
@@ -321,8 +809,16 @@ def get_active_incident(service: str) -> Optional[Incident]:
 
 
 def update_incident(incident: Incident) -> None:
-    """Actualiza un incidente existente"""
+    """
+    Actualiza un incidente existente. Si la actualización lo resuelve, acumula
+    MTTR/MTBF/downtime en la misma transacción (una sola vez por incidente).
+    """
     with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        previous = conn.execute(
+            "SELECT service, started_at, resolved_at, incident_type FROM incidents WHERE id = ?",
+            (incident.id,),
+        ).fetchone()
         conn.execute(
             """
             UPDATE incidents
@@ -336,6 +832,22 @@ def update_incident(incident: Incident) -> None:
                 incident.id,
             ),
         )
+        if previous and previous[2] is None and incident.resolved_at and previous[3] == INCIDENT_OUTAGE:
+            resolved = Incident(
+                id=incident.id,
+                service=previous[0],
+                started_at=previous[1],
+                detected_at=incident.detected_at,
+                resolved_at=incident.resolved_at,
+                severity=incident.severity,
+                consecutive_failures=incident.consecutive_failures,
+                resolution_action=incident.resolution_action,
+                mttd_seconds=incident.mttd_seconds,
+                mttr_seconds=incident.mttr_seconds,
+            )
+            aggregate = _load_aggregate(conn, resolved.service)
+            aggregate.record_resolved(resolved)
+            _store_aggregate(conn, aggregate)
         conn.commit()
 
 
@@ -343,9 +855,8 @@ def get_incidents_by_service(service: str, limit: int = 50) -> List[Incident]:
     """Obtiene los últimos N incidentes de un servicio"""
     with closing(sqlite3.connect(DB_PATH)) as conn:
         rows = conn.execute(
-            """
-            SELECT id, service, started_at, detected_at, resolved_at, severity,
-                   consecutive_failures, resolution_action, mttd_seconds, mttr_seconds
+            f"""
+            SELECT {INCIDENT_COLUMNS}
             FROM incidents 
             WHERE service = ? 
             ORDER BY id DESC 
@@ -361,9 +872,8 @@ def get_all_incidents(limit: int = 100) -> List[Incident]:
     """Obtiene todos los incidentes recientes"""
     with closing(sqlite3.connect(DB_PATH)) as conn:
         rows = conn.execute(
-            """
-            SELECT id, service, started_at, detected_at, resolved_at, severity,
-                   consecutive_failures, resolution_action, mttd_seconds, mttr_seconds
+            f"""
+            SELECT {INCIDENT_COLUMNS}
             FROM incidents 
             ORDER BY id DESC 
             LIMIT ?
@@ -374,4 +884,304 @@ def get_all_incidents(limit: int = 100) -> List[Incident]:
     return [Incident.from_row(row) for row in rows]
 
 
+def get_incidents_page(
+    limit: int = 50,
+    service: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    before_ts: Optional[str] = None,
+) -> tuple[List[Incident], bool]:
+    """Página de incidentes (más reciente primero); before_ts filtra por started_at"""
+    rows, has_more = _fetch_page(
+        "incidents", INCIDENT_COLUMNS, "started_at", limit, service, before_id, after_id, before_ts
+    )
+    return [Incident.from_row(row) for row in rows], has_more
+
+
+def get_active_incidents(
+    services: Optional[List[str]] = None,
+    incident_type: Optional[str] = INCIDENT_OUTAGE,
+) -> List[Incident]:
+    """
+    Incidentes activos (más reciente primero), sobre el índice parcial de
+    activos. incident_type=None trae caídas y degradaciones.
+    """
+    # Sin INDEXED BY el planner elige idx_incidents_resolved_at, que indexa todo el historial
+    query = f"SELECT {INCIDENT_COLUMNS} FROM incidents INDEXED BY idx_incidents_active WHERE resolved_at IS NULL"
+    params: List[Any] = []
+    if incident_type is not None:
+        query += " AND incident_type = ?"
+        params.append(incident_type)
+    if services is not None:
+        query += f" AND service IN ({_placeholders(services)})"
+        params.extend(services)
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(query + " ORDER BY id DESC", params).fetchall()
+    return [Incident.from_row(row) for row in rows]
+
+
+def get_service_incidents(service: str, limit: int = 50) -> tuple[List[Incident], Optional[Incident]]:
+    """
+    Últimos N incidentes de un servicio (de cualquier tipo) y su caída activa
+    (aunque sea más vieja que los N) en una sola consulta.
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT * FROM (
+                SELECT 0 AS is_active_row, {INCIDENT_COLUMNS} FROM incidents
+                WHERE service = ? ORDER BY id DESC LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 1, {INCIDENT_COLUMNS} FROM incidents
+                WHERE service = ? AND resolved_at IS NULL AND incident_type = ? ORDER BY id DESC LIMIT 1
+            )
+            """,
+            (service, limit, service, INCIDENT_OUTAGE),
+        ).fetchall()
+    incidents = [Incident.from_row(row[1:]) for row in rows if not row[0]]
+    active = next((Incident.from_row(row[1:]) for row in rows if row[0]), None)
+    return incidents, active
+
+
+def get_services_under_suspicion(services: List[str]) -> List[str]:
+    """
+    Servicios cuyo último health check es una falla o que tienen un incidente activo.
+
+    Lo usa el scheduler del monitor en cada ronda: los incidentes activos salen
+    del índice parcial y el último check de cada servicio de una búsqueda por
+    idx_health_checks_service_id, todo sobre una sola conexión.
+    """
+    if not services:
+        return []
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        suspects = {
+            row[0]
+            for row in conn.execute(
+                f"""
+                SELECT service FROM incidents INDEXED BY idx_incidents_active
+                WHERE resolved_at IS NULL AND incident_type = ? AND service IN ({_placeholders(services)})
+                """,
+                (INCIDENT_OUTAGE, *services),
+            )
+        }
+        for service in services:
+            if service in suspects:
+                continue
+            row = conn.execute(
+                "SELECT status FROM health_checks WHERE service = ? ORDER BY id DESC LIMIT 1",
+                (service,),
+            ).fetchone()
+            if row and row[0] in FAILURE_STATUSES:
+                suspects.add(service)
+    return [service for service in services if service in suspects]
+
+
+def attach_recovery_result(incident_id: int, status: str, detail: Optional[str] = None) -> None:
+    """Registra en el incidente el resultado (asíncrono) de la acción de recovery"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.execute(
+            "UPDATE incidents SET recovery_status = ?, recovery_detail = ? WHERE id = ?",
+            (status, detail, incident_id),
+        )
+        conn.commit()
+
+
+# ==================== FLAPPING ====================
+
+def save_flap_state(state: FlapState) -> None:
+    columns = ", ".join(FlapState.COLUMNS)
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO service_flaps({columns}) VALUES ({_placeholders(FlapState.COLUMNS)})",
+            state.to_row(),
+        )
+        conn.commit()
+
+
+def get_flap_states(services: Optional[List[str]] = None) -> Dict[str, FlapState]:
+    """Estado de flapping guardado por servicio (sólo los que tuvieron cambios de estado)"""
+    query = f"SELECT {', '.join(FlapState.COLUMNS)} FROM service_flaps"
+    params: List[Any] = []
+    if services is not None:
+        query += f" WHERE service IN ({_placeholders(services)})"
+        params.extend(services)
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(query, params).fetchall()
+    return {row[0]: FlapState.from_row(row) for row in rows}
+
 
+def get_data_version(name: str = MONITORING_DATA_VERSION) -> int:
+    """Versión monotónica de los datos (cambia con cada escritura de incidentes)"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        row = conn.execute("SELECT version FROM data_versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+# ==================== EXPORT ====================
+
+# tabla -> (columnas, columna de tiempo para los filtros since/until)
+EXPORT_TABLES = {
+    "health_checks": (HEALTH_CHECK_COLUMNS, "timestamp"),
+    "incidents": (INCIDENT_COLUMNS, "started_at"),
+}
+
+
+def export_columns(table: str) -> List[str]:
+    return [column.strip() for column in EXPORT_TABLES[table][0].split(",")]
+
+
+def iter_export_batches(
+    table: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    service: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[List[tuple]]:
+    """
+    Filas de health_checks / incidents en orden de id, en lotes de
+    `batch_size`. Cada lote es una consulta corta por keyset (id > último):
+    un SELECT abierto durante todo el export tomaría el lock compartido de
+    SQLite y bloquearía las escrituras del monitor hasta terminar.
+    """
+    columns, ts_column = EXPORT_TABLES[table]
+    conditions, params = ["id > ?"], []
+    if since is not None:
+        conditions.append(f"{ts_column} >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append(f"{ts_column} < ?")
+        params.append(until)
+    if service is not None:
+        conditions.append("service = ?")
+        params.append(service)
+    query = f"SELECT {columns} FROM {table} WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+
+    last_id = 0
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        while True:
+            rows = conn.execute(query, (last_id, *params, batch_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+            if len(rows) < batch_size:
+                return
+
+
+# ==================== PING FLIGHTS ====================
+
+def record_ping_sent(request_id: str, sent_at: float) -> None:
+    """Registra un ping enviado por la cola (sent_at: epoch en segundos)"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO ping_flights(request_id, sent_at) VALUES (?, ?)",
+            (request_id, sent_at),
+        )
+        conn.commit()
+
+
+def record_echo_received(request_id: str, echo_at: float, worker_at: Optional[float] = None) -> Optional[float]:
+    """
+    Cierra el vuelo de un ping al llegar su echo. Retorna el RTT en ms, o None
+    si el request_id no corresponde a un ping registrado (o ya tenía echo).
+    """
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        row = conn.execute(
+            """
+            UPDATE ping_flights
+            SET echo_at = ?, worker_at = ?, rtt_ms = (? - sent_at) * 1000.0
+            WHERE request_id = ? AND echo_at IS NULL
+            RETURNING rtt_ms
+            """,
+            (echo_at, worker_at, echo_at, request_id),
+        ).fetchone()
+        conn.commit()
+    return row[0] if row else None
+
+
+def get_ping_flights(since: float) -> List[tuple]:
+    """(request_id, sent_at, worker_at, echo_at, rtt_ms) de los pings enviados desde `since`"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        return conn.execute(
+            """
+            SELECT request_id, sent_at, worker_at, echo_at, rtt_ms
+            FROM ping_flights
+            WHERE sent_at >= ?
+            ORDER BY sent_at
+            """,
+            (since,),
+        ).fetchall()
+
+
+def prune_ping_flights(older_than: float) -> int:
+    """Borra los vuelos enviados antes de `older_than` (epoch)"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        cursor = conn.execute("DELETE FROM ping_flights WHERE sent_at < ?", (older_than,))
+        conn.commit()
+        return cursor.rowcount
+
+
+# ==================== SECURITY EVENTS ====================
+
+def save_security_events(events: List[SecurityEvent]) -> int:
+    """
+    Guarda un lote de eventos de seguridad en una sola transacción. Los
+    event_id ya guardados se ignoran; retorna cuántas filas se insertaron.
+    """
+    if not events:
+        return 0
+    columns = ", ".join(SecurityEvent.COLUMNS)
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        before = conn.total_changes
+        conn.executemany(
+            f"INSERT OR IGNORE INTO security_events({columns}) VALUES ({_placeholders(SecurityEvent.COLUMNS)})",
+            [event.to_row() for event in events],
+        )
+        conn.commit()
+        return conn.total_changes - before
+
+
+def get_security_events(limit: int = 50) -> List[SecurityEvent]:
+    """Últimos eventos de seguridad guardados"""
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(SecurityEvent.COLUMNS)} FROM security_events ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    return [SecurityEvent.from_row(row) for row in rows]
+
+
+def get_security_violation_stats(dimension: str, since: str, limit: int = 50) -> List[dict]:
+    """
+    Violaciones (status en VIOLATION_STATUSES) desde `since` agrupadas por
+    hotel, IP o endpoint, de mayor a menor. Usa el índice (dimensión, ts).
+    """
+    column = SECURITY_REPORT_DIMENSIONS[dimension]
+    with closing(sqlite3.connect(DB_PATH)) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {column}, COUNT(*),
+                   COUNT(DISTINCT ip_address), COUNT(DISTINCT user_id), COUNT(DISTINCT requested_hotel_id),
+                   MIN(ts), MAX(ts)
+            FROM security_events
+            WHERE ts >= ? AND status IN ({_placeholders(VIOLATION_STATUSES)})
+            GROUP BY {column}
+            ORDER BY COUNT(*) DESC, {column}
+            LIMIT ?
+            """,
+            (since, *VIOLATION_STATUSES, limit),
+        ).fetchall()
+    return [
+        {
+            dimension: row[0],
+            "violations": row[1],
+            "distinct_ips": row[2],
+            "distinct_users": row[3],
+            "distinct_hotels": row[4],
+            "first_seen": row[5],
+            "last_seen": row[6],
+        }
+        for row in rows
+    ]
@@ -8,6 +8,8 @@ from app.worker.config import (
     get_failure_config,
     reset_config,
 )
+from app.worker.task_metrics import get_aggregated_task_metrics
+from app.worker.autoscaler import read_autoscaler_state
 
 flask_app = Flask(__name__)
 
@@ -81,6 +83,21 @@ def reset_config_endpoint():
     }), 200
 
 
+@flask_app.route("/metrics/tasks", methods=["GET"])
+def task_metrics():
+    """
+    Tiempo en cola, tiempo de ejecución y reintentos por task,
+    agregados de todos los procesos Celery (worker y monitor).
+    """
+    return jsonify(get_aggregated_task_metrics()), 200
+
+
+@flask_app.route("/metrics/autoscaler", methods=["GET"])
+def autoscaler_metrics():
+    """Tamaño actual del pool y decisiones de escalado del autoscaler"""
+    return jsonify(read_autoscaler_state()), 200
+
+
 @flask_app.route("/health", methods=["GET"])
 def health():
     """Health check del worker"""
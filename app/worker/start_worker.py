@@ -1,23 +1,47 @@
 #!/usr/bin/env python
-"""Script de inicio para el worker con Celery + Flask"""
+"""Script de inicio para el worker con Celery + Flask + Autoscaler"""
 
 import os
+import socket
 import sys
+import threading
 from multiprocessing import Process
 
 # Asegurar que la app está en el path
 sys.path.insert(0, '/app')
 
-from app.worker.celery_app import celery_app
+from app.worker.celery_app import celery_app, BROKER_URL
 from app.worker.flask_app import flask_app
+from app.worker.autoscaler import (
+    AutoscalerConfig,
+    CeleryPoolControl,
+    QueueDepthAutoscaler,
+    RedisQueueDepthSource,
+    TaskQueueWaitSource,
+    autoscaler_state_path,
+)
+from app.constants.queues import OPERATIONS_QUEUE, PING_QUEUE, TASK_PROCESS_OPERATION
 
+AUTOSCALE_ENABLED = os.getenv("WORKER_AUTOSCALE_ENABLED", "true").lower() == "true"
 
-def run_celery():
-    """Ejecuta el worker Celery"""
+# Un nodo Celery por clase de cola: las operaciones (0.3s+) nunca ocupan los
+# slots reservados para los pings, así el echo no llega tarde por saturación.
+OPS_NODE_NAME = "ops"
+PING_NODE_NAME = "ping"
+PING_POOL_CONCURRENCY = int(os.getenv("WORKER_PING_CONCURRENCY", "2"))
+
+
+def run_celery_node(node_name: str, queues: str, concurrency: int):
+    """Ejecuta un nodo worker Celery dedicado a las colas indicadas"""
     celery_app.worker_main(argv=[
         'worker',
         '--loglevel=info',
-        '--queues=ops.process,monitoring.ping',
+        f'--queues={queues}',
+        f'--concurrency={concurrency}',
+        f'--hostname={node_name}@%h',
+        # Sin prefetch extra: un proceso ocupado no acapara mensajes de la cola
+        '--prefetch-multiplier=1',
+        '-O', 'fair',
     ])
 
 
@@ -31,24 +55,62 @@ def run_flask():
     )
 
 
+def build_autoscaler(config: AutoscalerConfig) -> QueueDepthAutoscaler:
+    """Autoscaler del pool de operaciones según la profundidad de ops.process y la espera en cola"""
+    return QueueDepthAutoscaler(
+        depth_source=RedisQueueDepthSource(BROKER_URL, OPERATIONS_QUEUE),
+        latency_source=TaskQueueWaitSource(TASK_PROCESS_OPERATION),
+        pool_control=CeleryPoolControl(celery_app, f"{OPS_NODE_NAME}@{socket.gethostname()}"),
+        config=config,
+        name=OPS_NODE_NAME,
+        state_path=autoscaler_state_path(OPS_NODE_NAME),
+    )
+
+
 if __name__ == '__main__':
-    # Crear procesos para Celery y Flask
-    celery_process = Process(target=run_celery, daemon=False)
+    autoscaler_config = AutoscalerConfig.from_env()
+    initial_concurrency = (
+        autoscaler_config.min_concurrency if AUTOSCALE_ENABLED else autoscaler_config.max_concurrency
+    )
+
+    # Crear procesos: un nodo Celery por clase de cola + Flask
+    ops_process = Process(
+        target=run_celery_node,
+        args=(OPS_NODE_NAME, OPERATIONS_QUEUE, initial_concurrency),
+        daemon=False,
+    )
+    ping_process = Process(
+        target=run_celery_node,
+        args=(PING_NODE_NAME, PING_QUEUE, PING_POOL_CONCURRENCY),
+        daemon=False,
+    )
     flask_process = Process(target=run_flask, daemon=False)
-    
+    processes = [ops_process, ping_process, flask_process]
+
     print("🚀 Iniciando Worker con Celery + Flask...")
-    print("   - Celery: escuchando colas ops.process, monitoring.ping")
+    print(f"   - Celery {OPS_NODE_NAME}@: cola {OPERATIONS_QUEUE} ({initial_concurrency} procesos)")
+    print(f"   - Celery {PING_NODE_NAME}@: cola {PING_QUEUE} ({PING_POOL_CONCURRENCY} procesos reservados)")
     print("   - Flask: escuchando en puerto 5005")
-    
-    celery_process.start()
-    flask_process.start()
-    
+
+    for process in processes:
+        process.start()
+
+    stop_autoscaler = threading.Event()
+    if AUTOSCALE_ENABLED:
+        autoscaler = build_autoscaler(autoscaler_config)
+        threading.Thread(target=autoscaler.run, args=(stop_autoscaler,), daemon=True).start()
+        print(
+            f"   - Autoscaler: pool entre {autoscaler_config.min_concurrency} "
+            f"y {autoscaler_config.max_concurrency} procesos"
+        )
+
     try:
-        celery_process.join()
-        flask_process.join()
+        for process in processes:
+            process.join()
     except KeyboardInterrupt:
         print("\n📴 Deteniendo worker...")
-        celery_process.terminate()
-        flask_process.terminate()
-        celery_process.join()
-        flask_process.join()
+        stop_autoscaler.set()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
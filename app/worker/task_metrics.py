@@ -0,0 +1,386 @@
+"""Instrumentación de tasks Celery: tiempo en cola, tiempo de ejecución y reintentos
+
+Los hooks de señales de Celery registran, por nombre de task, histogramas por
+proceso. Cada proceso vuelca periódicamente su snapshot a un archivo JSON en
+TASK_METRICS_DIR (volumen compartido /data), y cualquier proceso (Flask del
+worker, API del monitor) puede agregarlos con get_aggregated_task_metrics().
+Un thread por proceso reescribe el snapshot cada TASK_METRICS_KEEPALIVE_SECONDS
+aunque el proceso esté ocioso; los snapshots sin reescribir por más de
+TASK_METRICS_STALE_SECONDS son de procesos muertos y se descartan (y borran).
+
+- before_task_publish: estampa la hora de publicación en los headers del mensaje
+- task_prerun: calcula el tiempo de espera en cola (publicación/ETA -> inicio)
+- task_postrun: registra el tiempo de ejecución y el resultado
+- task_retry / task_failure: cuentan reintentos y fallas
+- worker_process_shutdown: último volcado de los hijos prefork (no corren atexit)
+"""
+
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional
+
+from celery.signals import (
+    before_task_publish,
+    task_prerun,
+    task_postrun,
+    task_retry,
+    task_failure,
+    worker_process_shutdown,
+)
+
+from app.worker.db import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+TASK_METRICS_DIR = os.getenv(
+    "TASK_METRICS_DIR",
+    os.path.join(os.path.dirname(DB_PATH), "task_metrics"),
+)
+FLUSH_INTERVAL_SECONDS = 1.0
+TASK_METRICS_KEEPALIVE_SECONDS = 5 * FLUSH_INTERVAL_SECONDS
+TASK_METRICS_STALE_SECONDS = 3 * TASK_METRICS_KEEPALIVE_SECONDS
+
+# Header donde se estampa la hora de publicación (epoch UTC en segundos)
+PUBLISHED_AT_HEADER = "published_at"
+
+# Límites superiores (ms) de los buckets de los histogramas; el último bucket es +inf
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    """Histograma de latencias con buckets fijos (mergeable entre procesos)"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        value_ms = max(value_ms, 0.0)
+        index = len(BUCKETS_MS)
+        for i, upper in enumerate(BUCKETS_MS):
+            if value_ms <= upper:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def merge(self, data: dict) -> None:
+        for i, value in enumerate(data.get("buckets", [])[: len(self.counts)]):
+            self.counts[i] += value
+        self.count += data.get("count", 0)
+        self.sum_ms += data.get("sum_ms", 0.0)
+        self.max_ms = max(self.max_ms, data.get("max_ms", 0.0))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimación del percentil q (0-100): límite superior del bucket que lo contiene"""
+        if self.count == 0:
+            return None
+        target = q / 100 * self.count
+        cumulative = 0
+        for i, value in enumerate(self.counts):
+            cumulative += value
+            if cumulative >= target and value > 0:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": list(self.counts),
+            "count": self.count,
+            "sum_ms": self.sum_ms,
+            "max_ms": self.max_ms,
+        }
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 2) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 2) if self.count else None,
+            "buckets_le_ms": dict(zip([str(b) for b in BUCKETS_MS] + ["+Inf"], self.counts)),
+        }
+
+
+class TaskStats:
+    """Estadísticas acumuladas de un nombre de task"""
+
+    def __init__(self):
+        self.queue_wait = Histogram()
+        self.run_time = Histogram()
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def merge(self, data: dict) -> None:
+        self.queue_wait.merge(data.get("queue_wait", {}))
+        self.run_time.merge(data.get("run_time", {}))
+        self.succeeded += data.get("succeeded", 0)
+        self.failed += data.get("failed", 0)
+        self.retried += data.get("retried", 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "queue_wait": self.queue_wait.to_dict(),
+            "run_time": self.run_time.to_dict(),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    def summary(self) -> dict:
+        return {
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "queue_wait": self.queue_wait.summary(),
+            "run_time": self.run_time.summary(),
+        }
+
+
+_lock = Lock()
+_stats: Dict[str, TaskStats] = {}
+_started: Dict[str, float] = {}
+_last_flush = 0.0
+_installed = False
+_keepalive_pid: Optional[int] = None
+
+
+def _get_stats(task_name: str) -> TaskStats:
+    stats = _stats.get(task_name)
+    if stats is None:
+        stats = _stats[task_name] = TaskStats()
+        _ensure_keepalive()
+    return stats
+
+
+def _keepalive_loop(pid: int) -> None:
+    while _keepalive_pid == pid:
+        time.sleep(TASK_METRICS_KEEPALIVE_SECONDS)
+        if _keepalive_pid == pid:
+            flush(force=True)
+
+
+def _ensure_keepalive() -> None:
+    """Arranca el thread que mantiene fresco el snapshot (uno por proceso, también tras un fork)"""
+    global _keepalive_pid
+    pid = os.getpid()
+    if _keepalive_pid == pid:
+        return
+    _keepalive_pid = pid
+    threading.Thread(target=_keepalive_loop, args=(pid,), name="task-metrics-keepalive", daemon=True).start()
+
+
+def _snapshot_path(pid: Optional[int] = None) -> str:
+    return os.path.join(TASK_METRICS_DIR, f"{socket.gethostname()}-{pid or os.getpid()}.json")
+
+
+def _parse_eta(eta) -> Optional[float]:
+    if not eta:
+        return None
+    if isinstance(eta, datetime):
+        return eta.timestamp()
+    try:
+        return datetime.fromisoformat(str(eta).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def flush(force: bool = False) -> None:
+    """Vuelca el snapshot del proceso a disco (escritura atómica, como máximo 1/s)"""
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL_SECONDS:
+        return
+
+    with _lock:
+        if not _stats:
+            return
+        snapshot = {
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "updated_at": datetime.utcnow().isoformat() + "Z",
+            "written_at": time.time(),
+            "tasks": {name: stats.to_dict() for name, stats in _stats.items()},
+        }
+        _last_flush = now
+
+    try:
+        os.makedirs(TASK_METRICS_DIR, exist_ok=True)
+        path = _snapshot_path()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug(f"Could not flush task metrics: {e}")
+
+
+def record_queue_wait(task_name: str, wait_ms: float) -> None:
+    with _lock:
+        _get_stats(task_name).queue_wait.observe(wait_ms)
+
+
+def record_run_time(task_name: str, run_ms: float, state: Optional[str]) -> None:
+    with _lock:
+        stats = _get_stats(task_name)
+        stats.run_time.observe(run_ms)
+        if state == "SUCCESS":
+            stats.succeeded += 1
+    flush()
+
+
+def record_retry(task_name: str) -> None:
+    with _lock:
+        _get_stats(task_name).retried += 1
+
+
+def record_failure(task_name: str) -> None:
+    with _lock:
+        _get_stats(task_name).failed += 1
+
+
+# ==================== SIGNAL HANDLERS ====================
+
+def _on_before_task_publish(sender=None, headers=None, **kwargs):
+    # Siempre se sobreescribe: un reintento es un nuevo encolado aunque herede headers
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+def _on_task_prerun(sender=None, task_id=None, task=None, **kwargs):
+    task = task or sender
+    now = time.time()
+    _started[task_id] = time.perf_counter()
+
+    request = getattr(task, "request", None)
+    if request is None:
+        return
+    published_at = request.get(PUBLISHED_AT_HEADER) or (request.headers or {}).get(PUBLISHED_AT_HEADER)
+    if published_at is None:
+        return
+
+    # Con countdown/ETA el mensaje no está "esperando" antes de su ETA
+    ready_at = max(float(published_at), _parse_eta(request.eta) or 0.0)
+    record_queue_wait(task.name, (now - ready_at) * 1000)
+
+
+def _on_task_postrun(sender=None, task_id=None, task=None, state=None, **kwargs):
+    task = task or sender
+    started = _started.pop(task_id, None)
+    if started is None:
+        return
+    record_run_time(task.name, (time.perf_counter() - started) * 1000, state)
+
+
+def _on_task_retry(sender=None, **kwargs):
+    if sender is not None:
+        record_retry(sender.name)
+
+
+def _on_task_failure(sender=None, **kwargs):
+    if sender is not None:
+        record_failure(sender.name)
+
+
+def _on_worker_process_shutdown(**kwargs):
+    flush(force=True)
+
+
+def install_task_signal_handlers() -> None:
+    """Conecta los hooks de señales (idempotente; las señales de Celery son globales)"""
+    global _installed
+    if _installed:
+        return
+    before_task_publish.connect(_on_before_task_publish, weak=False)
+    task_prerun.connect(_on_task_prerun, weak=False)
+    task_postrun.connect(_on_task_postrun, weak=False)
+    task_retry.connect(_on_task_retry, weak=False)
+    task_failure.connect(_on_task_failure, weak=False)
+    worker_process_shutdown.connect(_on_worker_process_shutdown, weak=False)
+    atexit.register(flush, True)
+    _installed = True
+
+
+# ==================== AGGREGATION ====================
+
+def _read_snapshots() -> List[dict]:
+    own_path = _snapshot_path()
+    stale_before = time.time() - TASK_METRICS_STALE_SECONDS
+    snapshots = []
+    try:
+        names = os.listdir(TASK_METRICS_DIR)
+    except OSError:
+        return snapshots
+
+    for name in names:
+        path = os.path.join(TASK_METRICS_DIR, name)
+        if not name.endswith(".json") or path == own_path:
+            continue
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue  # Archivo a medio escribir o corrupto
+        if snapshot.get("written_at", 0) < stale_before:
+            # Proceso muerto (o snapshot sin written_at de una versión anterior)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def _merge_snapshots() -> tuple:
+    merged: Dict[str, TaskStats] = {}
+    snapshots = _read_snapshots()
+
+    with _lock:
+        own = {name: stats.to_dict() for name, stats in _stats.items()}
+    if own:
+        snapshots.append({"tasks": own})
+
+    for snapshot in snapshots:
+        for name, data in snapshot.get("tasks", {}).items():
+            merged.setdefault(name, TaskStats()).merge(data)
+    return merged, len(snapshots)
+
+
+def get_aggregated_task_stats() -> Dict[str, TaskStats]:
+    """TaskStats acumuladas de todos los procesos, por nombre de task"""
+    return _merge_snapshots()[0]
+
+
+def get_aggregated_task_metrics() -> dict:
+    """Agrega los histogramas de todos los procesos (incluido el actual, en memoria)"""
+    merged, processes = _merge_snapshots()
+
+    return {
+        "processes": processes,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "tasks": {name: stats.summary() for name, stats in sorted(merged.items())},
+    }
+
+
+def reset_task_metrics() -> None:
+    """Limpia las métricas en memoria del proceso actual y detiene el keepalive (para tests)"""
+    global _last_flush, _keepalive_pid
+    with _lock:
+        _stats.clear()
+        _started.clear()
+        _last_flush = 0.0
+        _keepalive_pid = None
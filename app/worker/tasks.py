@@ -1,7 +1,10 @@
+import logging
 import random
 import time
-from datetime import datetime
-from celery.exceptions import MaxRetriesExceededError
+from datetime import datetime, timezone
+from typing import List, Optional
+from celery.exceptions import MaxRetriesExceededError, SoftTimeLimitExceeded, TimeLimitExceeded
+from celery.signals import task_revoked, task_failure
 import requests
 
 from app.worker.celery_app import celery_app
@@ -23,21 +26,46 @@ from app.constants.queues import (
     LOGS_QUEUE,
     MONITORED_SERVICES,
     PING_TIMEOUT_SECONDS,
+    PING_EXPIRY_SECONDS,
+    OPERATION_TIMEOUT_SECONDS,
+    OPERATION_HARD_LIMIT_GRACE_SECONDS,
 )
 
 # Importar componente de Auditoría para registrar la tarea de Celery
 from app.audit.audit_service import log_record
 
+logger = logging.getLogger(__name__)
+
 init_db()
 
+TIMED_OUT_ERROR = f"Operation deadline of {OPERATION_TIMEOUT_SECONDS}s exceeded"
+
+
+def _mark_timed_out(operation_id: str, reason: str) -> dict:
+    """Marca la operación como TIMED_OUT (deadline end-to-end vencido)"""
+    logger.warning(f"Operation {operation_id} TIMED_OUT: {reason}")
+    update_operation_status(operation_id, "TIMED_OUT", error=f"{TIMED_OUT_ERROR} ({reason})")
+    return {"operation_id": operation_id, "status": "TIMED_OUT"}
+
 
-@celery_app.task(bind=True, name=TASK_PROCESS_OPERATION, max_retries=5)
+@celery_app.task(
+    bind=True,
+    name=TASK_PROCESS_OPERATION,
+    max_retries=5,
+    soft_time_limit=OPERATION_TIMEOUT_SECONDS,
+    time_limit=OPERATION_TIMEOUT_SECONDS + OPERATION_HARD_LIMIT_GRACE_SECONDS,
+)
 def process_operation(self, operation_id: str):
+    operation = None
     try:
         operation = get_operation(operation_id)
         if operation is None:
             raise ValueError(f"Operation {operation_id} not found")
 
+        # No gastar capacidad en trabajo que el cliente ya abandonó
+        if operation.is_expired(OPERATION_TIMEOUT_SECONDS):
+            return _mark_timed_out(operation_id, "deadline passed before execution")
+
         update_operation_status(operation_id, "PROCESSING")
 
         time.sleep(0.3)
@@ -53,18 +81,50 @@ def process_operation(self, operation_id: str):
         update_operation_status(operation_id, "PROCESSED")
         return {"operation_id": operation_id, "status": "PROCESSED"}
 
+    except SoftTimeLimitExceeded:
+        return _mark_timed_out(operation_id, "execution exceeded soft time limit")
+
     except Exception as exc:
         retry_count = self.request.retries
         countdown = min(2 ** retry_count, 30)
 
+        # Un reintento que arrancaría después del deadline no tiene sentido;
+        # los que sí se encolan heredan el deadline como expiración del mensaje
+        retry_options = {}
+        if operation is not None:
+            deadline = operation.deadline(OPERATION_TIMEOUT_SECONDS)
+            if (deadline - datetime.utcnow()).total_seconds() <= countdown:
+                _mark_timed_out(operation_id, f"no time left to retry after: {exc}")
+                raise
+            retry_options["expires"] = deadline.replace(tzinfo=timezone.utc)
+
         try:
-            raise self.retry(exc=exc, countdown=countdown)
+            raise self.retry(exc=exc, countdown=countdown, **retry_options)
         except MaxRetriesExceededError:
             update_operation_status(operation_id, "FAILED", error=str(exc))
             raise
 
 
-@celery_app.task(name=TASK_PING_WORKER)
+@task_revoked.connect
+def _on_operation_revoked(sender=None, request=None, expired=False, **kwargs):
+    """Mensajes de ops.process descartados por expirar en cola -> TIMED_OUT"""
+    if not expired or request is None or getattr(sender, "name", None) != TASK_PROCESS_OPERATION:
+        return
+    args = getattr(request, "args", None) or ()
+    if args:
+        _mark_timed_out(args[0], "message expired in queue")
+
+
+@task_failure.connect
+def _on_operation_hard_timeout(sender=None, task_id=None, exception=None, args=None, **kwargs):
+    """El hard time limit mata al proceso hijo; el padre registra el TIMED_OUT"""
+    if getattr(sender, "name", None) != TASK_PROCESS_OPERATION or not isinstance(exception, TimeLimitExceeded):
+        return
+    if args:
+        _mark_timed_out(args[0], "execution exceeded hard time limit")
+
+
+@celery_app.task(name=TASK_PING_WORKER, expires=PING_EXPIRY_SECONDS)
 def ping_worker(request_id: str):
     ts = datetime.utcnow().isoformat() + "Z"
 
@@ -90,16 +150,24 @@ def ping_worker(request_id: str):
     return payload
 
 
-@celery_app.task(name=TASK_PING_ALL_SERVICES)
-def ping_all_services(request_id: str):
+@celery_app.task(name=TASK_PING_ALL_SERVICES, expires=PING_EXPIRY_SECONDS)
+def ping_all_services(request_id: str, services: Optional[List[str]] = None, reply_queue: Optional[str] = None):
     """
-    Hace ping HTTP a todos los microservicios y reporta resultados.
+    Hace ping HTTP a los microservicios y reporta resultados.
     Este task es consumido por el Worker y el resultado va a la cola echo.
+
+    services: subconjunto de MONITORED_SERVICES a consultar (None = todos).
+    El monitor ya prueba los servicios HTTP en forma directa y envía [] para
+    usar este ping sólo como probe end-to-end de la cola + Redis.
+    reply_queue: cola del echo (default ECHO_QUEUE); con varias instancias del
+    monitor cada una pide la suya.
     """
     results = []
     ts = datetime.utcnow().isoformat() + "Z"
     
     for service_name, url in MONITORED_SERVICES.items():
+        if services is not None and service_name not in services:
+            continue
         start = time.time()
         
         try:
@@ -205,7 +273,7 @@ def ping_all_services(request_id: str):
     celery_app.send_task(
         TASK_ECHO_RESPONSE,
         kwargs=payload,
-        queue=ECHO_QUEUE,
+        queue=reply_queue or ECHO_QUEUE,
     )
     
     return payload
@@ -0,0 +1,235 @@
+"""Tests para el autoscaler del pool guiado por profundidad de cola"""
+
+import json
+import threading
+from dataclasses import replace
+
+import pytest
+
+from app.worker.autoscaler import AutoscalerConfig, QueueDepthAutoscaler
+
+
+class FakeDepth:
+    """Fuente de profundidad de cola controlada por el test"""
+
+    def __init__(self, depth: int = 0):
+        self.depth = depth
+
+    def __call__(self) -> int:
+        return self.depth
+
+
+class FakePool:
+    """Registra las llamadas de grow/shrink"""
+
+    def __init__(self):
+        self.calls = []
+
+    def grow(self, n: int) -> None:
+        self.calls.append(("grow", n))
+
+    def shrink(self, n: int) -> None:
+        self.calls.append(("shrink", n))
+
+
+class FailingPool(FakePool):
+    """Pool cuyo remote control falla mientras `failing` sea True"""
+
+    def __init__(self):
+        super().__init__()
+        self.failing = True
+
+    def grow(self, n: int) -> None:
+        if self.failing:
+            raise ConnectionError("broadcast failed")
+        super().grow(n)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def config():
+    return AutoscalerConfig(
+        min_concurrency=2,
+        max_concurrency=8,
+        scale_up_backlog_per_process=2,
+        scale_down_backlog_per_process=0.5,
+        max_queue_wait_ms=1000,
+        scale_up_samples=2,
+        scale_down_samples=3,
+        scale_up_cooldown_seconds=10,
+        scale_down_cooldown_seconds=30,
+        max_step=4,
+    )
+
+
+def _make(config, depth=0, latency=None):
+    depth_source = FakeDepth(depth)
+    pool = FakePool()
+    clock = FakeClock()
+    latency_source = (lambda: latency) if latency is not None else None
+    scaler = QueueDepthAutoscaler(depth_source, pool, config, latency_source=latency_source, clock=clock)
+    return scaler, depth_source, pool, clock
+
+
+class TestScaleUp:
+    """Crecimiento ante backlog sostenido"""
+
+    def test_requires_sustained_pressure(self, config):
+        scaler, depth, pool, clock = _make(config, depth=20)
+
+        first = scaler.sample()
+        assert first["action"] == "hold"
+        assert pool.calls == []
+
+        second = scaler.sample()
+        assert second["action"] == "scale_up"
+        assert scaler.concurrency == 6  # ceil(20/2)=10, step limitado a 4
+        assert pool.calls == [("grow", 4)]
+
+    def test_single_spike_does_not_scale(self, config):
+        scaler, depth, pool, clock = _make(config, depth=20)
+        scaler.sample()
+        depth.depth = 0
+        scaler.sample()
+        depth.depth = 20
+        scaler.sample()
+
+        assert pool.calls == []
+
+    def test_cooldown_between_scale_ups(self, config):
+        scaler, depth, pool, clock = _make(config, depth=40)
+        scaler.sample()
+        scaler.sample()
+        assert scaler.concurrency == 6
+
+        clock.now = 5
+        scaler.sample()
+        decision = scaler.sample()
+        assert decision["reason"] == "scale-up cooldown"
+
+        clock.now = 11
+        decision = scaler.sample()
+        assert decision["action"] == "scale_up"
+        assert scaler.concurrency == 8
+
+    def test_never_exceeds_max(self, config):
+        scaler, depth, pool, clock = _make(config, depth=1000)
+        for i in range(10):
+            clock.now = i * 100
+            scaler.sample()
+        assert scaler.concurrency == config.max_concurrency
+
+    def test_latency_pressure_scales_up(self, config):
+        scaler, depth, pool, clock = _make(config, depth=0, latency=5000)
+        scaler.sample()
+        decision = scaler.sample()
+        assert decision["action"] == "scale_up"
+        assert scaler.concurrency == 3
+
+
+class TestScaleDown:
+    """Achicamiento con histéresis"""
+
+    def test_scales_down_one_step_after_calm(self, config):
+        scaler, depth, pool, clock = _make(config, depth=40)
+        scaler.sample()
+        scaler.sample()
+        assert scaler.concurrency == 6
+
+        depth.depth = 0
+        clock.now = 100
+        for _ in range(2):
+            assert scaler.sample()["action"] == "hold"
+        decision = scaler.sample()
+        assert decision["action"] == "scale_down"
+        assert scaler.concurrency == 5
+        assert pool.calls[-1] == ("shrink", 1)
+
+    def test_hysteresis_band_holds(self, config):
+        """Entre el umbral de bajada y el de subida no se cambia el tamaño"""
+        scaler, depth, pool, clock = _make(config, depth=3)
+        for i in range(10):
+            clock.now = i * 100
+            scaler.sample()
+        assert pool.calls == []
+
+    def test_never_below_min(self, config):
+        scaler, depth, pool, clock = _make(config, depth=0)
+        for i in range(10):
+            clock.now = i * 100
+            scaler.sample()
+        assert scaler.concurrency == config.min_concurrency
+        assert pool.calls == []
+
+
+class TestMetricsExport:
+    """Las decisiones se exportan como métricas"""
+
+    def test_snapshot_counts_decisions(self, config):
+        scaler, depth, pool, clock = _make(config, depth=20)
+        scaler.sample()
+        scaler.sample()
+
+        snapshot = scaler.snapshot()
+        assert snapshot["decisions"]["scale_up"] == 1
+        assert snapshot["decisions"]["hold"] == 1
+        assert snapshot["last_depth"] == 20
+        assert snapshot["recent_scaling_decisions"][0]["to"] == 6
+
+    def test_state_file_written(self, config, tmp_path):
+        scaler, depth, pool, clock = _make(config, depth=0)
+        scaler.state_path = str(tmp_path / "worker.json")
+        scaler.sample()
+
+        with open(scaler.state_path) as f:
+            assert json.load(f)["concurrency"] == 2
+
+    def test_depth_source_errors_are_counted(self, config):
+        def broken():
+            raise ConnectionError("broker down")
+
+        scaler = QueueDepthAutoscaler(broken, FakePool(), config)
+        assert scaler.sample()["action"] == "sample_error"
+        assert scaler.decisions["sample_error"] == 1
+
+    def test_pool_control_errors_keep_recorded_size(self, config):
+        pool = FailingPool()
+        scaler = QueueDepthAutoscaler(FakeDepth(20), pool, config, clock=FakeClock())
+        scaler.sample()
+
+        decision = scaler.sample()
+
+        assert decision["action"] == "control_error"
+        assert decision["to"] == scaler.concurrency == 2
+        assert scaler.decisions["control_error"] == 1
+        assert scaler.decisions["scale_up"] == 0
+
+        # La presión sigue sostenida: al recuperarse el broker escala sin esperar cooldown
+        pool.failing = False
+        assert scaler.sample()["action"] == "scale_up"
+        assert scaler.concurrency == 6
+
+    def test_run_survives_pool_control_errors(self, config):
+        scaler = QueueDepthAutoscaler(FakeDepth(20), FailingPool(), replace(config, interval_seconds=0.01))
+        stop = threading.Event()
+        thread = threading.Thread(target=scaler.run, args=(stop,), daemon=True)
+        thread.start()
+        try:
+            for _ in range(200):
+                if scaler.decisions["control_error"] >= 3:
+                    break
+                stop.wait(0.01)
+            assert thread.is_alive()
+        finally:
+            stop.set()
+            thread.join(timeout=2)
+
+        assert scaler.decisions["control_error"] >= 3
+        assert scaler.concurrency == 2
@@ -0,0 +1,144 @@
+"""Tests para la configuración de fallos compartida entre procesos"""
+
+import multiprocessing
+import os
+
+import pytest
+
+from app.worker import config
+from app.worker.config import (
+    get_failure_config,
+    get_failure_rate,
+    get_force_failure,
+    has_recent_failure,
+    record_failure,
+    reset_config,
+    set_failure_rate,
+    set_force_failure,
+    should_fail,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_worker_config(tmp_path, monkeypatch):
+    """Segmento propio del test (WORKER_CONFIG_SEGMENT_PATH en tmp_path) con la configuración por defecto"""
+    monkeypatch.setattr(config, "CONFIG_SEGMENT_PATH", str(tmp_path / "worker_config"))
+    monkeypatch.setattr(config, "_segment", None)
+    monkeypatch.setattr(config, "_segment_fd", None)
+    monkeypatch.setattr(config, "_segment_pid", None)
+    monkeypatch.setattr(config, "_last_read", (0.0, False, 0.0))
+    reset_config()
+    yield
+    config._segment.close()
+    os.close(config._segment_fd)
+
+
+def _child_set_rate(rate: float) -> None:
+    set_failure_rate(rate)
+
+
+def _child_record_failure() -> None:
+    record_failure()
+
+
+def _child_report(queue) -> None:
+    queue.put((get_failure_rate(), get_force_failure(), has_recent_failure(seconds=30)))
+
+
+class TestFailureConfig:
+    """Tests de la API de configuración dentro de un proceso"""
+
+    def test_defaults(self):
+        """La configuración por defecto no inyecta fallos"""
+        assert get_failure_config() == {
+            "failure_rate": 0.0,
+            "force_failure": False,
+            "last_failure": None,
+        }
+        assert should_fail() is False
+        assert has_recent_failure() is False
+
+    def test_invalid_rate_rejected(self):
+        """Rechaza probabilidades fuera de [0, 1] sin modificar el segmento"""
+        set_failure_rate(0.25)
+        with pytest.raises(ValueError):
+            set_failure_rate(1.5)
+        assert get_failure_rate() == 0.25
+
+    def test_fields_are_independent(self):
+        """Actualizar un campo no pisa los demás"""
+        set_failure_rate(0.4)
+        set_force_failure(True)
+        record_failure()
+
+        config = get_failure_config()
+        assert config["failure_rate"] == 0.4
+        assert config["force_failure"] is True
+        assert config["last_failure"] is not None
+        assert should_fail() is True
+
+
+class TestSeqlockReader:
+    """Un escritor muerto a mitad de escritura no deja a los lectores girando"""
+
+    def _leave_write_open(self):
+        segment = config._get_segment()
+        (seq,) = config._SEQ.unpack_from(segment, 0)
+        config._SEQ.pack_into(segment, 0, seq + 1)
+
+    def test_reader_falls_back_to_last_good_value(self, monkeypatch):
+        monkeypatch.setattr(config, "_READ_RETRY_SLEEP_SECONDS", 0)
+        set_failure_rate(0.3)
+        assert get_failure_rate() == 0.3
+
+        self._leave_write_open()
+
+        assert get_failure_rate() == 0.3
+        assert should_fail() is True
+
+    def test_next_writer_closes_abandoned_sequence(self, monkeypatch):
+        monkeypatch.setattr(config, "_READ_RETRY_SLEEP_SECONDS", 0)
+        self._leave_write_open()
+
+        set_failure_rate(0.6)
+
+        (seq,) = config._SEQ.unpack_from(config._get_segment(), 0)
+        assert seq % 2 == 0
+        assert get_failure_rate() == 0.6
+
+
+class TestCrossProcessConfig:
+    """La configuración se comparte entre el proceso Flask, Celery y los hijos prefork"""
+
+    def _run(self, target, *args):
+        ctx = multiprocessing.get_context("fork")
+        process = ctx.Process(target=target, args=args)
+        process.start()
+        process.join(timeout=10)
+        assert process.exitcode == 0
+
+    def test_child_write_visible_in_parent(self):
+        """Un POST /config en otro proceso llega a quien ejecuta process_operation"""
+        self._run(_child_set_rate, 0.75)
+        assert get_failure_rate() == 0.75
+
+    def test_child_failure_visible_in_parent(self):
+        """has_recent_failure ve fallos registrados por otro proceso"""
+        assert has_recent_failure() is False
+        self._run(_child_record_failure)
+        assert has_recent_failure(seconds=30) is True
+
+    def test_parent_write_visible_in_child(self):
+        """Los hijos ven los cambios hechos después del fork"""
+        ctx = multiprocessing.get_context("fork")
+        queue = ctx.Queue()
+        set_force_failure(True)
+        set_failure_rate(0.1)
+        record_failure()
+
+        process = ctx.Process(target=_child_report, args=(queue,))
+        process.start()
+        result = queue.get(timeout=10)
+        process.join(timeout=10)
+
+        assert result == (0.1, True, True)
@@ -0,0 +1,185 @@
+"""Tests para el cliente de la Docker Engine API contra un socket unix falso"""
+
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from app.monitor import recovery
+from app.monitor.docker_client import DockerAPIError, DockerClient
+
+
+class FakeDocker:
+    """Estado del daemon falso"""
+
+    def __init__(self):
+        self.containers = {"payments-service": "running"}
+        self.requests = []
+        self.events = []
+        self.connections = 0
+
+
+def _make_handler(docker: FakeDocker):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            docker.connections += 1
+
+        def _json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            docker.requests.append(("GET", self.path))
+            parts = urlsplit(self.path)
+            if parts.path == "/_ping":
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"OK")
+            elif parts.path == "/events":
+                self._stream_events(parse_qs(parts.query))
+            elif parts.path.startswith("/containers/") and parts.path.endswith("/json"):
+                name = parts.path.split("/")[2]
+                if name not in docker.containers:
+                    self._json(404, {"message": f"No such container: {name}"})
+                else:
+                    self._json(200, {"Name": f"/{name}", "State": {"Status": docker.containers[name]}})
+            else:
+                self._json(404, {"message": "not found"})
+
+        def do_POST(self):
+            docker.requests.append(("POST", self.path))
+            parts = urlsplit(self.path)
+            name = parts.path.split("/")[2]
+            if name not in docker.containers:
+                self._json(404, {"message": f"No such container: {name}"})
+                return
+            now = time.time()
+            docker.events.append({
+                "Type": "container", "Action": "start", "Actor": {"Attributes": {"name": name}},
+                "time": int(now), "timeNano": int(now * 1e9),
+            })
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def _stream_events(self, query):
+            filters = json.loads(query["filters"][0])
+            since = float(query.get("since", ["0"])[0])
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for event in docker.events:
+                if event["timeNano"] / 1e9 < since:
+                    continue
+                if event["Actor"]["Attributes"]["name"] not in filters.get("container", [event["Actor"]["Attributes"]["name"]]):
+                    continue
+                if event["Action"] not in filters.get("event", [event["Action"]]):
+                    continue
+                chunk = (json.dumps(event) + "\n").encode()
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.close_connection = True
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def fake_docker():
+    docker = FakeDocker()
+    socket_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(socket_dir, "docker.sock")
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _make_handler(docker))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = DockerClient(socket_path)
+    yield docker, client
+    client.close()
+    server.shutdown()
+    server.server_close()
+    os.unlink(socket_path)
+    os.rmdir(socket_dir)
+
+
+class TestDockerClient:
+    """Requests sobre el socket unix"""
+
+    def test_ping_and_inspect(self, fake_docker):
+        docker, client = fake_docker
+        assert client.ping() is True
+        assert client.container_status("payments-service") == "running"
+        assert client.inspect("missing") is None
+
+    def test_connection_is_reused(self, fake_docker):
+        docker, client = fake_docker
+        for _ in range(3):
+            client.ping()
+            client.container_status("payments-service")
+        assert docker.connections == 1
+        assert client.connections_opened == 1
+
+    def test_restart_and_confirm_with_event(self, fake_docker):
+        docker, client = fake_docker
+        requested_at = time.time()
+        client.restart("payments-service", timeout=5)
+
+        assert ("POST", "/containers/payments-service/restart?t=5") in docker.requests
+        event = client.wait_for_event("payments-service", ("start",), since=requested_at, timeout=2)
+        assert event["Action"] == "start"
+
+    def test_restart_unknown_container(self, fake_docker):
+        docker, client = fake_docker
+        with pytest.raises(DockerAPIError) as error:
+            client.restart("missing")
+        assert error.value.status == 404
+
+    def test_ping_without_daemon(self, tmp_path):
+        assert DockerClient(str(tmp_path / "missing.sock")).ping() is False
+
+
+class TestRecoveryUsesClient:
+    """recovery.py ya no invoca el CLI"""
+
+    def test_restart_container(self, fake_docker):
+        docker, client = fake_docker
+        with patch.object(recovery, "get_docker_client", return_value=client):
+            result = recovery.restart_container("payments-service", timeout=1)
+
+        assert result["success"] is True
+        assert result["start_confirmed"] is True
+
+    def test_restart_missing_container(self, fake_docker):
+        docker, client = fake_docker
+        with patch.object(recovery, "get_docker_client", return_value=client):
+            result = recovery.restart_container("missing")
+
+        assert result["success"] is False
+        assert "No such container" in result["error"]
+
+    def test_socket_not_available(self, tmp_path):
+        client = DockerClient(str(tmp_path / "missing.sock"))
+        with patch.object(recovery, "get_docker_client", return_value=client):
+            result = recovery.restart_container("payments-service")
+            assert recovery.check_docker_available() is False
+            assert recovery.get_container_status("payments-service") is None
+
+        assert result["error"] == "Docker socket not available"
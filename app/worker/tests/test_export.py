@@ -0,0 +1,102 @@
+"""Tests para el export en streaming de health checks e incidentes"""
+
+import csv
+import io
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.monitoring import HealthCheck
+from app.monitor import api
+from app.worker import db
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+    return api.app.test_client()
+
+
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _ts(seconds: int) -> str:
+    return (BASE + timedelta(seconds=seconds)).isoformat() + "Z"
+
+
+def _seed(count: int, service: str = "search"):
+    db.save_health_checks([
+        HealthCheck(id=0, service=service, request_id=f"ping-{i}", status="UP", latency_ms=float(i),
+                    http_code=200, timestamp=_ts(i))
+        for i in range(count)
+    ])
+
+
+class TestExportBatches:
+    """Lotes por keyset"""
+
+    def test_batches_cover_all_rows(self, client):
+        _seed(25)
+
+        batches = list(db.iter_export_batches("health_checks", batch_size=10))
+
+        assert [len(b) for b in batches] == [10, 10, 5]
+        assert [row[0] for batch in batches for row in batch] == list(range(1, 26))
+
+    def test_writes_are_not_blocked_between_batches(self, client):
+        _seed(20)
+        batches = db.iter_export_batches("health_checks", batch_size=10)
+        next(batches)
+
+        # Con el export a medio camino, otro proceso puede escribir
+        with closing(sqlite3.connect(db.DB_PATH, timeout=0.1)) as conn:
+            conn.execute("DELETE FROM health_checks WHERE id = 20")
+            conn.commit()
+
+        assert sum(len(b) for b in batches) == 9
+
+    def test_filters(self, client):
+        _seed(10)
+        _seed(3, service="payments")
+
+        rows = [r for b in db.iter_export_batches("health_checks", since=_ts(2), until=_ts(5), service="search") for r in b]
+
+        assert [r[2] for r in rows] == ["ping-2", "ping-3", "ping-4"]
+
+
+class TestExportEndpoint:
+    """NDJSON / CSV en streaming"""
+
+    def test_ndjson(self, client):
+        _seed(5)
+
+        response = client.get("/export/health-checks?service=search")
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        assert response.is_streamed
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 5
+        assert json.loads(lines[0])["request_id"] == "ping-0"
+
+    def test_csv(self, client):
+        _seed(3)
+
+        response = client.get(f"/export/health-checks?format=csv&since={_ts(1)}")
+
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert rows[0] == db.export_columns("health_checks")
+        assert [r[2] for r in rows[1:]] == ["ping-1", "ping-2"]
+
+    def test_incidents_empty(self, client):
+        response = client.get("/export/incidents?format=csv")
+        assert response.get_data(as_text=True).splitlines() == [",".join(db.export_columns("incidents"))]
+
+    def test_invalid_params(self, client):
+        assert client.get("/export/operations").status_code == 404
+        assert client.get("/export/incidents?format=xml").status_code == 400
+        assert client.get("/export/incidents?service=unknown").status_code == 404
@@ -0,0 +1,201 @@
+"""Tests para la detección de flapping y el backoff exponencial de restarts"""
+
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app.constants.queues import CONSECUTIVE_FAILURES_THRESHOLD, RECOVERY_CHECK_THRESHOLD
+from app.models.monitoring import FlapState
+from app.monitor import incident_detector
+from app.monitor.incident_detector import FlapTracker, ingest_check_result, reset_detector_state
+from app.monitor.metrics import get_all_services_metrics, get_service_metrics
+from app.monitor.recovery_executor import RecoveryExecutor
+from app.worker import db
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+    reset_detector_state()
+    with patch.object(incident_detector, "submit_recovery", return_value={"submitted": True}) as mock_recover:
+        yield mock_recover
+    reset_detector_state()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _ts() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _cycle(service: str) -> list:
+    """Una caída detectada seguida de una recuperación completa"""
+    actions = [ingest_check_result(service, True, _ts())[0] for _ in range(CONSECUTIVE_FAILURES_THRESHOLD)]
+    actions += [ingest_check_result(service, False, _ts())[0] for _ in range(RECOVERY_CHECK_THRESHOLD)]
+    return actions
+
+
+class TestFlapTracker:
+    """Ventana deslizante de cambios de estado + hold-down"""
+
+    def test_flapping_after_threshold(self, clock):
+        saved = []
+        tracker = FlapTracker(window_seconds=60, threshold=3, hold_down_seconds=30, clock=clock, persist=saved.append)
+
+        for _ in range(2):
+            tracker.record_transition("search")
+            clock.now += 1
+        assert not tracker.is_flapping("search")
+
+        state = tracker.record_transition("search")
+        assert state.flapping and state.episodes == 1
+        assert tracker.is_flapping("search")
+        assert saved[-1].flapping
+
+    def test_transitions_outside_window_do_not_count(self, clock):
+        tracker = FlapTracker(window_seconds=60, threshold=3, hold_down_seconds=30, clock=clock, persist=lambda s: None)
+
+        for _ in range(3):
+            tracker.record_transition("search")
+            clock.now += 40
+
+        assert not tracker.is_flapping("search")
+
+    def test_hold_down_before_clearing(self, clock):
+        saved = []
+        tracker = FlapTracker(window_seconds=20, threshold=3, hold_down_seconds=30, clock=clock, persist=saved.append)
+        for _ in range(3):
+            tracker.record_transition("search")
+
+        # La ventana ya no tiene cambios pero el último fue hace 21s: sigue en hold-down
+        clock.now += 21
+        assert tracker.is_flapping("search")
+
+        clock.now += 10
+        assert not tracker.is_flapping("search")
+        assert saved[-1].flapping is False
+        assert saved[-1].episodes == 1
+
+
+class TestFlappingIncidents:
+    """Las re-fallas rápidas se suman al incidente abierto"""
+
+    def test_refailures_merge_into_open_incident(self, monitor_db):
+        first = _cycle("search")
+        second = _cycle("search")
+        assert first[-1] == "incident_resolved"
+        assert second[-1] == "incident_resolved"
+
+        # Ya hubo 4 cambios UP <-> falla: la próxima recuperación no cierra el incidente
+        third = _cycle("search")
+        fourth = _cycle("search")
+
+        assert third[-1] == "incident_held"
+        assert "incident_created" not in fourth
+        assert len(db.get_incidents_by_service("search")) == 3
+        assert monitor_db.call_count == 3
+        assert db.get_flap_states(["search"])["search"].flapping
+
+    def test_held_incident_resolves_after_hold_down(self, monitor_db, clock):
+        tracker = FlapTracker(window_seconds=60, threshold=2, hold_down_seconds=30, clock=clock)
+        with patch.object(incident_detector, "flap_tracker", tracker):
+            _cycle("search")
+            actions = _cycle("search")
+            assert actions[-1] == "incident_held"
+
+            clock.now += 61
+            action, incident, _ = ingest_check_result("search", False, _ts())
+
+        assert action == "incident_resolved"
+        assert incident.resolved_at is not None
+
+
+class TestRestartBackoff:
+    """El tiempo de espera entre restarts se duplica y se resetea"""
+
+    def test_backoff_doubles_and_caps(self, tmp_path):
+        executor = RecoveryExecutor(
+            recover_fn=lambda service, incident_id=None: {"success": True},
+            cooldown_seconds=10, max_backoff_seconds=50, lock_dir=str(tmp_path / "locks"),
+        )
+
+        assert [executor.backoff_seconds(n) for n in range(5)] == [0.0, 10, 20, 40, 50]
+
+    def test_consecutive_actions_back_off(self, tmp_path, clock):
+        executor = RecoveryExecutor(
+            recover_fn=lambda service, incident_id=None: {"success": True},
+            cooldown_seconds=10, max_backoff_seconds=600, backoff_reset_seconds=300,
+            on_result=lambda *args: None, lock_dir=str(tmp_path / "locks"), clock=clock,
+        )
+        try:
+            for expected in (1, 2, 3):
+                assert executor.submit("search", 1)["submitted"] is True
+                assert executor.wait_idle(2)
+                assert executor.backoff_state("search")["attempts"] == expected
+                clock.now += executor.backoff_seconds(expected) - 1
+                assert executor.submit("search", 1)["reason"] == "cooldown"
+                clock.now += 1
+
+            clock.now += 300
+            executor.submit("search", 1)
+            assert executor.wait_idle(2)
+            assert executor.backoff_state("search")["attempts"] == 1
+        finally:
+            executor.shutdown()
+
+    def test_backoff_shared_through_lock_file(self, tmp_path, clock):
+        kwargs = dict(
+            recover_fn=lambda service, incident_id=None: {"success": True}, cooldown_seconds=10,
+            on_result=lambda *args: None, lock_dir=str(tmp_path / "locks"), clock=clock,
+        )
+        first = RecoveryExecutor(**kwargs)
+        other = RecoveryExecutor(**kwargs)
+        try:
+            for _ in range(2):
+                first.submit("search", 1)
+                assert first.wait_idle(2)
+                clock.now += 10
+
+            assert other.backoff_state("search")["attempts"] == 2
+            assert other.submit("search", 1)["reason"] == "cooldown"
+        finally:
+            first.shutdown()
+            other.shutdown()
+
+
+class TestFlappingMetrics:
+    """El estado de flapping se expone en /metrics"""
+
+    def test_flapping_in_metrics(self, monitor_db):
+        now = datetime.utcnow()
+        db.save_flap_state(FlapState(
+            service="search", flapping=True, transitions=5,
+            flapping_since=(now - timedelta(seconds=30)).isoformat() + "Z",
+            last_transition_at=now.isoformat() + "Z", episodes=2,
+        ))
+
+        metrics = get_all_services_metrics()
+
+        assert metrics["search"]["flapping"]["flapping"] is True
+        assert metrics["search"]["flapping"]["episodes"] == 2
+        assert metrics["payments"]["flapping"]["flapping"] is False
+        assert metrics["_global"]["flapping_services"] == ["search"]
+
+    def test_stale_flapping_row_is_not_reported(self, monitor_db):
+        old = (datetime.utcnow() - timedelta(hours=1)).isoformat() + "Z"
+        db.save_flap_state(FlapState(service="search", flapping=True, transitions=4, last_transition_at=old))
+
+        assert get_service_metrics("search").to_dict()["flapping"]["flapping"] is False
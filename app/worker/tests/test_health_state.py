@@ -0,0 +1,86 @@
+"""Tests para el estado de salud en memoria por servicio"""
+
+import pytest
+
+from app.constants.queues import HEALTH_STATE_WINDOW_SIZE
+from app.models.monitoring import HealthCheck
+from app.monitor.health_state import HealthStateRegistry, ServiceHealthState
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+class TestServiceHealthState:
+    """Ventana deslizante y rachas"""
+
+    def test_streaks(self):
+        state = ServiceHealthState("search")
+        state.record("DOWN", True, "t1")
+        state.record("TIMEOUT", True, "t2")
+        assert state.consecutive_failures == 2
+        assert state.first_failure_ts == "t1"
+
+        state.record("UP", False, "t3", 12.0)
+        assert state.consecutive_failures == 0
+        assert state.first_failure_ts is None
+        assert state.consecutive_ups == 1
+
+    def test_window_is_bounded(self):
+        state = ServiceHealthState("search")
+        for i in range(HEALTH_STATE_WINDOW_SIZE + 5):
+            state.record("UP", False, f"t{i}", float(i))
+
+        snapshot = state.snapshot()
+        assert snapshot["window_size"] == HEALTH_STATE_WINDOW_SIZE
+        assert snapshot["last_check_at"] == f"t{HEALTH_STATE_WINDOW_SIZE + 4}"
+        assert snapshot["window_failure_rate"] == 0
+
+    def test_snapshot_latency_and_failure_rate(self):
+        state = ServiceHealthState("search")
+        state.record("UP", False, "t1", 10.0)
+        state.record("UP", False, "t2", 30.0)
+        state.record("DOWN", True, "t3", None)
+        state.record("UP", False, "t4", 20.0)
+
+        snapshot = state.snapshot()
+        assert snapshot["window_avg_latency_ms"] == 20.0
+        assert snapshot["window_max_latency_ms"] == 30.0
+        assert snapshot["window_failure_rate"] == 0.25
+        assert snapshot["status"] == "UP"
+
+
+class TestRegistry:
+    """Reconstrucción desde SQLite"""
+
+    def test_rebuild_from_db(self, monitor_db):
+        db.save_health_check(HealthCheck.up("payments", "ping-0", 15.0))
+        db.save_health_check(HealthCheck.down("payments", "ping-1"))
+        db.save_health_check(HealthCheck.down("payments", "ping-2"))
+
+        registry = HealthStateRegistry()
+        registry.rebuild(["payments"])
+        state = registry.peek("payments")
+
+        assert state.consecutive_failures == 2
+        assert len(state.window) == 3
+        assert state.fed_locally is False
+
+    def test_local_state_is_not_refreshed(self, monitor_db):
+        registry = HealthStateRegistry()
+        state = registry.get("search")
+        state.record("DOWN", True, "t1")
+
+        db.save_health_check(HealthCheck.up("search", "ping-1", 5.0))
+        assert registry.get("search", max_age=0).consecutive_failures == 1
+
+    def test_stale_db_state_is_refreshed(self, monitor_db):
+        registry = HealthStateRegistry()
+        assert registry.get("search").consecutive_failures == 0
+
+        db.save_health_check(HealthCheck.down("search", "ping-1"))
+        assert registry.get("search").consecutive_failures == 0
+        assert registry.get("search", max_age=-1).consecutive_failures == 1
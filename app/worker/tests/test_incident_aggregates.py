@@ -0,0 +1,133 @@
+"""Tests para los acumuladores de incidentes (MTTD/MTTR/MTBF incrementales)"""
+
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.monitoring import Incident
+from app.monitor.metrics import (
+    calculate_mtbf,
+    calculate_mttd,
+    calculate_mttr,
+    get_all_services_metrics,
+    get_service_metrics,
+)
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat() + "Z"
+
+
+def _incident(service: str, started: datetime, mttd: float) -> Incident:
+    return Incident(
+        id=0,
+        service=service,
+        started_at=_iso(started),
+        detected_at=_iso(started + timedelta(seconds=mttd)),
+        resolved_at=None,
+        severity="WARNING",
+        consecutive_failures=3,
+        resolution_action=None,
+        mttd_seconds=mttd,
+        mttr_seconds=None,
+    )
+
+
+def _resolve(incident: Incident, resolved: datetime) -> None:
+    incident.resolved_at = _iso(resolved)
+    incident.resolution_action = "auto-recovery"
+    detected = datetime.fromisoformat(incident.detected_at.rstrip("Z"))
+    incident.mttr_seconds = (resolved - detected).total_seconds()
+
+
+def _history(base: datetime):
+    """Tres incidentes de search (dos resueltos) y uno de payments"""
+    created = []
+    for offset, mttd, duration in ((0, 2.0, 30), (120, 4.0, 60), (600, 3.0, None)):
+        incident = _incident("search", base + timedelta(seconds=offset), mttd)
+        incident.id = db.save_incident(incident)
+        if duration is not None:
+            _resolve(incident, base + timedelta(seconds=offset + duration))
+            db.update_incident(incident)
+        created.append(incident)
+    payments = _incident("payments", base, 1.0)
+    payments.id = db.save_incident(payments)
+    created.append(payments)
+    return created
+
+
+class TestIncidentAggregates:
+    """Se mantienen al guardar y resolver incidentes"""
+
+    def test_matches_full_recomputation(self, monitor_db):
+        incidents = [i for i in _history(datetime.utcnow() - timedelta(hours=1)) if i.service == "search"]
+        resolved = [i for i in incidents if i.resolved_at]
+
+        aggregate = db.get_incident_aggregate("search")
+
+        assert aggregate.total_incidents == 3
+        assert aggregate.resolved_incidents == 2
+        assert aggregate.active_incidents == 1
+        assert (aggregate.mttd_avg, aggregate.mttd_min, aggregate.mttd_max) == pytest.approx(calculate_mttd(incidents))
+        assert (aggregate.mttr_avg, aggregate.mttr_min, aggregate.mttr_max) == pytest.approx(calculate_mttr(resolved))
+        assert aggregate.mtbf_avg == pytest.approx(calculate_mtbf(resolved))
+        assert aggregate.downtime_seconds == pytest.approx(90.0)
+
+    def test_resolution_is_counted_once(self, monitor_db):
+        incident = _incident("search", datetime.utcnow() - timedelta(minutes=5), 2.0)
+        incident.id = db.save_incident(incident)
+        _resolve(incident, datetime.utcnow())
+        db.update_incident(incident)
+        db.update_incident(incident)
+
+        assert db.get_incident_aggregate("search").resolved_incidents == 1
+
+    def test_backfill_on_init(self, monitor_db):
+        _history(datetime.utcnow() - timedelta(hours=1))
+        expected = db.get_incident_aggregate("search")
+
+        with closing(sqlite3.connect(db.DB_PATH)) as conn:
+            conn.execute("DELETE FROM incident_aggregates")
+            conn.commit()
+        db.init_db()
+
+        assert db.get_incident_aggregate("search") == expected
+
+    def test_unknown_service_is_empty(self, monitor_db):
+        aggregate = db.get_incident_aggregate("reserves")
+        assert aggregate.total_incidents == 0
+        assert aggregate.mttd_avg is None
+
+
+class TestMetricsFromAggregates:
+    """Los endpoints de métricas leen los acumuladores"""
+
+    def test_service_metrics(self, monitor_db):
+        _history(datetime.utcnow() - timedelta(hours=1))
+
+        metrics = get_service_metrics("search", window_hours=24).to_dict()
+
+        assert metrics["incidents"] == {"total": 3, "active": 1, "resolved": 2}
+        assert metrics["mttd"]["avg_seconds"] == 3.0
+        assert metrics["mtbf_avg_seconds"] == pytest.approx(90.0)
+        assert metrics["availability"]["percent"] < 100
+
+    def test_global_metrics(self, monitor_db):
+        _history(datetime.utcnow() - timedelta(hours=1))
+
+        metrics = get_all_services_metrics(window_hours=24)
+
+        assert metrics["_global"]["total_incidents"] == 4
+        assert metrics["_global"]["active_incidents"] == 2
+        assert metrics["_global"]["mttd_avg_seconds"] == 2.5
+        assert metrics["payments"]["incidents"]["active"] == 1
+        assert metrics["reserves"]["incidents"]["total"] == 0
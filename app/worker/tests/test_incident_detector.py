@@ -0,0 +1,165 @@
+"""Tests para el detector de incidentes guiado por eventos"""
+
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from app.constants.queues import CONSECUTIVE_FAILURES_THRESHOLD, RECOVERY_CHECK_THRESHOLD
+from app.models.monitoring import HealthCheck
+from app.monitor import health_state, incident_detector
+from app.monitor.incident_detector import (
+    ingest_check_result,
+    ingest_echo_results,
+    reset_detector_state,
+)
+from app.worker import db
+from app.worker.db import get_active_incident, save_health_check
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    """DB aislada por test + detector sin estado ni recovery real"""
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+    reset_detector_state()
+    with patch.object(incident_detector, "submit_recovery", return_value={"submitted": True, "status": "QUEUED"}) as mock_recover:
+        yield mock_recover
+    reset_detector_state()
+
+
+def _ts() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class TestIngestCheckResult:
+    """La racha se mantiene en memoria y la DB sólo se toca en transiciones"""
+
+    def test_incident_created_at_threshold(self, monitor_db):
+        actions = [ingest_check_result("payments", True, _ts())[0] for _ in range(CONSECUTIVE_FAILURES_THRESHOLD)]
+
+        assert actions[-1] == "incident_created"
+        assert all(a == "healthy" for a in actions[:-1])
+        assert get_active_incident("payments") is not None
+        monitor_db.assert_called_once()
+
+    def test_ongoing_failures_do_not_touch_db(self, monitor_db):
+        for _ in range(CONSECUTIVE_FAILURES_THRESHOLD):
+            ingest_check_result("payments", True, _ts())
+
+        with patch.object(incident_detector, "save_incident") as mock_save, \
+                patch.object(health_state, "get_active_incident") as mock_get_active, \
+                patch.object(health_state, "get_recent_health_checks") as mock_recent:
+            action, incident, _ = ingest_check_result("payments", True, _ts())
+
+        assert action == "incident_ongoing"
+        assert incident is not None
+        mock_save.assert_not_called()
+        mock_get_active.assert_not_called()
+        mock_recent.assert_not_called()
+
+    def test_resolved_after_recovery_threshold(self, monitor_db):
+        for _ in range(CONSECUTIVE_FAILURES_THRESHOLD):
+            ingest_check_result("search", True, _ts())
+
+        actions = [ingest_check_result("search", False, _ts())[0] for _ in range(RECOVERY_CHECK_THRESHOLD)]
+
+        assert actions[-1] == "incident_resolved"
+        assert all(a == "incident_ongoing" for a in actions[:-1])
+        assert get_active_incident("search") is None
+
+    def test_up_resets_failure_streak(self, monitor_db):
+        for _ in range(CONSECUTIVE_FAILURES_THRESHOLD - 1):
+            ingest_check_result("reserves", True, _ts())
+        ingest_check_result("reserves", False, _ts())
+        action, _, _ = ingest_check_result("reserves", True, _ts())
+
+        assert action == "healthy"
+        assert get_active_incident("reserves") is None
+
+    def test_state_bootstrapped_from_db(self, monitor_db):
+        """Al primer check del proceso la racha se reconstruye desde SQLite"""
+        for i in range(CONSECUTIVE_FAILURES_THRESHOLD - 1):
+            save_health_check(HealthCheck.down("api-gateway", f"ping-{i}"))
+
+        action, incident, _ = ingest_check_result("api-gateway", True, _ts())
+
+        assert action == "incident_created"
+        assert incident.consecutive_failures == CONSECUTIVE_FAILURES_THRESHOLD
+
+
+class TestEvaluateServiceHealth:
+    """La re-evaluación a demanda lee el estado en memoria"""
+
+    def test_evaluate_uses_state_without_db_reads(self, monitor_db):
+        for _ in range(CONSECUTIVE_FAILURES_THRESHOLD - 1):
+            ingest_check_result("search", True, _ts())
+
+        with patch.object(health_state, "get_recent_health_checks") as mock_recent:
+            action, _, _ = incident_detector.evaluate_service_health("search")
+
+        assert action == "healthy"
+        mock_recent.assert_not_called()
+
+    def test_evaluate_refreshes_state_not_fed_locally(self, monitor_db):
+        """Un proceso que no recibe checks (API Flask) ve lo que escribieron otros"""
+        assert incident_detector.evaluate_service_health("payments")[0] == "healthy"
+        for i in range(CONSECUTIVE_FAILURES_THRESHOLD):
+            save_health_check(HealthCheck.down("payments", f"ping-{i}"))
+
+        with patch.object(health_state.time, "monotonic", return_value=1e12):
+            action, incident, _ = incident_detector.evaluate_service_health("payments")
+
+        assert action == "incident_created"
+        assert incident.consecutive_failures == CONSECUTIVE_FAILURES_THRESHOLD
+
+
+class TestIngestEchoResults:
+    """Los echos alimentan sólo los servicios que traen"""
+
+    def test_only_services_in_echo_are_evaluated(self, monitor_db):
+        results = [
+            {"service": "payments", "status": "DOWN", "is_failure": True},
+            {"service": "worker", "status": "UP", "is_failure": False},
+        ]
+
+        summary = ingest_echo_results(results, _ts(), skip_services={"worker"})
+
+        assert set(summary) == {"payments"}
+        assert summary["payments"]["action"] == "healthy"
+
+    def test_status_used_when_is_failure_missing(self, monitor_db):
+        results = [{"service": "redis", "status": "TIMEOUT"}]
+        for _ in range(CONSECUTIVE_FAILURES_THRESHOLD):
+            summary = ingest_echo_results(results, _ts())
+
+        assert summary["redis"]["action"] == "incident_created"
+        assert summary["redis"]["has_active_incident"] is True
+
+
+class TestMonitorProcessEcho:
+    """El consumidor de echos evalúa una sola vez y con los datos del payload"""
+
+    def test_process_echo_ingests_payload(self, monitor_db):
+        from app.monitor.monitor_service import MonitorService
+
+        monitor = MonitorService()
+        payload = {
+            "request_id": "ping-echo-001",
+            "ts": _ts(),
+            "results": [
+                {"service": "redis", "status": "DOWN", "is_failure": True},
+                {"service": "payments", "status": "UP", "is_failure": False},
+            ],
+        }
+
+        with patch.object(health_state, "get_recent_health_checks", wraps=db.get_recent_health_checks) as mock_count:
+            for _ in range(CONSECUTIVE_FAILURES_THRESHOLD):
+                summary = monitor.process_echo(**payload)
+
+        assert monitor.echo_count == CONSECUTIVE_FAILURES_THRESHOLD
+        assert summary["redis"]["action"] == "incident_created"
+        # Los servicios HTTP se prueban en forma directa: su resultado vía echo se ignora
+        assert "payments" not in summary
+        # El estado se reconstruyó al crear el monitor: los echos no releen SQLite
+        assert mock_count.call_count == 0
@@ -0,0 +1,141 @@
+"""Tests para la analítica de latencia columnar (NumPy)"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models.monitoring import HealthCheck
+from app.monitor import api
+from app.monitor.latency_analytics import (
+    HealthCheckColumns,
+    get_latency_analytics,
+    get_service_latency_report,
+    load_health_check_columns,
+)
+from app.monitor.metrics import get_service_metrics
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+def _check(service: str, status: str, latency_ms, at: datetime) -> HealthCheck:
+    return HealthCheck(
+        id=0,
+        service=service,
+        request_id="ping-lat",
+        status=status,
+        latency_ms=latency_ms,
+        http_code=200 if status == "UP" else None,
+        timestamp=at.isoformat() + "Z",
+        is_timeout=status == "TIMEOUT",
+    )
+
+
+def _seed(now: datetime):
+    checks = [_check("search", "UP", float(ms), now - timedelta(minutes=1)) for ms in range(1, 101)]
+    checks += [
+        _check("search", "DOWN", None, now - timedelta(minutes=2)),
+        _check("search", "TIMEOUT", 5000.0, now - timedelta(minutes=12)),
+        _check("payments", "UP", 20.0, now - timedelta(minutes=1)),
+        # Fuera de la ventana de 1h
+        _check("search", "UP", 9999.0, now - timedelta(hours=3)),
+    ]
+    db.save_health_checks(checks)
+
+
+class TestHealthCheckColumns:
+    """Resumen, histograma y agrupamientos sobre arrays"""
+
+    def test_summary_and_histogram(self):
+        columns = HealthCheckColumns(
+            service=np.array(["a", "a", "a", "a"]),
+            ts=np.array([0.0, 1.0, 2.0, 3.0]),
+            latency_ms=np.array([5.0, 10.0, 40.0, np.nan]),
+            failure=np.array([False, False, False, True]),
+        )
+
+        summary = columns.summary()
+        assert summary["count"] == 4
+        assert summary["failures"] == 1
+        assert summary["failure_rate"] == 0.25
+        assert summary["p50_ms"] == 10.0
+        assert summary["max_latency_ms"] == 40.0
+
+        histogram = columns.histogram()
+        assert histogram["5"] == 1
+        assert histogram["10"] == 1
+        assert histogram["50"] == 1
+        assert sum(histogram.values()) == 3
+
+    def test_empty(self):
+        summary = HealthCheckColumns.empty().summary()
+        assert summary["count"] == 0
+        assert summary["failure_rate"] is None
+        assert summary["p99_ms"] is None
+
+    def test_group_by_time_bucket(self):
+        columns = HealthCheckColumns(
+            service=np.array(["a"] * 4),
+            ts=np.array([100.0, 110.0, 170.0, 400.0]),
+            latency_ms=np.array([1.0, 2.0, 3.0, 4.0]),
+            failure=np.zeros(4, dtype=bool),
+        )
+        buckets = columns.by_time_bucket(60, start=100.0)
+        assert {k: len(v) for k, v in buckets.items()} == {100.0: 2, 160.0: 1, 400.0: 1}
+
+
+class TestLatencyAnalyticsDB:
+    """Lectura por lotes desde SQLite"""
+
+    def test_load_in_batches(self, monitor_db):
+        now = datetime.utcnow()
+        _seed(now)
+
+        columns = load_health_check_columns(now - timedelta(hours=1), ["search"], batch_size=7)
+
+        assert len(columns) == 102
+        assert int(columns.failure.sum()) == 2
+        assert np.isnan(columns.latency_ms).sum() == 1
+        assert columns.ts.max() == pytest.approx((now - timedelta(minutes=1) - datetime(1970, 1, 1)).total_seconds(), abs=1e-3)
+
+    def test_per_service_analytics(self, monitor_db):
+        _seed(datetime.utcnow())
+
+        analytics = get_latency_analytics(1, ["search", "payments", "reserves"])
+
+        assert analytics["search"]["count"] == 102
+        assert analytics["search"]["p99_ms"] > analytics["search"]["p50_ms"]
+        assert analytics["payments"]["p50_ms"] == 20.0
+        assert analytics["reserves"]["count"] == 0
+
+    def test_service_report_buckets(self, monitor_db):
+        _seed(datetime.utcnow())
+
+        report = get_service_latency_report("search", window_hours=1, bucket_minutes=10)
+
+        assert report["summary"]["count"] == 102
+        assert sum(b["count"] for b in report["buckets"]) == 102
+        assert len(report["buckets"]) == 2
+
+    def test_metrics_use_window(self, monitor_db):
+        _seed(datetime.utcnow())
+
+        metrics = get_service_metrics("search", window_hours=1).to_dict()
+
+        assert metrics["health_checks"]["total"] == 102
+        assert metrics["health_checks"]["latency"]["p95_ms"] is not None
+
+    def test_latency_endpoint(self, monitor_db):
+        _seed(datetime.utcnow())
+        api.metrics_cache.clear()
+        client = api.app.test_client()
+
+        response = client.get("/metrics/search/latency?window_hours=1&bucket_minutes=30")
+        assert response.status_code == 200
+        assert response.get_json()["summary"]["count"] == 102
+        assert client.get("/metrics/unknown/latency").status_code == 404
@@ -0,0 +1,245 @@
+"""Tests para la detección de latencia anómala y los incidentes de degradación"""
+
+import sqlite3
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.constants.queues import (
+    CONSECUTIVE_FAILURES_THRESHOLD,
+    DEGRADATION_CHECK_THRESHOLD,
+    MONITORED_SERVICES,
+    RECOVERY_CHECK_THRESHOLD,
+)
+from app.models.monitoring import INCIDENT_DEGRADATION, INCIDENT_OUTAGE, HealthCheck
+from app.monitor import incident_detector, monitor_service
+from app.monitor.cluster import InMemoryLeaseStore, MonitorCluster
+from app.monitor.incident_detector import ingest_check_result, reset_detector_state
+from app.monitor.latency_anomaly import LatencyAnomalyDetector
+from app.monitor.metrics import get_all_services_metrics
+from app.monitor.monitor_service import MonitorService
+from app.monitor.probe_engine import ProbeEngine
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+    reset_detector_state()
+    with patch.object(incident_detector, "submit_recovery", return_value={"submitted": True}) as mock_recover:
+        yield mock_recover
+    reset_detector_state()
+
+
+def _ts() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+def _trained(samples=(5.0, 6.0, 4.0, 5.5, 4.5) * 4) -> LatencyAnomalyDetector:
+    detector = LatencyAnomalyDetector(warmup=20)
+    for latency in samples:
+        assert detector.observe("search", latency) is False
+    return detector
+
+
+def _ingest(service: str, status: str, n: int) -> list:
+    return [
+        ingest_check_result(service, status in ("DOWN", "TIMEOUT"), _ts(), status=status)[0]
+        for _ in range(n)
+    ]
+
+
+class TestLatencyAnomalyDetector:
+    """Línea base EWMA por servicio, O(1) por check"""
+
+    def test_slowdown_is_anomalous(self):
+        detector = _trained()
+
+        assert detector.observe("search", 4900.0) is True
+        assert detector.observe("search", 6.0) is False
+
+    def test_warmup(self):
+        detector = LatencyAnomalyDetector(warmup=20)
+        for _ in range(10):
+            detector.observe("search", 5.0)
+
+        assert detector.observe("search", 4900.0) is False
+
+    def test_small_absolute_jumps_are_not_anomalous(self):
+        detector = _trained()
+
+        # 12x la media pero por debajo del piso absoluto
+        assert detector.observe("search", 60.0) is False
+
+    def test_anomalies_do_not_shift_baseline(self):
+        detector = _trained()
+        mean = detector.baseline("search")["mean_ms"]
+
+        for _ in range(detector.rebaseline_after - 1):
+            assert detector.observe("search", 2000.0) is True
+
+        assert detector.baseline("search")["mean_ms"] == mean
+        assert detector.baseline("search")["anomalies"] == detector.rebaseline_after - 1
+
+    def test_sustained_step_is_slowly_rebaselined(self):
+        detector = _trained()
+
+        flagged = 0
+        while detector.observe("search", 2000.0):
+            flagged += 1
+            assert flagged < 200
+
+        # Sigue DEGRADED un buen rato antes de aceptar el nuevo nivel
+        assert flagged > detector.rebaseline_after
+        assert detector.baseline("search")["anomaly_streak"] == 0
+        assert detector.observe("search", 2000.0) is False
+
+    def test_normal_sample_resets_anomaly_streak(self):
+        detector = _trained()
+        mean = detector.baseline("search")["mean_ms"]
+
+        for _ in range(3):
+            for _ in range(detector.rebaseline_after - 1):
+                detector.observe("search", 2000.0)
+            assert detector.observe("search", 5.0) is False
+
+        assert detector.baseline("search")["mean_ms"] == pytest.approx(mean, abs=1)
+
+    def test_seed_restores_baseline(self):
+        detector = LatencyAnomalyDetector(warmup=20)
+
+        detector.seed("search", [5.0, 6.0, 4.0, 5.5, 4.5] * 4)
+        detector.seed("search", [1000.0] * 20)  # Ya hay línea base: no se pisa
+
+        assert detector.baseline("search")["samples"] == 20
+        assert detector.observe("search", 4900.0) is True
+
+    def test_noisy_service_tolerates_its_own_jitter(self):
+        detector = _trained((100.0, 300.0) * 10)
+
+        assert detector.observe("search", 450.0) is False
+
+    def test_probe_engine_marks_degraded_before_persisting(self):
+        detector = _trained()
+        engine = ProbeEngine({"search": "http://search/health"}, persist=False, anomaly_detector=detector)
+
+        async def slow_probe(service, request_id):
+            return HealthCheck.up(service, request_id, 4900.0)
+
+        engine.probe = slow_probe
+        try:
+            [check] = engine.probe_round("ping-1")
+        finally:
+            engine.close()
+
+        assert check.status == "DEGRADED"
+        assert check.is_degraded() and not check.is_failure()
+
+
+class TestDegradationIncidents:
+    """Racha de checks DEGRADED -> incidente DEGRADATION con su propio MTTD"""
+
+    def test_degradation_incident_lifecycle(self, monitor_db):
+        actions = _ingest("search", "UP", 2) + _ingest("search", "DEGRADED", DEGRADATION_CHECK_THRESHOLD)
+
+        assert actions[-1] == "degradation_created"
+        degradation = db.get_active_incident("search", INCIDENT_DEGRADATION)
+        assert degradation.incident_type == INCIDENT_DEGRADATION
+        assert degradation.mttd_seconds is not None
+        assert db.get_active_incident("search") is None
+        monitor_db.assert_not_called()
+
+        actions = _ingest("search", "UP", RECOVERY_CHECK_THRESHOLD)
+
+        assert actions[-1] == "degradation_resolved"
+        assert db.get_active_incident("search", INCIDENT_DEGRADATION) is None
+        # Las degradaciones no cuentan como caídas en los acumuladores
+        assert db.get_incident_aggregate("search").total_incidents == 0
+
+    def test_outage_escalates_degradation(self, monitor_db):
+        _ingest("search", "DEGRADED", DEGRADATION_CHECK_THRESHOLD)
+
+        actions = _ingest("search", "TIMEOUT", CONSECUTIVE_FAILURES_THRESHOLD)
+
+        assert actions[-1] == "incident_created"
+        assert db.get_active_incident("search", INCIDENT_DEGRADATION) is None
+        incidents = db.get_incidents_by_service("search")
+        assert [(i.incident_type, i.resolution_action) for i in incidents] == [
+            (INCIDENT_OUTAGE, None),
+            (INCIDENT_DEGRADATION, "escalated"),
+        ]
+
+    def test_degradation_metrics(self, monitor_db):
+        _ingest("search", "DEGRADED", DEGRADATION_CHECK_THRESHOLD)
+        _ingest("search", "UP", RECOVERY_CHECK_THRESHOLD)
+
+        metrics = get_all_services_metrics()
+
+        assert metrics["search"]["degradation"]["total"] == 1
+        assert metrics["search"]["degradation"]["resolved"] == 1
+        assert metrics["search"]["incidents"]["total"] == 0
+        assert metrics["search"]["availability"]["total_downtime_seconds"] == 0
+        assert metrics["_global"]["degradation"]["total"] == 1
+
+    def test_existing_incidents_migrate_as_outages(self, tmp_path, monkeypatch):
+        path = tmp_path / "old.db"
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                "CREATE TABLE incidents (id INTEGER PRIMARY KEY AUTOINCREMENT, service TEXT NOT NULL, "
+                "started_at TEXT NOT NULL, detected_at TEXT, resolved_at TEXT, severity TEXT NOT NULL DEFAULT 'CRITICAL', "
+                "consecutive_failures INTEGER NOT NULL, resolution_action TEXT, mttd_seconds REAL, mttr_seconds REAL)"
+            )
+            conn.execute(
+                "INSERT INTO incidents(service, started_at, consecutive_failures) VALUES ('search', ?, 3)", (_ts(),)
+            )
+        monkeypatch.setattr(db, "DB_PATH", str(path))
+
+        db.init_db()
+
+        assert db.get_active_incident("search").incident_type == INCIDENT_OUTAGE
+
+
+class TestDegradedWorker:
+    """Un worker lento (DEGRADED) no es un worker caído"""
+
+    @pytest.fixture
+    def monitor(self, monitor_db):
+        cluster = MonitorCluster("solo", store=InMemoryLeaseStore())
+        cluster.heartbeat()
+        return MonitorService(
+            probe_engine=MagicMock(targets=dict(MONITORED_SERVICES), anomaly_detector=_trained()),
+            cluster=cluster,
+        )
+
+    @pytest.mark.parametrize("status, sent", [("UP", True), ("DEGRADED", True), ("DOWN", False), ("TIMEOUT", False)])
+    def test_celery_ping_skipped_only_on_failure(self, monitor, status, sent):
+        monitor.last_worker_status = status
+
+        with patch.object(monitor_service.monitor_celery, "send_task") as send:
+            request_id = monitor.send_celery_ping("ping-1")
+
+        assert (request_id is not None) is sent
+        assert send.called is sent
+
+    def test_degraded_result_is_not_logged_as_failure(self, monitor, caplog):
+        with caplog.at_level("INFO", logger="monitor"):
+            monitor._log_ping_result({"service": "worker", "status": "DEGRADED", "latency_ms": 900.0})
+
+        assert "❌" not in caplog.text
+        assert "DEGRADED" in caplog.text
+
+    def test_baselines_seeded_from_recent_checks(self, monitor_db):
+        db.save_health_checks(
+            [HealthCheck.up("search", f"ping-{i}", 5.0) for i in range(20)]
+            + [HealthCheck.down("search", "ping-down")]
+        )
+        detector = LatencyAnomalyDetector(warmup=20)
+        cluster = MonitorCluster("solo", store=InMemoryLeaseStore())
+        cluster.heartbeat()
+
+        MonitorService(probe_engine=MagicMock(targets=dict(MONITORED_SERVICES), anomaly_detector=detector), cluster=cluster)
+
+        assert detector.baseline("search")["samples"] == 20
+        assert detector.observe("search", 4900.0) is True
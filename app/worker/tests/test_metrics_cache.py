@@ -0,0 +1,121 @@
+"""Tests para la cache de respuestas de métricas del monitor (versión de datos + ETag)"""
+
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from app.models.monitoring import HealthCheck, Incident
+from app.monitor import api
+from app.worker import db
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+    api.metrics_cache.clear()
+    return api.app.test_client()
+
+
+def _incident() -> Incident:
+    now = datetime.utcnow().isoformat() + "Z"
+    incident = Incident(
+        id=0, service="search", started_at=now, detected_at=now, resolved_at=None, severity="WARNING",
+        consecutive_failures=3, resolution_action=None, mttd_seconds=0.0, mttr_seconds=None,
+    )
+    incident.id = db.save_incident(incident)
+    return incident
+
+
+class TestDataVersion:
+    """Los triggers mueven la versión con cada escritura de incidentes, no de health checks"""
+
+    def test_incident_writes_bump_version(self, client):
+        version = db.get_data_version()
+
+        db.save_health_checks([HealthCheck.up("search", f"ping-{i}", 10.0) for i in range(3)])
+        assert db.get_data_version() == version
+
+        incident = _incident()
+        after_insert = db.get_data_version()
+        assert after_insert > version
+
+        db.attach_recovery_result(incident.id + 1, "QUEUED")  # UPDATE sin filas afectadas no cuenta
+        assert db.get_data_version() == after_insert
+
+        db.attach_recovery_result(incident.id, "QUEUED")
+        assert db.get_data_version() > after_insert
+
+    def test_old_health_check_triggers_are_dropped(self, client):
+        with closing(sqlite3.connect(db.DB_PATH)) as conn:
+            conn.execute(
+                "CREATE TRIGGER trg_health_checks_insert_version AFTER INSERT ON health_checks "
+                "BEGIN UPDATE data_versions SET version = version + 1; END"
+            )
+            conn.commit()
+
+        db.init_db()
+
+        with closing(sqlite3.connect(db.DB_PATH)) as conn:
+            triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        assert not any(name.startswith("trg_health_checks") for name in triggers)
+
+
+class TestCachedMetrics:
+    """Respuestas cacheadas por endpoint + query y 304 con If-None-Match"""
+
+    def test_cache_hit_until_data_changes(self, client):
+        with patch.object(api, "get_all_services_metrics", return_value={"ok": 1}) as mock_metrics:
+            first = client.get("/metrics?window_hours=1")
+            second = client.get("/metrics?window_hours=1")
+            assert mock_metrics.call_count == 1
+            assert first.get_json() == second.get_json() == {"ok": 1}
+            assert first.headers["ETag"] == second.headers["ETag"]
+
+            # Otra ventana es otra entrada
+            client.get("/metrics?window_hours=2")
+            assert mock_metrics.call_count == 2
+
+            # Un health check no invalida la cache; un incidente sí
+            db.save_health_check(HealthCheck.down("search", "ping-v2"))
+            client.get("/metrics?window_hours=1")
+            assert mock_metrics.call_count == 2
+
+            _incident()
+            client.get("/metrics?window_hours=1")
+            assert mock_metrics.call_count == 3
+
+    def test_new_time_bucket_recomputes(self, client):
+        now = 1_000_000 * api.metrics_cache.ttl_seconds
+        with patch.object(api, "get_experiment_summary", return_value={}) as mock_summary, \
+                patch.object(api.time, "time", return_value=now):
+            client.get("/metrics/experiment")
+            client.get("/metrics/experiment")
+            assert mock_summary.call_count == 1
+
+            api.time.time.return_value = now + api.metrics_cache.ttl_seconds
+            client.get("/metrics/experiment")
+            assert mock_summary.call_count == 2
+
+    def test_if_none_match_returns_304(self, client):
+        with patch.object(api, "get_experiment_summary", return_value={"summary": True}):
+            etag = client.get("/metrics/experiment").headers["ETag"]
+            response = client.get("/metrics/experiment", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.data == b""
+
+    def test_ttl_expires_entry(self, client, monkeypatch):
+        monkeypatch.setattr(api.metrics_cache, "ttl_seconds", 0)
+        with patch.object(api, "get_experiment_summary", return_value={}) as mock_summary:
+            client.get("/metrics/experiment")
+            client.get("/metrics/experiment")
+        assert mock_summary.call_count == 2
+
+    def test_errors_are_not_cached(self, client):
+        response = client.get("/metrics/unknown-service")
+        assert response.status_code == 404
+        assert "ETag" not in response.headers
@@ -0,0 +1,100 @@
+"""Tests para las métricas agregadas en SQL por ventana de tiempo"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.monitoring import HealthCheck, Incident
+from app.monitor.metrics import get_all_services_metrics, get_service_metrics
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat() + "Z"
+
+
+def _check(service: str, status: str, latency_ms, at: datetime) -> HealthCheck:
+    return HealthCheck(
+        id=0, service=service, request_id="ping-win", status=status, latency_ms=latency_ms,
+        http_code=None, timestamp=_iso(at), is_timeout=False,
+    )
+
+
+def _incident(service: str, started: datetime, resolved: datetime = None) -> Incident:
+    incident = Incident(
+        id=0, service=service, started_at=_iso(started), detected_at=_iso(started + timedelta(seconds=2)),
+        resolved_at=None, severity="WARNING", consecutive_failures=3, resolution_action=None,
+        mttd_seconds=2.0, mttr_seconds=None,
+    )
+    incident.id = db.save_incident(incident)
+    if resolved is not None:
+        incident.resolved_at = _iso(resolved)
+        incident.mttr_seconds = (resolved - started).total_seconds() - 2.0
+        db.update_incident(incident)
+    return incident
+
+
+class TestHealthCheckWindow:
+    """Conteos exactos para cualquier tamaño de ventana"""
+
+    def test_counts_are_exact_beyond_old_cap(self, monitor_db):
+        now = datetime.utcnow()
+        checks = [_check("search", "UP", 20.0, now - timedelta(minutes=5)) for _ in range(600)]
+        checks += [_check("search", "TIMEOUT", 5000.0, now - timedelta(minutes=5)) for _ in range(10)]
+        checks += [_check("search", "DOWN", None, now - timedelta(minutes=5))]
+        checks += [_check("search", "UP", 20.0, now - timedelta(hours=5)) for _ in range(50)]
+        db.save_health_checks(checks)
+
+        health = get_service_metrics("search", window_hours=1).to_dict()["health_checks"]
+
+        assert health["total"] == 611
+        assert health["failed"] == 11
+        assert health["avg_latency_ms"] == round((600 * 20.0 + 10 * 5000.0) / 610, 2)
+        assert health["latency"]["p50_ms"] == 25.0  # límite superior del bucket
+        assert health["latency"]["p99_ms"] == 5000.0
+        assert health["latency"]["max_ms"] == 5000.0
+
+        assert get_service_metrics("search", window_hours=24).to_dict()["health_checks"]["total"] == 661
+
+
+class TestIncidentWindow:
+    """Incidentes y downtime recortados a la ventana"""
+
+    def test_window_stats(self, monitor_db):
+        now = datetime.utcnow()
+        # Resuelto hace 3h: fuera de la ventana de 1h
+        _incident("search", now - timedelta(hours=4), now - timedelta(hours=3))
+        # Resuelto dentro de la ventana: 60s de downtime
+        _incident("search", now - timedelta(minutes=30), now - timedelta(minutes=29))
+        # Empezó hace 2h y sigue activo: aporta toda la ventana
+        _incident("payments", now - timedelta(hours=2))
+
+        metrics = get_all_services_metrics(window_hours=1)
+
+        search = metrics["search"]
+        assert search["incidents"] == {"total": 1, "active": 0, "resolved": 1}
+        assert search["availability"]["total_downtime_seconds"] == pytest.approx(60.0, abs=0.5)
+        assert search["mttr"]["avg_seconds"] == pytest.approx(58.0)
+        assert search["lifetime"]["total_incidents"] == 2
+
+        payments = metrics["payments"]
+        assert payments["incidents"]["active"] == 1
+        assert payments["availability"]["percent"] == pytest.approx(0.0, abs=0.01)
+
+        assert metrics["_global"]["total_incidents"] == 1
+        assert metrics["_global"]["active_incidents"] == 1
+        assert metrics["_global"]["lifetime"]["total_incidents"] == 3
+
+    def test_empty_window(self, monitor_db):
+        metrics = get_service_metrics("reserves", window_hours=1).to_dict()
+
+        assert metrics["incidents"]["total"] == 0
+        assert metrics["availability"]["percent"] == 100.0
+        assert metrics["health_checks"]["total"] == 0
+        assert metrics["health_checks"]["latency"]["p50_ms"] is None
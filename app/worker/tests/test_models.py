@@ -1,6 +1,6 @@
 """Tests para modelos de negocio"""
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytest
 
@@ -100,6 +100,15 @@ class TestOperationModel:
         assert op2.status == "PROCESSING"
         assert op1.updated_at == op2.created_at
 
+    def test_deadline_and_expiry(self):
+        """El deadline end-to-end se cuenta desde created_at"""
+        op = Operation.pending("op-001", "pay", {"amount": 100})
+        created = datetime.fromisoformat(op.created_at.rstrip("Z"))
+
+        assert op.deadline(30) == created + timedelta(seconds=30)
+        assert op.is_expired(30) is False
+        assert op.is_expired(30, now=created + timedelta(seconds=31)) is True
+
 
 class TestPingEchoLogModel:
     """Tests para modelo PingEchoLog"""
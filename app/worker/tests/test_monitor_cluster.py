@@ -0,0 +1,198 @@
+"""Tests para el sharding y la elección de líder entre instancias del monitor"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.constants.queues import ECHO_QUEUE, MONITORED_SERVICES
+from app.models.monitoring import HealthCheck
+from app.monitor import incident_detector, monitor_service
+from app.monitor.cluster import ConsistentHashRing, InMemoryLeaseStore, MonitorCluster
+from app.monitor.monitor_service import RECOVERY_SWEEP_JOB, MonitorService
+from app.monitor.recovery_executor import RECOVERY_DEFERRED
+from app.worker import db
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(clock):
+    return InMemoryLeaseStore(clock=clock)
+
+
+def _cluster(node_id, store, clock) -> MonitorCluster:
+    cluster = MonitorCluster(node_id, store=store, lease_ttl=5, heartbeat_interval=1, clock=clock)
+    cluster.heartbeat()
+    return cluster
+
+
+SERVICES = [f"svc-{i}" for i in range(300)]
+
+
+class TestConsistentHashRing:
+    """Reparto parejo y movimiento mínimo al cambiar la membresía"""
+
+    def test_balanced_assignment(self):
+        ring = ConsistentHashRing(["a", "b", "c"])
+
+        sizes = [len(keys) for keys in ring.assignments(SERVICES).values()]
+
+        assert sum(sizes) == len(SERVICES)
+        assert min(sizes) > len(SERVICES) / 3 * 0.5
+
+    def test_adding_a_node_moves_only_its_share(self):
+        before = ConsistentHashRing(["a", "b", "c"])
+        after = ConsistentHashRing(["a", "b", "c", "d"])
+
+        moved = [s for s in SERVICES if before.node_for(s) != after.node_for(s)]
+
+        assert all(after.node_for(s) == "d" for s in moved)
+        assert len(moved) < len(SERVICES) / 2
+
+    def test_empty_ring(self):
+        assert ConsistentHashRing([]).node_for("search") is None
+
+
+class TestMonitorCluster:
+    """Membresía, rebalanceo y lease de liderazgo"""
+
+    def test_single_leader_and_disjoint_shards(self, store, clock):
+        a = _cluster("a", store, clock)
+        b = _cluster("b", store, clock)
+        a.heartbeat()
+
+        assert [a.is_leader(), b.is_leader()] == [True, False]
+        owned_a, owned_b = set(a.owned(SERVICES)), set(b.owned(SERVICES))
+        assert owned_a and owned_b
+        assert owned_a | owned_b == set(SERVICES)
+        assert not owned_a & owned_b
+
+    def test_failover_after_lease_expires(self, store, clock):
+        a = _cluster("a", store, clock)
+        b = _cluster("b", store, clock)
+        a.heartbeat()
+        rebalanced = []
+        b.on_rebalance(lambda joined, left: rebalanced.append((joined, left)))
+
+        # "a" deja de mandar heartbeats
+        clock.now += 4.5
+        assert not a.is_leader()  # margen: deja de actuar antes de que venza el lease
+        clock.now += 1
+        b.heartbeat()
+
+        assert b.is_leader()
+        assert b.members == ["b"]
+        assert rebalanced == [([], ["a"])]
+        assert b.owned(SERVICES) == SERVICES
+
+    def test_stop_releases_leadership(self, store, clock):
+        a = _cluster("a", store, clock)
+        b = _cluster("b", store, clock)
+
+        a.stop()
+        b.heartbeat()
+
+        assert b.is_leader()
+        assert b.members == ["b"]
+
+    def test_store_errors_drop_leadership(self, clock):
+        store = MagicMock()
+        store.members.return_value = ["a"]
+        store.acquire.return_value = True
+        cluster = _cluster("a", store, clock)
+        assert cluster.is_leader()
+
+        store.heartbeat.side_effect = ConnectionError("redis down")
+        clock.now += 10
+        cluster.heartbeat()
+
+        assert not cluster.is_leader()
+        assert cluster.last_error == "redis down"
+
+
+class TestMonitorSharding:
+    """Cada instancia prueba sólo sus servicios; sólo el líder ejecuta recovery"""
+
+    def test_probes_only_owned_services(self, monitor_db, store, clock):
+        a = _cluster("a", store, clock)
+        b = _cluster("b", store, clock)
+        a.heartbeat()
+        engine = MagicMock(targets=dict(MONITORED_SERVICES))
+        engine.probe_round.side_effect = lambda request_id, services: [
+            HealthCheck.up(service, request_id, 1.0) for service in services
+        ]
+
+        probed = {}
+        for cluster in (a, b):
+            monitor = MonitorService(probe_engine=engine, cluster=cluster)
+            probed[cluster.node_id] = {c.service for c in monitor.probe_direct_services(force=True)}
+
+        assert probed["a"] | probed["b"] == set(MONITORED_SERVICES)
+        assert not probed["a"] & probed["b"]
+
+    def test_non_leader_defers_recovery_to_leader(self, monitor_db, store, clock, monkeypatch):
+        leader = _cluster("a", store, clock)
+        follower = _cluster("b", store, clock)
+
+        monkeypatch.setattr(incident_detector, "get_cluster", lambda: follower)
+        with patch.object(incident_detector, "submit_recovery") as submit:
+            incident, result = incident_detector._open_incident("search", 3, HealthCheck.down("search", "p").timestamp, True)
+            submit.assert_not_called()
+        assert result is None
+        assert db.get_active_incidents()[0].recovery_status == RECOVERY_DEFERRED
+
+        monkeypatch.setattr(incident_detector, "get_cluster", lambda: leader)
+        with patch.object(incident_detector, "submit_recovery", return_value={"submitted": True}) as submit:
+            tickets = incident_detector.recover_deferred_incidents()
+        submit.assert_called_once_with("search", incident_id=incident.id)
+        assert tickets == [{"submitted": True}]
+
+    def test_echo_ingested_only_by_owner(self, monitor_db, store, clock):
+        a = _cluster("a", store, clock)
+        b = _cluster("b", store, clock)
+        a.heartbeat()
+        owner, other = (a, b) if a.owns("redis") else (b, a)
+        engine = MagicMock(targets=dict(MONITORED_SERVICES))
+        echo = {
+            "request_id": "ping-1",
+            "ts": HealthCheck.up("redis", "p", 1.0).timestamp,
+            "results": [{"service": "redis", "status": "DOWN", "is_failure": True}],
+        }
+
+        assert MonitorService(probe_engine=engine, cluster=other).process_echo(**echo) == {}
+        assert "redis" in MonitorService(probe_engine=engine, cluster=owner).process_echo(**echo)
+
+    def test_multi_instance_pings_use_own_reply_queue(self, monitor_db, store, clock, monkeypatch):
+        monkeypatch.setattr(monitor_service, "MONITOR_CLUSTER_BACKEND", "redis")
+        monitor = MonitorService(probe_engine=MagicMock(targets=dict(MONITORED_SERVICES)), cluster=_cluster("a", store, clock))
+        monitor.last_worker_status = "UP"
+
+        with patch.object(monitor_service.monitor_celery, "send_task") as send:
+            monitor.send_celery_ping("ping-1")
+
+        assert send.call_args.kwargs["kwargs"]["reply_queue"] == f"{ECHO_QUEUE}.a"
+
+    @pytest.mark.parametrize("backend, swept", [("memory", False), ("redis", True)])
+    def test_deferred_recovery_sweep_only_with_redis_backend(self, monitor_db, store, clock, monkeypatch, backend, swept):
+        monkeypatch.setattr(monitor_service, "MONITOR_CLUSTER_BACKEND", backend)
+
+        monitor = MonitorService(probe_engine=MagicMock(targets=dict(MONITORED_SERVICES)), cluster=_cluster("a", store, clock))
+
+        assert (RECOVERY_SWEEP_JOB in monitor.scheduler._jobs) is swept
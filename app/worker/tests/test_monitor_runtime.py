@@ -0,0 +1,98 @@
+"""Tests para el runtime de un solo proceso: API, consumidor y loop comparten el monitor"""
+
+import sqlite3
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.constants.queues import MONITORED_SERVICES
+from app.models.monitoring import HealthCheck
+from app.monitor import api, monitor_service
+from app.monitor.cluster import InMemoryLeaseStore, MonitorCluster
+from app.monitor.incident_detector import reset_detector_state
+from app.monitor.monitor_service import MonitorService, get_monitor, set_monitor
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+    reset_detector_state()
+    monkeypatch.setattr(monitor_service, "_monitor_instance", None)
+    yield
+    reset_detector_state()
+
+
+@pytest.fixture
+def monitor(monitor_db):
+    engine = MagicMock(targets=dict(MONITORED_SERVICES))
+    engine.probe_round.side_effect = lambda request_id, services: [
+        HealthCheck.up(service, request_id, 5.0) for service in services
+    ]
+    engine.pool_stats.return_value = {}
+    engine.anomaly_detector.snapshot.return_value = {}
+    cluster = MonitorCluster("solo", store=InMemoryLeaseStore())
+    cluster.heartbeat()
+    monitor = MonitorService(probe_engine=engine, cluster=cluster)
+    set_monitor(monitor)
+    return monitor
+
+
+def _echo(monitor: MonitorService, n: int) -> None:
+    for i in range(n):
+        monitor.process_echo(
+            request_id=f"ping-{threading.get_ident()}-{i}",
+            ts=HealthCheck.up("redis", "p", 1.0).timestamp,
+            results=[{"service": "redis", "status": "UP", "is_failure": False, "latency_ms": 1.0}],
+        )
+
+
+class TestSharedMonitor:
+    """get_monitor() devuelve la instancia registrada por el runtime"""
+
+    def test_registered_instance_is_shared(self, monitor):
+        assert get_monitor() is monitor
+
+    def test_concurrent_echoes_are_counted(self, monitor):
+        threads = [threading.Thread(target=_echo, args=(monitor, 50)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert monitor.echo_count == 200
+
+
+class TestLiveStatus:
+    """/status responde desde memoria cuando el loop corre en el mismo proceso"""
+
+    def test_status_reports_live_counters_without_db(self, monitor, monkeypatch):
+        monitor.running = True
+        monitor.probe_direct_services(force=True)
+        _echo(monitor, 3)
+
+        def no_db(*args, **kwargs):
+            raise AssertionError("/status must not query SQLite")
+
+        monkeypatch.setattr(sqlite3, "connect", no_db)
+        response = api.app.test_client().get("/status")
+
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body["ping_count"] == 1
+        assert body["echo_count"] == 3
+        assert "ping_rtt" not in body
+        assert {s["service"]: s["status"] for s in body["services"]} == {
+            service: "UP" for service in monitor.all_services
+        }
+        assert all(s["source"] == "local" for s in body["services"])
+
+    def test_idle_instance_keeps_rtt_window(self, monitor):
+        with patch.object(monitor_service, "get_ping_rtt_metrics", return_value={"echoed": 0}) as rtt:
+            body = api.app.test_client().get("/status").get_json()
+
+        rtt.assert_called_once()
+        assert body["running"] is False
+        assert body["ping_rtt"] == {"echoed": 0}
@@ -0,0 +1,134 @@
+"""Tests para las consultas set-based de incidentes y health checks"""
+
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app.models.monitoring import HealthCheck, Incident
+from app.monitor import api
+from app.monitor.health_state import HealthStateRegistry
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+def _incident(service: str, resolved: bool = False) -> Incident:
+    now = datetime.utcnow()
+    incident = Incident(
+        id=0, service=service, started_at=(now - timedelta(seconds=10)).isoformat() + "Z",
+        detected_at=now.isoformat() + "Z", resolved_at=None, severity="WARNING",
+        consecutive_failures=3, resolution_action=None, mttd_seconds=10.0, mttr_seconds=None,
+    )
+    incident.id = db.save_incident(incident)
+    if resolved:
+        incident.resolve()
+        db.update_incident(incident)
+    return incident
+
+
+def _checks(service: str, statuses):
+    db.save_health_checks([
+        HealthCheck(id=0, service=service, request_id=f"ping-{i}", status=status, latency_ms=1.0,
+                    http_code=None, timestamp=datetime.utcnow().isoformat() + "Z")
+        for i, status in enumerate(statuses)
+    ])
+
+
+class TestSetBasedQueries:
+    """Una consulta para todos los servicios"""
+
+    def test_active_incidents(self, monitor_db):
+        active = _incident("search")
+        _incident("payments", resolved=True)
+
+        assert [i.id for i in db.get_active_incidents()] == [active.id]
+        assert db.get_active_incidents(["payments"]) == []
+
+        with closing(sqlite3.connect(db.DB_PATH)) as conn:
+            index_sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'idx_incidents_active'"
+            ).fetchone()[0]
+        assert "WHERE resolved_at IS NULL" in index_sql
+
+    def test_recent_checks_for_services(self, monitor_db):
+        _checks("search", ["UP"] * 5)
+        _checks("payments", ["DOWN"])
+
+        checks = db.get_recent_health_checks_for_services(["search", "payments", "reserves"], limit=3)
+
+        assert [c.request_id for c in checks["search"]] == ["ping-4", "ping-3", "ping-2"]
+        assert len(checks["payments"]) == 1
+        assert checks["reserves"] == []
+
+    def test_service_incidents_includes_old_active(self, monitor_db):
+        old_active = _incident("search")
+        for _ in range(3):
+            _incident("search", resolved=True)
+
+        incidents, active = db.get_service_incidents("search", limit=2)
+
+        assert len(incidents) == 2
+        assert old_active.id not in [i.id for i in incidents]
+        assert active.id == old_active.id
+
+    def test_services_under_suspicion(self, monitor_db):
+        _checks("search", ["DOWN", "UP"])
+        _checks("payments", ["UP", "TIMEOUT"])
+        _checks("reserves", ["UP"])
+        _incident("reserves")
+
+        suspects = db.get_services_under_suspicion(["search", "payments", "reserves", "api-gateway"])
+
+        assert suspects == ["payments", "reserves"]
+
+
+class TestConstantQueryCount:
+    """Los consumidores no consultan por servicio"""
+
+    def test_registry_rebuild(self, monitor_db):
+        _checks("search", ["DOWN", "DOWN"])
+        incident = _incident("search")
+        registry = HealthStateRegistry()
+
+        with patch("app.monitor.health_state.get_recent_health_checks") as per_service:
+            registry.rebuild(["search", "payments"])
+        per_service.assert_not_called()
+
+        state = registry.peek("search")
+        assert state.consecutive_failures == 2
+        assert state.active_incident.id == incident.id
+
+    def test_active_incidents_endpoint(self, monitor_db):
+        _incident("search")
+        _incident("payments")
+        client = api.app.test_client()
+
+        response = client.get("/incidents/active")
+
+        assert response.status_code == 200
+        assert response.get_json()["total"] == 2
+        assert {i["service"] for i in response.get_json()["incidents"]} == {"search", "payments"}
+
+    def test_service_incidents_endpoint(self, monitor_db):
+        active = _incident("search")
+        client = api.app.test_client()
+
+        body = client.get("/incidents/search?limit=5").get_json()
+
+        assert body["has_active_incident"] is True
+        assert body["active_incident"]["id"] == active.id
+        assert body["total"] == 1
+
+    def test_service_incidents_rejects_non_positive_limit(self, monitor_db):
+        client = api.app.test_client()
+
+        for limit in (0, -1):
+            response = client.get(f"/incidents/search?limit={limit}")
+            assert response.status_code == 400
@@ -0,0 +1,114 @@
+"""Tests para la paginación por keyset de health checks e incidentes"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.monitoring import HealthCheck, Incident
+from app.monitor import api
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+@pytest.fixture
+def client(monitor_db):
+    return api.app.test_client()
+
+
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _seed_checks(count: int, service: str = "search"):
+    db.save_health_checks([
+        HealthCheck(id=0, service=service, request_id=f"ping-{i}", status="UP", latency_ms=1.0,
+                    http_code=200, timestamp=(BASE + timedelta(seconds=i)).isoformat() + "Z")
+        for i in range(count)
+    ])
+
+
+class TestFetchPage:
+    """Keyset sobre id en ambas direcciones"""
+
+    def test_walk_backwards_and_forwards(self, monitor_db):
+        _seed_checks(7)
+
+        page, has_more = db.get_health_checks_page(limit=3)
+        assert [c.id for c in page] == [7, 6, 5]
+        assert has_more
+
+        page, has_more = db.get_health_checks_page(limit=3, before_id=5)
+        assert [c.id for c in page] == [4, 3, 2]
+        assert has_more
+
+        page, has_more = db.get_health_checks_page(limit=3, before_id=2)
+        assert [c.id for c in page] == [1]
+        assert not has_more
+
+        page, has_more = db.get_health_checks_page(limit=3, after_id=1)
+        assert [c.id for c in page] == [4, 3, 2]
+        assert has_more
+
+    def test_filters_and_cap(self, monitor_db):
+        _seed_checks(5)
+        _seed_checks(2, service="payments")
+
+        page, _ = db.get_health_checks_page(limit=10, service="payments")
+        assert {c.service for c in page} == {"payments"}
+
+        before = (BASE + timedelta(seconds=2)).isoformat() + "Z"
+        page, _ = db.get_health_checks_page(limit=10, service="search", before_ts=before)
+        assert [c.request_id for c in page] == ["ping-1", "ping-0"]
+
+        page, _ = db.get_health_checks_page(limit=10_000)
+        assert len(page) == 7  # el tope no rompe páginas chicas
+
+    def test_incidents_page(self, monitor_db):
+        for i in range(3):
+            db.save_incident(Incident(
+                id=0, service="search", started_at=(BASE + timedelta(minutes=i)).isoformat() + "Z",
+                detected_at=None, resolved_at=None, severity="WARNING", consecutive_failures=3,
+                resolution_action=None, mttd_seconds=None, mttr_seconds=None,
+            ))
+
+        page, has_more = db.get_incidents_page(limit=2)
+        assert [i.id for i in page] == [3, 2]
+        assert has_more
+
+
+class TestPaginatedEndpoints:
+    """Cursores next/prev en las respuestas"""
+
+    def test_health_checks_cursors(self, client):
+        _seed_checks(5)
+
+        first = client.get("/health-checks/search?limit=2").get_json()
+        assert [c["id"] for c in first["checks"]] == [5, 4]
+        assert first["next"] == {"before_id": 4}
+        assert first["prev"] is None
+
+        second = client.get(f"/health-checks/search?limit=2&before_id={first['next']['before_id']}").get_json()
+        assert [c["id"] for c in second["checks"]] == [3, 2]
+        assert second["prev"] == {"after_id": 3}
+
+        back = client.get(f"/health-checks/search?limit=2&after_id={second['prev']['after_id']}").get_json()
+        assert [c["id"] for c in back["checks"]] == [5, 4]
+        assert back["prev"] is None
+
+        last = client.get("/health-checks/search?limit=2&before_id=2").get_json()
+        assert [c["id"] for c in last["checks"]] == [1]
+        assert last["next"] is None
+
+    def test_page_size_is_capped(self, client):
+        _seed_checks(3)
+
+        body = client.get("/health-checks?limit=100000").get_json()
+        assert body["limit"] == db.MAX_PAGE_SIZE
+        assert body["total"] == 3
+
+    def test_invalid_limit(self, client):
+        assert client.get("/incidents?limit=0").status_code == 400
@@ -0,0 +1,103 @@
+"""Tests para la correlación ping -> echo (RTT y lag de la cola)"""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.constants.queues import ECHO_TIMEOUT_SECONDS, PING_ECHO_LOST_AFTER_SECONDS
+from app.monitor.metrics import get_ping_rtt_metrics, percentile
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+class TestPingFlightsDB:
+    """Registro y cierre de vuelos"""
+
+    def test_echo_closes_flight_once(self, monitor_db):
+        db.record_ping_sent("ping-1", 1000.0)
+
+        assert db.record_echo_received("ping-1", 1000.25, worker_at=1000.1) == pytest.approx(250.0)
+        # Un echo duplicado (redelivery) no pisa el RTT
+        assert db.record_echo_received("ping-1", 1003.0) is None
+        assert db.get_ping_flights(0) == [("ping-1", 1000.0, 1000.1, 1000.25, pytest.approx(250.0))]
+
+    def test_unknown_echo_is_ignored(self, monitor_db):
+        assert db.record_echo_received("ping-unknown", 1000.0) is None
+
+    def test_prune(self, monitor_db):
+        db.record_ping_sent("old", 100.0)
+        db.record_ping_sent("new", 200.0)
+
+        assert db.prune_ping_flights(150.0) == 1
+        assert [f[0] for f in db.get_ping_flights(0)] == ["new"]
+
+
+class TestPingRttMetrics:
+    """Distribución de RTT, pings perdidos y demorados"""
+
+    def test_percentile_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 50) is None
+
+    def test_rtt_distribution_and_lag(self, monitor_db):
+        now = 10_000.0
+        for i, rtt in enumerate([0.1, 0.2, 0.3, ECHO_TIMEOUT_SECONDS + 1]):
+            sent = now - 60 + i
+            db.record_ping_sent(f"ping-{i}", sent)
+            db.record_echo_received(f"ping-{i}", sent + rtt, worker_at=sent + rtt / 2)
+        # Sin echo: uno reciente (en vuelo) y uno vencido (perdido)
+        db.record_ping_sent("ping-recent", now - 1)
+        db.record_ping_sent("ping-lost", now - PING_ECHO_LOST_AFTER_SECONDS - 5)
+        # Fuera de la ventana
+        db.record_ping_sent("ping-old", now - 3600)
+
+        metrics = get_ping_rtt_metrics(window_minutes=5, now=now)
+
+        assert metrics["sent"] == 6
+        assert metrics["echoed"] == 4
+        assert metrics["in_flight"] == 1
+        assert metrics["oldest_in_flight_seconds"] == pytest.approx(1.0)
+        assert metrics["lost"] == 1
+        assert metrics["lagged"] == 1
+        assert metrics["loss_rate"] == pytest.approx(0.2)
+        assert metrics["rtt"]["p50_ms"] == pytest.approx(200.0)
+        assert metrics["rtt"]["max_ms"] == pytest.approx((ECHO_TIMEOUT_SECONDS + 1) * 1000)
+        assert metrics["queue_lag"]["p50_ms"] == pytest.approx(100.0)
+
+    def test_empty_window(self, monitor_db):
+        metrics = get_ping_rtt_metrics(window_minutes=5)
+        assert metrics["sent"] == 0
+        assert metrics["loss_rate"] is None
+        assert metrics["rtt"]["p95_ms"] is None
+
+
+class TestMonitorPingFlights:
+    """El monitor registra el envío y cierra el vuelo al recibir el echo"""
+
+    def test_send_and_echo(self, monitor_db):
+        from app.monitor import monitor_service
+        from app.monitor.monitor_service import MonitorService
+
+        monitor = MonitorService()
+        monitor.last_worker_status = "UP"
+        with patch.object(monitor_service.monitor_celery, "send_task") as mock_send:
+            request_id = monitor.send_celery_ping("ping-rtt-001")
+        mock_send.assert_called_once()
+
+        assert get_ping_rtt_metrics(window_minutes=5)["in_flight"] == 1
+
+        with patch.object(monitor_service, "ingest_echo_results", return_value={}):
+            monitor.process_echo(request_id=request_id, ts="2026-01-01T00:00:00Z", results=[])
+
+        metrics = get_ping_rtt_metrics(window_minutes=5)
+        assert metrics["echoed"] == 1
+        assert metrics["in_flight"] == 0
+        assert monitor.last_rtt_ms is not None
+        assert monitor.get_status()["ping_rtt"]["echoed"] == 1
@@ -0,0 +1,186 @@
+"""Tests para el motor de probes directos contra servidores HTTP locales"""
+
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.monitor.probe_engine import ProbeEngine
+from app.worker import db
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    status_code = 200
+    delay = 0.0
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        body = b'{"status": "UP"}'
+        self.send_response(self.status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _handler(status_code=200, delay=0.0):
+    return type("Handler", (_HealthHandler,), {"status_code": status_code, "delay": delay})
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(status_code=200, delay=0.0):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(status_code, delay))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/health"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/health"
+
+
+@pytest.fixture
+def engine_factory():
+    engines = []
+
+    def make(targets, **kwargs):
+        engine = ProbeEngine(targets, persist=False, **kwargs)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+
+class TestProbeResults:
+    """Estados reportados por probe"""
+
+    def test_statuses(self, stub_server, closed_port_url, engine_factory):
+        engine = engine_factory({
+            "search": stub_server(),
+            "payments": stub_server(status_code=503),
+            "reserves": closed_port_url,
+            "api-gateway": stub_server(delay=1.0),
+        }, timeout=0.3)
+
+        checks = {c.service: c for c in engine.probe_round("ping-001")}
+
+        assert checks["search"].status == "UP"
+        assert checks["search"].http_code == 200
+        assert checks["payments"].status == "DOWN"
+        assert checks["payments"].http_code == 503
+        assert checks["reserves"].status == "DOWN"
+        assert checks["api-gateway"].status == "TIMEOUT"
+        assert checks["api-gateway"].is_timeout is True
+
+    def test_probes_run_concurrently(self, stub_server, engine_factory):
+        engine = engine_factory({f"svc-{i}": stub_server(delay=0.3) for i in range(4)})
+
+        start = time.monotonic()
+        checks = engine.probe_round("ping-001")
+        elapsed = time.monotonic() - start
+
+        assert all(c.status == "UP" for c in checks)
+        assert elapsed < 1.0  # secuencial serían >= 1.2s
+
+    def test_subset_of_services(self, stub_server, engine_factory):
+        engine = engine_factory({"search": stub_server(), "payments": stub_server()})
+        checks = engine.probe_round("ping-001", ["payments"])
+        assert [c.service for c in checks] == ["payments"]
+
+
+class TestConnectionPool:
+    """Las conexiones keep-alive se reutilizan entre rondas"""
+
+    def test_connection_reused_across_rounds(self, stub_server, engine_factory):
+        url = stub_server()
+        engine = engine_factory({"search": url})
+
+        for i in range(3):
+            assert engine.probe_round(f"ping-{i}")[0].status == "UP"
+
+        stats = next(iter(engine.pool_stats().values()))
+        assert stats["opened"] == 1
+        assert stats["reused"] == 2
+
+    def test_stale_connection_is_retried(self, stub_server, engine_factory):
+        url = stub_server()
+        engine = engine_factory({"search": url})
+        engine.probe_round("ping-1")
+
+        # Simular que el servidor cerró la conexión ociosa
+        pool = next(iter(engine._pools.values()))
+        _, writer = pool._idle[0]
+        writer.transport.abort()
+
+        assert engine.probe_round("ping-2")[0].status == "UP"
+
+
+class TestBatchPersistence:
+    """Una ronda se persiste en un único batch"""
+
+    def test_round_saved_in_one_batch(self, stub_server, tmp_path, monkeypatch):
+        monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+        db.init_db()
+        engine = ProbeEngine({"search": stub_server(), "payments": stub_server()})
+        calls = []
+        original = db.save_health_checks
+        monkeypatch.setattr(
+            "app.monitor.probe_engine.save_health_checks",
+            lambda checks: (calls.append(len(checks)), original(checks)),
+        )
+        try:
+            engine.probe_round("ping-001")
+        finally:
+            engine.close()
+
+        assert calls == [2]
+        assert db.get_recent_health_checks("search", 1)[0].status == "UP"
+
+
+class TestMonitorDirectProbes:
+    """El monitor ingiere cada probe directo en el detector"""
+
+    def test_direct_round_feeds_detector(self, stub_server, closed_port_url, tmp_path, monkeypatch):
+        from unittest.mock import patch
+
+        from app.constants.queues import CONSECUTIVE_FAILURES_THRESHOLD
+        from app.monitor import incident_detector
+        from app.monitor.monitor_service import MonitorService
+
+        monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+        incident_detector.reset_detector_state()
+        engine = ProbeEngine({"worker": stub_server(), "payments": closed_port_url}, timeout=0.5)
+        monitor = MonitorService(probe_engine=engine)
+        try:
+            with patch.object(incident_detector, "submit_recovery", return_value={"submitted": True, "status": "QUEUED"}):
+                for _ in range(CONSECUTIVE_FAILURES_THRESHOLD):
+                    monitor.probe_direct_services(force=True)
+        finally:
+            engine.close()
+            incident_detector.reset_detector_state()
+
+        assert monitor.last_worker_status == "UP"
+        assert db.get_active_incident("payments") is not None
+        assert db.get_active_incident("worker") is None
@@ -0,0 +1,164 @@
+"""Tests para el executor de recovery en background"""
+
+import json
+import threading
+
+import pytest
+
+from app.models.monitoring import Incident
+from app.monitor.recovery_executor import (
+    RECOVERY_QUEUED,
+    RECOVERY_REJECTED,
+    RECOVERY_SKIPPED,
+    RECOVERY_SUCCEEDED,
+    RecoveryExecutor,
+)
+from app.worker import db
+
+
+class BlockingRecover:
+    """recover_fn que bloquea hasta que el test lo libera"""
+
+    def __init__(self, success=True):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+        self.success = success
+
+    def __call__(self, service, incident_id=None):
+        self.calls.append(service)
+        self.started.set()
+        self.release.wait(5)
+        return {"success": self.success, "message": f"{service} restarted"}
+
+
+@pytest.fixture
+def results():
+    return []
+
+
+@pytest.fixture
+def make_executor(tmp_path, results):
+    executors = []
+
+    def make(recover_fn, **kwargs):
+        kwargs.setdefault("lock_dir", str(tmp_path / "locks"))
+        kwargs.setdefault("cooldown_seconds", 60)
+        executor = RecoveryExecutor(
+            recover_fn=recover_fn,
+            on_result=lambda incident_id, status, detail: results.append((incident_id, status)),
+            **kwargs,
+        )
+        executors.append(executor)
+        return executor
+
+    yield make
+    for executor in executors:
+        executor.shutdown()
+
+
+class TestSubmit:
+    """submit no bloquea y aplica single-flight, cooldown y cola acotada"""
+
+    def test_submit_does_not_block(self, make_executor, results):
+        recover = BlockingRecover()
+        executor = make_executor(recover)
+
+        ticket = executor.submit("payments", incident_id=1)
+        assert ticket["submitted"] is True
+        assert recover.started.wait(2)
+
+        recover.release.set()
+        assert executor.wait_idle(2)
+        assert results == [(1, RECOVERY_QUEUED), (1, RECOVERY_SUCCEEDED)]
+
+    def test_single_flight_per_service(self, make_executor):
+        recover = BlockingRecover()
+        executor = make_executor(recover)
+
+        assert executor.submit("payments", 1)["submitted"] is True
+        second = executor.submit("payments", 2)
+        assert second["submitted"] is False
+        assert second["reason"] == "in_flight"
+
+        # Otro servicio no queda bloqueado
+        assert executor.submit("search", 3)["submitted"] is True
+        recover.release.set()
+        assert executor.wait_idle(2)
+        assert sorted(recover.calls) == ["payments", "search"]
+
+    def test_cooldown_after_action(self, make_executor, results):
+        recover = BlockingRecover()
+        recover.release.set()
+        executor = make_executor(recover)
+
+        executor.submit("payments", 1)
+        assert executor.wait_idle(2)
+        ticket = executor.submit("payments", 2)
+
+        assert ticket["reason"] == "cooldown"
+        assert (2, RECOVERY_REJECTED) in results
+        assert executor.snapshot()["counters"]["rejected_cooldown"] == 1
+
+    def test_cooldown_shared_between_processes(self, make_executor, tmp_path):
+        """El cooldown se guarda en el lock file: otro executor (proceso) lo respeta"""
+        recover = BlockingRecover()
+        recover.release.set()
+        first = make_executor(recover)
+        first.submit("payments", 1)
+        assert first.wait_idle(2)
+
+        other = make_executor(BlockingRecover())
+        assert other.submit("payments", 2)["reason"] == "cooldown"
+
+    def test_bounded_queue(self, make_executor):
+        recover = BlockingRecover()
+        executor = make_executor(recover, workers=1, max_pending=1)
+
+        assert executor.submit("payments", 1)["submitted"] is True
+        assert recover.started.wait(2)  # el worker ya sacó el primero de la cola
+        assert executor.submit("search", 2)["submitted"] is True
+        third = executor.submit("reserves", 3)
+        assert third["reason"] == "queue_full"
+
+        recover.release.set()
+        assert executor.wait_idle(2)
+
+    def test_locked_by_other_process_is_skipped(self, make_executor, results, tmp_path):
+        import fcntl
+        import os
+
+        lock_dir = tmp_path / "locks"
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(lock_dir / "payments.lock", "a+") as held:
+            fcntl.flock(held.fileno(), fcntl.LOCK_EX)
+            recover = BlockingRecover()
+            executor = make_executor(recover)
+            executor.submit("payments", 1)
+            assert executor.wait_idle(2)
+
+        assert recover.calls == []
+        assert results[-1] == (1, RECOVERY_SKIPPED)
+
+
+class TestIncidentAttachment:
+    """El resultado queda registrado en el incidente"""
+
+    def test_result_attached_to_incident(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+        db.init_db()
+        incident = Incident.create("payments", "2026-01-01T00:00:00Z", 3)
+        incident_id = db.save_incident(incident)
+
+        recover = BlockingRecover()
+        recover.release.set()
+        executor = RecoveryExecutor(recover_fn=recover, lock_dir=str(tmp_path / "locks"))
+        try:
+            executor.submit("payments", incident_id)
+            assert executor.wait_idle(2)
+        finally:
+            executor.shutdown()
+
+        stored = db.get_active_incident("payments")
+        assert stored.recovery_status == RECOVERY_SUCCEEDED
+        assert json.loads(stored.recovery_detail)["message"] == "payments restarted"
@@ -0,0 +1,121 @@
+"""Tests para el scheduler de pings con deadlines fijos"""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.monitor.scheduler import DeadlineScheduler
+from app.worker import db
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _slow_job(clock, duration, calls):
+    def job():
+        calls.append(clock.now)
+        clock.now += duration
+    return job
+
+
+class TestDeadlines:
+    """El período no incluye el tiempo de ejecución del job"""
+
+    def test_no_drift_with_slow_job(self):
+        clock = FakeClock()
+        scheduler = DeadlineScheduler(clock=clock)
+        calls = []
+        scheduler.add_job("ping", _slow_job(clock, 2.0, calls), lambda: 5.0)
+
+        for _ in range(4):
+            scheduler.run_pending()
+            clock.now += scheduler.seconds_until_next()
+
+        assert calls == [0.0, 5.0, 10.0, 15.0]
+
+    def test_missed_slots_are_skipped(self):
+        clock = FakeClock()
+        scheduler = DeadlineScheduler(clock=clock)
+        calls = []
+        scheduler.add_job("ping", _slow_job(clock, 12.0, calls), lambda: 5.0)
+
+        scheduler.run_pending()
+        assert scheduler.seconds_until_next() == pytest.approx(3.0)  # próximo slot: 15
+        assert scheduler.snapshot()["ping"]["missed_slots"] == 2
+
+    def test_adaptive_interval(self):
+        clock = FakeClock()
+        scheduler = DeadlineScheduler(clock=clock)
+        state = {"interval": 5.0}
+        calls = []
+        scheduler.add_job("ping", _slow_job(clock, 0.0, calls), lambda: state["interval"])
+
+        scheduler.run_pending()
+        state["interval"] = 1.0
+        clock.now = 5.0
+        scheduler.run_pending()
+        assert scheduler.seconds_until_next() == pytest.approx(1.0)
+
+    def test_reschedule_pulls_deadline_forward(self):
+        clock = FakeClock()
+        scheduler = DeadlineScheduler(clock=clock)
+        state = {"interval": 5.0}
+        scheduler.add_job("ping", lambda: None, lambda: state["interval"])
+        scheduler.run_pending()
+
+        clock.now = 0.5
+        state["interval"] = 1.0
+        scheduler.reschedule("ping")
+        assert scheduler.seconds_until_next() == pytest.approx(0.5)
+
+    def test_job_errors_do_not_stop_schedule(self):
+        clock = FakeClock()
+        scheduler = DeadlineScheduler(clock=clock)
+
+        def broken():
+            raise RuntimeError("boom")
+
+        scheduler.add_job("ping", broken, lambda: 5.0)
+        scheduler.run_pending()
+        assert scheduler.snapshot()["ping"]["errors"] == 1
+        assert scheduler.seconds_until_next() == pytest.approx(5.0)
+
+
+class TestMonitorIntervals:
+    """El monitor acorta el intervalo mientras hay sospecha de falla"""
+
+    @pytest.fixture
+    def monitor(self, tmp_path, monkeypatch):
+        from app.monitor import incident_detector
+        from app.monitor.monitor_service import MonitorService
+
+        monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+        incident_detector.reset_detector_state()
+        with patch.object(incident_detector, "submit_recovery", return_value={"submitted": True, "status": "QUEUED"}):
+            yield MonitorService(ping_interval=5, suspect_interval=1)
+        incident_detector.reset_detector_state()
+
+    def test_worker_interval_tightens_after_first_failure(self, monitor):
+        from app.monitor.incident_detector import ingest_check_result
+
+        assert monitor.service_interval(["worker"]) == 5
+        ingest_check_result("worker", True, "2026-01-01T00:00:00Z")
+        assert monitor.service_interval(["worker"]) == 1
+        ingest_check_result("worker", False, "2026-01-01T00:00:01Z")
+        assert monitor.service_interval(["worker"]) == 5
+
+    def test_remote_services_read_from_db(self, monitor):
+        from app.models.monitoring import HealthCheck
+
+        db.save_health_check(HealthCheck.down("redis", "ping-1"))
+        assert monitor.service_interval(["redis"]) == 1
+        assert monitor.service_interval(["search"]) == 5
+
+    def test_per_service_interval(self, monitor):
+        monitor.service_intervals = {"search": 10}
+        assert monitor.service_interval(["search"]) == 10
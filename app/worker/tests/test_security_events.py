@@ -0,0 +1,151 @@
+"""Tests para el almacén de eventos de seguridad y sus reportes"""
+
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.audit import security_event_store
+from app.audit.security_event_store import SecurityEventStore
+from app.models.security import SecurityEvent
+from app.monitor import api
+from app.monitor.monitor_service import consume_security_log
+from app.worker import db
+
+
+@pytest.fixture
+def monitor_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+    db.init_db()
+
+
+def _payload(hotel: str = "H1", ip: str = "10.0.0.1", endpoint: str = "/tarifas/H1",
+             status: str = "FORBIDDEN", minutes_ago: float = 1, **extra) -> dict:
+    payload = {
+        "event_id": str(uuid4()),
+        "timestamp": (datetime.utcnow() - timedelta(minutes=minutes_ago)).isoformat() + "Z",
+        "user_id": "user-1",
+        "token_hotel_id": "H9",
+        "requested_hotel_id": hotel,
+        "endpoint": endpoint,
+        "method": "PUT",
+        "ip_address": ip,
+        "action": "UPDATE_RATES_DENIED" if status == "FORBIDDEN" else "UPDATE_RATES_STARTED",
+        "log_id": None,
+        "status": status,
+        "http_code": 403 if status == "FORBIDDEN" else 202,
+        "message": "test",
+    }
+    payload.update(extra)
+    return payload
+
+
+class TestSaveSecurityEvents:
+    """Inserción por lotes e idempotencia"""
+
+    def test_batch_insert_ignores_duplicates(self, monitor_db):
+        events = [SecurityEvent.from_payload(_payload()) for _ in range(3)]
+
+        assert db.save_security_events(events) == 3
+        assert db.save_security_events(events[:2]) == 0
+        assert len(db.get_security_events()) == 3
+
+    def test_dimension_indexes(self, monitor_db):
+        with closing(sqlite3.connect(db.DB_PATH)) as conn:
+            indexes = {row[1] for row in conn.execute("PRAGMA index_list(security_events)")}
+            columns = [row[2] for row in conn.execute("PRAGMA index_info(idx_security_events_hotel_ts)")]
+
+        assert {"idx_security_events_hotel_ts", "idx_security_events_ip_ts", "idx_security_events_endpoint_ts"} <= indexes
+        assert columns == ["requested_hotel_id", "ts"]
+
+
+class TestSecurityEventStore:
+    """Buffer con flush por tamaño y por antigüedad"""
+
+    def test_flushes_by_size(self):
+        batches = []
+        store = SecurityEventStore(batch_size=3, flush_seconds=60, writer=lambda b: batches.append(b) or len(b))
+
+        for _ in range(7):
+            store.add(SecurityEvent.from_payload(_payload()))
+
+        assert [len(b) for b in batches] == [3, 3]
+        assert store.pending() == 1
+        assert store.flush() == 1
+        assert store.persisted == 7
+
+    def test_background_flush_by_age(self):
+        batches = []
+        store = SecurityEventStore(batch_size=100, flush_seconds=0.05, writer=lambda b: batches.append(b) or len(b))
+        store.start()
+        try:
+            store.add(SecurityEvent.from_payload(_payload()))
+            deadline = time.monotonic() + 2
+            while not batches and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            store.stop()
+
+        assert [len(b) for b in batches] == [1]
+
+    def test_failed_batch_is_retried(self):
+        calls = []
+
+        def writer(batch):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return len(batch)
+
+        store = SecurityEventStore(batch_size=2, flush_seconds=60, max_buffer=3, writer=writer)
+        store.add(SecurityEvent.from_payload(_payload()))
+        store.add(SecurityEvent.from_payload(_payload()))
+        assert store.pending() == 2
+
+        store.add(SecurityEvent.from_payload(_payload()))
+        assert calls == [2, 3]
+        assert store.persisted == 3
+        assert store.dropped == 0
+
+
+class TestSecurityConsumerAndReports:
+    """consume_security_log persiste y los endpoints agregan por ventana"""
+
+    def test_consumer_persists_events(self, monitor_db, monkeypatch):
+        store = SecurityEventStore(batch_size=2, flush_seconds=60)
+        monkeypatch.setattr(security_event_store, "_store", store)
+
+        consume_security_log(**_payload())
+        assert db.get_security_events() == []
+
+        consume_security_log(**_payload(status="AUTHORIZED"))
+        saved = db.get_security_events()
+        assert [e.status for e in saved] == ["AUTHORIZED", "FORBIDDEN"]
+        assert saved[1].requested_hotel_id == "H1"
+
+    def test_violation_reports(self, monitor_db):
+        payloads = [_payload(hotel="H1", ip="10.0.0.1") for _ in range(3)]
+        payloads += [_payload(hotel="H2", ip="10.0.0.1", endpoint="/tarifas/H2")]
+        payloads += [_payload(hotel="H2", status="AUTHORIZED")]  # no es violación
+        payloads += [_payload(hotel="H3", minutes_ago=180)]  # fuera de la ventana
+        db.save_security_events([SecurityEvent.from_payload(p) for p in payloads])
+        client = api.app.test_client()
+
+        by_hotel = client.get("/security/violations/by-hotel?window_hours=1").get_json()
+        assert [(g["hotel"], g["violations"]) for g in by_hotel["groups"]] == [("H1", 3), ("H2", 1)]
+
+        by_ip = client.get("/security/violations/by-ip").get_json()
+        assert by_ip["groups"][0]["ip"] == "10.0.0.1"
+        assert by_ip["groups"][0]["violations"] == 4
+        assert by_ip["groups"][0]["distinct_hotels"] == 2
+
+        by_endpoint = client.get("/security/violations/by-endpoint?limit=1").get_json()
+        assert by_endpoint["groups"] == [{**by_endpoint["groups"][0], "endpoint": "/tarifas/H1", "violations": 3}]
+
+    def test_invalid_params(self, monitor_db):
+        client = api.app.test_client()
+        assert client.get("/security/violations/by-user").status_code == 404
+        assert client.get("/security/violations/by-ip?limit=0").status_code == 400
@@ -0,0 +1,138 @@
+"""Tests para el detector de tampering y la deny-list del gateway"""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.api_gateway.gateway import app as gateway_app, UpdateRatesOperation
+from app.audit import security_event_store, tampering_detector
+from app.audit.security_event_store import SecurityEventStore
+from app.audit.tampering_detector import (
+    HOTEL_CYCLING,
+    VIOLATION_RATE,
+    TamperingDetector,
+    react_to_alerts,
+)
+from app.auth import deny_list as deny_list_module
+from app.auth.deny_list import DENY_IP, DENY_TOKEN, InMemoryDenyList, token_fingerprint
+from app.models.security import SecurityEvent
+from app.monitor.monitor_service import consume_security_log
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _event(user="u1", ip="10.0.0.1", token_hotel="H9", hotel="H1", status="FORBIDDEN", n=0) -> SecurityEvent:
+    return SecurityEvent.from_payload({
+        "event_id": f"evt-{n}", "user_id": user, "ip_address": ip, "token_hotel_id": token_hotel,
+        "requested_hotel_id": hotel, "status": status, "endpoint": f"/tarifas/{hotel}",
+    })
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def detector(clock):
+    return TamperingDetector(window_seconds=60, bucket_seconds=5, max_violations=5, max_hotels=3, clock=clock)
+
+
+class TestTamperingDetector:
+    """Contadores deslizantes por usuario, IP y token_hotel_id"""
+
+    def test_violation_rate_alert_per_dimension(self, detector):
+        alerts = [detector.observe(_event(hotel="H1", n=i)) for i in range(6)]
+
+        assert alerts[:5] == [[]] * 5
+        assert {(a.kind, a.reason) for a in alerts[5]} == {
+            ("user", VIOLATION_RATE), ("ip", VIOLATION_RATE), ("token_hotel", VIOLATION_RATE),
+        }
+        assert all(not a.repeated for a in alerts[5])
+        assert all(a.repeated for a in detector.observe(_event(n=7)))
+
+    def test_hotel_cycling(self, detector):
+        detector.observe(_event(hotel="H1"))
+        detector.observe(_event(hotel="H2"))
+        alerts = detector.observe(_event(hotel="H3"))
+
+        assert {a.reason for a in alerts} == {HOTEL_CYCLING}
+        assert alerts[0].distinct_hotels == 3
+
+    def test_authorized_events_are_ignored(self, detector):
+        for _ in range(10):
+            assert detector.observe(_event(status="AUTHORIZED")) == []
+        assert len(detector) == 0
+
+    def test_window_slides(self, detector, clock):
+        for i in range(5):
+            detector.observe(_event(n=i))
+        clock.now += 61
+
+        assert detector.observe(_event(n=9)) == []
+
+    def test_keys_are_bounded(self, clock):
+        detector = TamperingDetector(max_keys=10, clock=clock)
+
+        for i in range(100):
+            detector.observe(_event(user=None, token_hotel=None, ip=f"10.0.{i}.1"))
+
+        assert len(detector) == 10
+        assert detector.evicted == 90
+
+
+class TestDenyList:
+    """Alertas -> deny-list -> rechazo en el gateway antes del JWT"""
+
+    def test_react_to_alerts(self, detector, clock):
+        denied = InMemoryDenyList(clock=clock)
+        alerts = []
+        for i in range(6):
+            alerts = detector.observe(_event(n=i))
+
+        react_to_alerts(alerts, token_fingerprint="abc", deny_list=denied)
+
+        assert denied.is_denied(DENY_TOKEN, "abc")
+        assert denied.is_denied(DENY_IP, "10.0.0.1")
+        clock.now += deny_list_module.DENY_LIST_TTL_SECONDS + 1
+        assert not denied.is_denied(DENY_TOKEN, "abc")
+        assert denied.entries() == []
+
+    def test_consumer_feeds_deny_list(self, tmp_path, monkeypatch, clock):
+        denied = InMemoryDenyList(clock=clock)
+        monkeypatch.setattr(deny_list_module, "_deny_list", denied)
+        monkeypatch.setattr(tampering_detector, "_detector", TamperingDetector(max_hotels=3, clock=clock))
+        monkeypatch.setattr(security_event_store, "_store", SecurityEventStore(writer=lambda batch: len(batch)))
+
+        fingerprint = token_fingerprint("stolen-token")
+        for hotel in ("H1", "H2", "H3"):
+            consume_security_log(
+                event_id=f"evt-{hotel}", requested_hotel_id=hotel, ip_address="10.9.9.9", status="FORBIDDEN",
+                user_id="mallory", token_hotel_id="H9", token_fingerprint=fingerprint,
+            )
+
+        assert denied.is_denied(DENY_TOKEN, fingerprint)
+
+    def test_gateway_rejects_denied_token_before_decode(self, monkeypatch):
+        denied = InMemoryDenyList()
+        denied.add(DENY_TOKEN, token_fingerprint("stolen-token"))
+        monkeypatch.setattr(deny_list_module, "_deny_list", denied)
+        client = gateway_app.test_client()
+
+        with patch.object(UpdateRatesOperation, "_estaAutorizado") as authorize, \
+                patch.object(UpdateRatesOperation, "_generateLog") as generate_log:
+            response = client.put(
+                "/tarifas/H1",
+                json={"rates": {"standard": 100}},
+                headers={"Authorization": "Bearer stolen-token"},
+            )
+
+        assert response.status_code == 403
+        authorize.assert_not_called()
+        generate_log.assert_not_called()
@@ -0,0 +1,139 @@
+"""Tests para la instrumentación de tasks Celery (tiempo en cola / ejecución)"""
+
+import json
+import os
+import time
+
+import pytest
+
+from app.worker import task_metrics
+from app.worker.task_metrics import (
+    Histogram,
+    PUBLISHED_AT_HEADER,
+    get_aggregated_task_metrics,
+    install_task_signal_handlers,
+    reset_task_metrics,
+)
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    """Directorio temporal para los snapshots por proceso"""
+    monkeypatch.setattr(task_metrics, "TASK_METRICS_DIR", str(tmp_path))
+    reset_task_metrics()
+    yield tmp_path
+    reset_task_metrics()
+
+
+class TestHistogram:
+    """Tests del histograma de buckets fijos"""
+
+    def test_observe_and_percentiles(self):
+        hist = Histogram()
+        for value in [1, 2, 3, 40, 60, 70, 80, 90, 200, 4000]:
+            hist.observe(value)
+
+        assert hist.count == 10
+        assert hist.percentile(50) == 100.0
+        assert hist.percentile(99) == 5000.0
+        assert hist.max_ms == 4000
+
+    def test_merge(self):
+        a, b = Histogram(), Histogram()
+        a.observe(10)
+        b.observe(20000)
+        a.merge(b.to_dict())
+
+        assert a.count == 2
+        assert a.sum_ms == 20010
+        assert a.max_ms == 20000
+
+    def test_empty_percentile(self):
+        assert Histogram().percentile(95) is None
+
+
+class TestSignalInstrumentation:
+    """Los hooks registran tiempo en cola y ejecución por nombre de task"""
+
+    def test_prerun_postrun_records_wait_and_runtime(self, metrics_dir, celery_app_for_testing):
+        install_task_signal_handlers()
+
+        @celery_app_for_testing.task(name="test.instrumented")
+        def instrumented():
+            time.sleep(0.01)
+            return "ok"
+
+        instrumented.apply(headers={PUBLISHED_AT_HEADER: time.time() - 0.2})
+
+        stats = get_aggregated_task_metrics()["tasks"]["test.instrumented"]
+        assert stats["succeeded"] == 1
+        assert stats["queue_wait"]["count"] == 1
+        assert stats["queue_wait"]["avg_ms"] >= 200
+        assert stats["run_time"]["count"] == 1
+        assert stats["run_time"]["avg_ms"] >= 10
+
+    def test_failure_is_counted(self, metrics_dir, celery_app_for_testing):
+        install_task_signal_handlers()
+
+        @celery_app_for_testing.task(name="test.failing")
+        def failing():
+            raise RuntimeError("boom")
+
+        failing.apply()
+
+        stats = get_aggregated_task_metrics()["tasks"]["test.failing"]
+        assert stats["failed"] == 1
+        assert stats["succeeded"] == 0
+
+    def test_publish_stamps_header(self):
+        headers = {}
+        task_metrics._on_before_task_publish(sender="x", headers=headers)
+        assert abs(headers[PUBLISHED_AT_HEADER] - time.time()) < 1
+
+
+class TestAggregation:
+    """Los snapshots de otros procesos se agregan con los del proceso actual"""
+
+    def test_merges_other_process_snapshots(self, metrics_dir):
+        other = task_metrics.TaskStats()
+        other.run_time.observe(300)
+        other.succeeded = 1
+        with open(os.path.join(metrics_dir, "otherhost-1234.json"), "w") as f:
+            json.dump({"written_at": time.time(), "tasks": {"worker.process_operation": other.to_dict()}}, f)
+
+        task_metrics.record_run_time("worker.process_operation", 350, "SUCCESS")
+
+        result = get_aggregated_task_metrics()
+        stats = result["tasks"]["worker.process_operation"]
+        assert result["processes"] == 2
+        assert stats["succeeded"] == 2
+        assert stats["run_time"]["count"] == 2
+
+    def test_ignores_corrupt_snapshots(self, metrics_dir):
+        with open(os.path.join(metrics_dir, "broken-1.json"), "w") as f:
+            f.write("{not json")
+
+        assert get_aggregated_task_metrics()["tasks"] == {}
+
+    def test_drops_stale_snapshots(self, metrics_dir):
+        stale = os.path.join(metrics_dir, "deadhost-1.json")
+        with open(stale, "w") as f:
+            json.dump({
+                "written_at": time.time() - task_metrics.TASK_METRICS_STALE_SECONDS - 1,
+                "tasks": {"worker.process_operation": task_metrics.TaskStats().to_dict()},
+            }, f)
+
+        result = get_aggregated_task_metrics()
+
+        assert result["processes"] == 0
+        assert not os.path.exists(stale)
+
+    def test_process_shutdown_flushes_snapshot(self, metrics_dir):
+        task_metrics.record_retry("worker.process_operation")
+
+        task_metrics._on_worker_process_shutdown()
+
+        with open(task_metrics._snapshot_path()) as f:
+            snapshot = json.load(f)
+        assert snapshot["tasks"]["worker.process_operation"]["retried"] == 1
+        assert abs(snapshot["written_at"] - time.time()) < 5
@@ -1,6 +1,6 @@
 """Tests para tasks de Celery del worker"""
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -90,6 +90,126 @@ class TestProcessOperationTask:
         assert final_op.status == "PROCESSED"
 
 
+class TestOperationDeadlines:
+    """Tests de deadlines end-to-end (OPERATION_TIMEOUT_SECONDS)"""
+
+    def _stale_operation(self, operation_id: str, age_seconds: float) -> Operation:
+        created = (datetime.utcnow() - timedelta(seconds=age_seconds)).isoformat() + "Z"
+        op = Operation(
+            id=operation_id,
+            type="pay",
+            payload={"amount": 100},
+            status="PENDING",
+            error=None,
+            created_at=created,
+            updated_at=created,
+        )
+        save_operation(op)
+        return op
+
+    @patch("app.worker.tasks.init_db")
+    def test_expired_operation_is_not_executed(self, mock_init_db, initialized_db):
+        """Una operación con el deadline vencido pasa a TIMED_OUT sin ejecutarse"""
+        from app.worker.tasks import process_operation
+        from app.constants.queues import OPERATION_TIMEOUT_SECONDS
+
+        self._stale_operation("op-deadline-expired", OPERATION_TIMEOUT_SECONDS + 1)
+
+        with patch("app.worker.tasks.time.sleep") as mock_sleep:
+            result = process_operation("op-deadline-expired")
+
+        assert result["status"] == "TIMED_OUT"
+        mock_sleep.assert_not_called()
+        op = get_operation("op-deadline-expired")
+        assert op.status == "TIMED_OUT"
+        assert "deadline" in op.error
+
+    @patch("app.worker.tasks.init_db")
+    def test_soft_time_limit_marks_timed_out(self, mock_init_db, initialized_db):
+        """Si la ejecución excede el soft time limit la operación queda TIMED_OUT"""
+        from app.worker.tasks import process_operation
+        from celery.exceptions import SoftTimeLimitExceeded
+
+        self._stale_operation("op-deadline-soft", 0)
+
+        with patch("app.worker.tasks.time.sleep", side_effect=SoftTimeLimitExceeded()):
+            result = process_operation("op-deadline-soft")
+
+        assert result["status"] == "TIMED_OUT"
+        assert get_operation("op-deadline-soft").status == "TIMED_OUT"
+
+    @patch("app.worker.tasks.init_db")
+    def test_no_retry_past_deadline(self, mock_init_db, initialized_db):
+        """Un fallo sin tiempo para reintentar termina en TIMED_OUT"""
+        from app.worker.tasks import process_operation
+        from app.constants.queues import OPERATION_TIMEOUT_SECONDS
+
+        set_force_failure(True)
+        self._stale_operation("op-deadline-retry", OPERATION_TIMEOUT_SECONDS - 0.5)
+
+        with patch("app.worker.tasks.time.sleep"):
+            with pytest.raises(RuntimeError):
+                process_operation("op-deadline-retry")
+
+        assert get_operation("op-deadline-retry").status == "TIMED_OUT"
+
+    def test_expired_message_revoked_marks_timed_out(self, initialized_db):
+        """Los mensajes descartados por expirar en cola marcan la operación"""
+        from app.worker.tasks import process_operation, _on_operation_revoked
+
+        self._stale_operation("op-deadline-revoked", 0)
+        request = MagicMock(args=("op-deadline-revoked",))
+
+        _on_operation_revoked(sender=process_operation, request=request, expired=True)
+
+        assert get_operation("op-deadline-revoked").status == "TIMED_OUT"
+
+
+class TestPingLane:
+    """Los pings corren en un nodo dedicado y expiran rápido"""
+
+    def test_monitor_ping_is_published_with_short_expiry(self, tmp_path, monkeypatch):
+        """Un ping viejo se descarta en vez de procesarse tarde: el monitor lo publica con expires"""
+        from app.constants.queues import MONITORED_SERVICES, PING_EXPIRY_SECONDS, PING_QUEUE, TASK_PING_ALL_SERVICES
+        from app.monitor import monitor_service
+        from app.monitor.cluster import InMemoryLeaseStore, MonitorCluster
+        from app.worker import db
+
+        monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "monitor.db"))
+        cluster = MonitorCluster("solo", store=InMemoryLeaseStore())
+        cluster.heartbeat()
+        monitor = monitor_service.MonitorService(
+            probe_engine=MagicMock(targets=dict(MONITORED_SERVICES)), cluster=cluster
+        )
+        monitor.last_worker_status = "UP"
+
+        with patch.object(monitor_service.monitor_celery, "send_task") as mock_send:
+            request_id = monitor.send_celery_ping("ping-expiry")
+
+        assert request_id == "ping-expiry"
+        mock_send.assert_called_once()
+        args, kwargs = mock_send.call_args
+        assert args == (TASK_PING_ALL_SERVICES,)
+        assert kwargs["queue"] == PING_QUEUE
+        assert kwargs["expires"] == PING_EXPIRY_SECONDS
+
+    def test_launcher_starts_one_node_per_queue_class(self):
+        """El launcher levanta nodos separados para ops.process y monitoring.ping"""
+        from app.worker import start_worker
+        from app.constants.queues import OPERATIONS_QUEUE, PING_QUEUE
+
+        with patch.object(start_worker.celery_app, "worker_main") as mock_main:
+            start_worker.run_celery_node(start_worker.PING_NODE_NAME, PING_QUEUE, 2)
+            start_worker.run_celery_node(start_worker.OPS_NODE_NAME, OPERATIONS_QUEUE, 4)
+
+        ping_argv = mock_main.call_args_list[0].kwargs["argv"]
+        ops_argv = mock_main.call_args_list[1].kwargs["argv"]
+        assert f"--queues={PING_QUEUE}" in ping_argv
+        assert "--hostname=ping@%h" in ping_argv
+        assert f"--queues={OPERATIONS_QUEUE}" in ops_argv
+        assert "--concurrency=4" in ops_argv
+
+
 class TestPingWorkerTask:
     """Tests para task de ping/echo del worker"""
 